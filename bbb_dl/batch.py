@@ -40,6 +40,22 @@ class BatchProcessor:
         force_height: int,
         preset: str,
         crf: int,
+        dl_segments: int,
+        use_asset_store: bool,
+        asset_store_max_size: int,
+        revalidate: bool,
+        max_parallel_dl: int,
+        max_dl_retries: int,
+        max_bandwidth: str,
+        bandwidth_control_file: str,
+        source_dir: str,
+        stream_webcams: bool,
+        audio_only_stream: bool,
+        disk_budget: str,
+        frame_memory_cap: str,
+        frame_memory_dir: str,
+        cpu_budget: int,
+        ffmpeg_threads: int,
     ):
         self.bbb_dl_path = bbb_dl_path
         option_list = []
@@ -66,6 +82,22 @@ class BatchProcessor:
         self.add_value_option(option_list, '--force-height', force_height)
         self.add_value_option(option_list, '--preset', preset)
         self.add_value_option(option_list, '--crf', crf)
+        self.add_value_option(option_list, '--dl-segments', dl_segments)
+        self.add_bool_option(option_list, '--use-asset-store', use_asset_store)
+        self.add_value_option(option_list, '--asset-store-max-size', asset_store_max_size)
+        self.add_bool_option(option_list, '--revalidate', revalidate)
+        self.add_value_option(option_list, '--max-parallel-dl', max_parallel_dl)
+        self.add_value_option(option_list, '--max-dl-retries', max_dl_retries)
+        self.add_value_option(option_list, '--max-bandwidth', max_bandwidth)
+        self.add_value_option(option_list, '--bandwidth-control-file', bandwidth_control_file)
+        self.add_value_option(option_list, '--source-dir', source_dir)
+        self.add_bool_option(option_list, '--stream-webcams', stream_webcams)
+        self.add_bool_option(option_list, '--audio-only-stream', audio_only_stream)
+        self.add_value_option(option_list, '--disk-budget', disk_budget)
+        self.add_value_option(option_list, '--frame-memory-cap', frame_memory_cap)
+        self.add_value_option(option_list, '--frame-memory-dir', frame_memory_dir)
+        self.add_value_option(option_list, '--cpu-budget', cpu_budget)
+        self.add_value_option(option_list, '--ffmpeg-threads', ffmpeg_threads)
         self.default_option_list = option_list
         self.dl_urls_file_path = dl_urls_file_path
 
@@ -349,8 +381,11 @@ def get_parser():
         '-mpc',
         '--max-parallel-chromes',
         type=int,
-        default=10,
-        help='Maximum number of chrome browser instances used to generate frames',
+        default=None,
+        help=(
+            'Maximum number of chrome browser instances used to generate frames'
+            + ' (default one per available CPU, if the memory is large enough)'
+        ),
     )
 
     parser.add_argument(
@@ -369,6 +404,151 @@ def get_parser():
         help='Force height on final outputs',
     )
 
+    parser.add_argument(
+        '-ds',
+        '--dl-segments',
+        type=int,
+        default=None,
+        help='Number of parallel connections used to download large webcams / deskshare files',
+    )
+
+    parser.add_argument(
+        '-uas',
+        '--use-asset-store',
+        action='store_true',
+        help='Share downloaded files of all recordings in a content-addressed store inside the working directory',
+    )
+
+    parser.add_argument(
+        '--asset-store-max-size',
+        type=int,
+        default=None,
+        help='Maximum size of the asset store in MiB',
+    )
+
+    parser.add_argument(
+        '-rv',
+        '--revalidate',
+        action='store_true',
+        help='Check with the server if files that are already present have changed and download only changed files',
+    )
+
+    parser.add_argument(
+        '-mpd',
+        '--max-parallel-dl',
+        type=int,
+        default=None,
+        help='Maximum number of parallel downloads per recording',
+    )
+
+    parser.add_argument(
+        '-mdr',
+        '--max-dl-retries',
+        type=int,
+        default=None,
+        help='Maximum number of tries per file download',
+    )
+
+    parser.add_argument(
+        '-mbw',
+        '--max-bandwidth',
+        type=str,
+        default=None,
+        help='Limit the download bandwidth of each bbb-dl run to this rate per second (e.g. 500K, 2M or 1G)',
+    )
+
+    parser.add_argument(
+        '--bandwidth-control-file',
+        type=str,
+        default=None,
+        help=(
+            'Optional path to a file with a bandwidth limit (e.g. 2M, or 0 for unlimited), that is checked'
+            + ' regularly by all runs. Change it to adjust the limit of the running batch'
+        ),
+    )
+
+    parser.add_argument(
+        '-sd',
+        '--source-dir',
+        type=str,
+        default=None,
+        help=(
+            'Optional path to the directory of the published recordings on this machine'
+            + ' (e.g. /var/bigbluebutton/published/presentation). The files of the recordings are linked'
+            + ' from there instead of being downloaded'
+        ),
+    )
+
+    parser.add_argument(
+        '-stw',
+        '--stream-webcams',
+        action='store_true',
+        help=(
+            'Read the webcams video while it is downloaded: the freeze detection (or the audio extraction in the'
+            + ' audio only mode) starts with the download instead of after it. Only used for WebM webcams videos,'
+            + ' not on Windows'
+        ),
+    )
+
+    parser.add_argument(
+        '-aos',
+        '--audio-only-stream',
+        action='store_true',
+        help=(
+            'Only with --audio-only: The webcams videos are streamed from the server into ffmpeg and are not stored.'
+            + ' Only used for WebM webcams videos, other videos and failed streams are downloaded as usual'
+        ),
+    )
+
+    parser.add_argument(
+        '-db',
+        '--disk-budget',
+        type=str,
+        default=None,
+        help=(
+            'Limit the temporary files of all bbb-dl processes that use the same working directory (e.g. 20G).'
+            + ' Intermediate files are removed as soon as they are no longer needed, and a job waits until its'
+            + ' estimated peak disk usage fits into the budget. Not used in the audio only mode'
+        ),
+    )
+
+    parser.add_argument(
+        '-fmc',
+        '--frame-memory-cap',
+        type=str,
+        default=None,
+        help=(
+            'Keep the captured frames in a memory backed directory (a tmpfs) up to this size (e.g. 2G), instead of'
+            + ' writing them to the working directory. Further frames are stored in the working directory'
+        ),
+    )
+
+    parser.add_argument(
+        '--frame-memory-dir',
+        type=str,
+        default=None,
+        help='Optional memory backed directory for --frame-memory-cap (default /dev/shm)',
+    )
+
+    parser.add_argument(
+        '-cb',
+        '--cpu-budget',
+        type=int,
+        default=None,
+        help=(
+            'Number of CPUs that the chrome browsers and ffmpeg encodings of all bbb-dl processes with the same'
+            + ' working directory may use at the same time (default the available CPUs, following the CPU quota'
+            + ' of a container). Several bbb-dl-batch runs with the same working directory share this budget'
+        ),
+    )
+
+    parser.add_argument(
+        '--ffmpeg-threads',
+        type=int,
+        default=None,
+        help='Number of threads of each ffmpeg encoding (default the available CPUs divided by two)',
+    )
+
     return parser
 
 
@@ -405,5 +585,21 @@ def main(args=None):
             args.force_height,
             args.preset,
             args.crf,
+            args.dl_segments,
+            args.use_asset_store,
+            args.asset_store_max_size,
+            args.revalidate,
+            args.max_parallel_dl,
+            args.max_dl_retries,
+            args.max_bandwidth,
+            args.bandwidth_control_file,
+            args.source_dir,
+            args.stream_webcams,
+            args.audio_only_stream,
+            args.disk_budget,
+            args.frame_memory_cap,
+            args.frame_memory_dir,
+            args.cpu_budget,
+            args.ffmpeg_threads,
         ).run()
     Log.info(f'BBB-DL finished and took: {formatSeconds(final_t.duration)}')
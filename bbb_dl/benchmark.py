@@ -0,0 +1,593 @@
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer
+from typing import List
+
+from colorama import just_fix_windows_console
+
+from bbb_dl.main import get_bbb_dl
+from bbb_dl.main import get_parser as get_bbb_dl_parser
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+from bbb_dl.utils import QuietRequestHandler, Timer, format_bytes, formatSeconds, parse_bytes
+
+# BBB like id of generated recordings, it has to match BBBDL.VALID_URL_RE
+GENERATED_RECORDING_ID = 'b3c6dcbe35a3a5a3e5b0d6b3f6e4d2a1c0b9a8f7-1600000000000'
+
+
+@dataclass
+class FaultConfig:
+    """Faults that are injected by the benchmark server. Rates are probabilities per response."""
+
+    # Delay before every response in seconds
+    latency: float = 0.0
+    # Bandwidth of every connection in bytes per second (None = unlimited)
+    bandwidth: int = None
+    # Rate of 429 responses with Retry-After
+    throttle_rate: float = 0.0
+    # Rate of 5xx responses, the status is one of error_statuses
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [503])
+    # Rate of responses whose connection is dropped in the middle of the body
+    drop_rate: float = 0.0
+    # Ignore Range headers like a server without range support
+    no_range: bool = False
+
+
+class ServerStats:
+    """
+    Counts the requests of the benchmark server. A request counts as retry if the last response
+    for the same file and range end was a fault.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.sent_bytes = 0
+        self.statuses = Counter()
+        self.faults = Counter()
+        self.faulted_requests = set()
+
+    def record_request(self, request_key: tuple, status: int, fault: str = None):
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] += 1
+            if request_key in self.faulted_requests:
+                self.retries += 1
+                self.faulted_requests.discard(request_key)
+            if fault is not None:
+                self.faults[fault] += 1
+                self.faulted_requests.add(request_key)
+
+    def add_sent_bytes(self, num_bytes: int):
+        with self.lock:
+            self.sent_bytes += num_bytes
+
+
+class FaultInjectingRequestHandler(QuietRequestHandler):
+    """
+    Serves the recordings directory like the web server of a BBB server: `/presentation/<id>/<file>` is
+    `<recordings_dir>/<id>/<file>`. Supports keep-alive, single byte ranges, If-Range and conditional requests
+    and injects the faults of the server.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    RANGE_RE = re.compile(r'bytes=(?P<start>\d*)-(?P<end>\d*)$')
+    CHUNK_SIZE = 64 * 1024
+
+    def do_GET(self):
+        self.handle_file_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_file_request(send_body=False)
+
+    def pick_fault(self) -> str:
+        faults = self.server.faults
+        with self.server.rng_lock:
+            value = self.server.rng.random()
+        for fault, rate in [
+            ('throttle', faults.throttle_rate),
+            ('error', faults.error_rate),
+            ('drop', faults.drop_rate),
+        ]:
+            if value < rate:
+                return fault
+            value -= rate
+        return None
+
+    def send_empty_response(self, status: int, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def handle_file_request(self, send_body: bool):
+        faults = self.server.faults
+        stats = self.server.stats
+        path = self.path.split('?', 1)[0]
+        range_header = self.headers.get('Range')
+        # Retries of a download or of a segment request the same range end
+        request_key = (path, range_header.rsplit('-', 1)[-1] if range_header is not None else '')
+
+        if faults.latency > 0:
+            time.sleep(faults.latency)
+
+        file_path = None
+        if path.startswith('/presentation/'):
+            file_path = self.translate_path(path[len('/presentation') :])
+        if file_path is None or not os.path.isfile(file_path):
+            stats.record_request(request_key, 404)
+            self.send_error(404)
+            return
+
+        fault = self.pick_fault()
+        if fault == 'throttle':
+            stats.record_request(request_key, 429, fault)
+            self.send_empty_response(429, {'Retry-After': '1'})
+            return
+        if fault == 'error':
+            with self.server.rng_lock:
+                status = self.server.rng.choice(faults.error_statuses)
+            stats.record_request(request_key, status, fault)
+            self.send_empty_response(status)
+            return
+
+        file_stat = os.stat(file_path)
+        size = file_stat.st_size
+        etag = f'"{int(file_stat.st_mtime):x}-{size:x}"'
+        last_modified = formatdate(file_stat.st_mtime, usegmt=True)
+        validator_headers = {'ETag': etag, 'Last-Modified': last_modified}
+
+        if self.is_not_modified(etag, int(file_stat.st_mtime)):
+            stats.record_request(request_key, 304)
+            self.send_empty_response(304, validator_headers)
+            return
+
+        status = 200
+        start, end = 0, size - 1
+        if_range = self.headers.get('If-Range')
+        if range_header is not None and not faults.no_range and if_range in [None, etag, last_modified]:
+            m_obj = self.RANGE_RE.match(range_header.strip())
+            if m_obj is not None and (m_obj.group('start') or m_obj.group('end')):
+                if m_obj.group('start') == '':
+                    # Suffix range, the last <end> bytes
+                    start = max(0, size - int(m_obj.group('end')))
+                else:
+                    start = int(m_obj.group('start'))
+                    if m_obj.group('end') != '':
+                        end = min(end, int(m_obj.group('end')))
+                if start >= size or start > end:
+                    stats.record_request(request_key, 416)
+                    self.send_empty_response(416, {'Content-Range': f'bytes */{size}'})
+                    return
+                status = 206
+
+        length = end - start + 1
+        if fault == 'drop' and (length < 2 or not send_body):
+            fault = None
+        stats.record_request(request_key, status, fault)
+        self.send_response(status)
+        self.send_header('Content-Type', self.guess_type(file_path))
+        self.send_header('Content-Length', str(length))
+        if not faults.no_range:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        for name, value in validator_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if send_body:
+            # A dropped connection sends only the first half of the body
+            self.send_file_range(file_path, start, length // 2 if fault == 'drop' else length)
+        if fault == 'drop':
+            self.close_connection = True
+
+    def is_not_modified(self, etag: str, mtime: int) -> bool:
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError):
+                return False
+        return False
+
+    def send_file_range(self, file_path: str, start: int, length: int):
+        bandwidth = self.server.faults.bandwidth
+        started = time.monotonic()
+        sent = 0
+        try:
+            with open(file_path, 'rb') as file_obj:
+                file_obj.seek(start)
+                while sent < length:
+                    chunk = file_obj.read(min(self.CHUNK_SIZE, length - sent))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if bandwidth is not None:
+                        delay = sent / bandwidth - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the connection, e.g. after a probe
+            self.close_connection = True
+        self.server.stats.add_sent_bytes(sent)
+
+
+class BenchmarkHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, recordings_dir: str, faults: FaultConfig, seed: int = None):
+        self.recordings_dir = recordings_dir
+        self.faults = faults
+        self.stats = ServerStats()
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        super().__init__(server_address, self.create_handler)
+
+    def create_handler(self, request, client_address, server):
+        return FaultInjectingRequestHandler(request, client_address, server, directory=self.recordings_dir)
+
+    def handle_error(self, request, client_address):
+        # Clients that close their connections are expected, e.g. after a dropped response
+        pass
+
+
+class BenchmarkServer:
+    """
+    A local stand-in for the playback server of BBB. It serves a directory of recordings
+    (like /var/bigbluebutton/published/presentation) with the URL layout that bbb-dl expects
+    and injects the faults of the FaultConfig.
+    Usage:
+
+    with BenchmarkServer(recordings_dir, faults) as server:
+        bbb-dl server.get_playback_url(recording_id)
+    """
+
+    def __init__(self, recordings_dir: str, faults: FaultConfig, port: int = 0, seed: int = None):
+        self.recordings_dir = recordings_dir
+        self.faults = faults
+        self.port = port
+        self.seed = seed
+        self.server = None
+        self.thread = None
+
+    def __enter__(self):
+        self.server = BenchmarkHTTPServer(('127.0.0.1', self.port), self.recordings_dir, self.faults, self.seed)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join(timeout=10)
+
+    @property
+    def stats(self) -> ServerStats:
+        return self.server.stats
+
+    def reset_stats(self):
+        self.server.stats = ServerStats()
+
+    def get_playback_url(self, recording_id: str) -> str:
+        return f'http://127.0.0.1:{self.port}/playback/presentation/2.3/{recording_id}'
+
+
+def write_random_file(file_path: str, size: int):
+    PT.make_base_dir(file_path)
+    with open(file_path, 'wb') as file_obj:
+        remaining = size
+        while remaining > 0:
+            chunk_size = min(1024 * 1024, remaining)
+            file_obj.write(os.urandom(chunk_size))
+            remaining -= chunk_size
+
+
+def generate_recording(recordings_dir: str, webcams_size: int, num_slides: int, slide_size: int) -> str:
+    """
+    Generates a synthetic recording with random media data, that has the files and the size profile
+    of a real recording: a few XML files, one large webcams video and many small slide images
+    @return: The id of the generated recording
+    """
+    recording_dir = PT.get_in_dir(recordings_dir, GENERATED_RECORDING_ID)
+    slides_dir = 'presentation/d2d9a672040fbde2a47a10bf6c37b6a4b5ae187f-1600000000001'
+    slide_paths = [f'{slides_dir}/slide-{idx}.png' for idx in range(1, num_slides + 1)]
+
+    xml_files = {
+        'metadata.xml': (
+            '<recording><id>benchmark</id><start_time>1600000000000</start_time><end_time>1600003600000'
+            + '</end_time><meta><meetingName>bbb-dl benchmark</meetingName></meta>'
+            + '<playback><duration>3600000</duration></playback></recording>'
+        ),
+        'shapes.svg': (
+            '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+            + ''.join(
+                f'<image id="image{idx}" in="{idx * 10}" out="{idx * 10 + 10}" xlink:href="{slide_path}"'
+                + ' width="1600" height="900" x="0" y="0"/>'
+                for idx, slide_path in enumerate(slide_paths)
+            )
+            + '</svg>'
+        ),
+        'panzooms.xml': '<recording id="panzoom_events"/>',
+        'cursor.xml': '<recording id="cursor_events"/>',
+        'deskshare.xml': '<recording id="deskshare_events"/>',
+    }
+    for rel_file_path, content in xml_files.items():
+        file_path = PT.get_in_dir(recording_dir, rel_file_path)
+        PT.make_base_dir(file_path)
+        with open(file_path, 'w', encoding='utf-8') as xml_file:
+            xml_file.write(content)
+
+    write_random_file(PT.get_in_dir(recording_dir, 'video/webcams.webm'), webcams_size)
+    for slide_path in slide_paths:
+        write_random_file(PT.get_in_dir(recording_dir, slide_path), slide_size)
+    return GENERATED_RECORDING_ID
+
+
+def get_recording_files(recording_dir: str) -> List[str]:
+    """Returns the rel_file_path of all files of a recording directory"""
+    rel_file_paths = []
+    for dir_path, _, file_names in os.walk(recording_dir):
+        for file_name in file_names:
+            rel_file_path = os.path.relpath(os.path.join(dir_path, file_name), recording_dir)
+            rel_file_paths.append(rel_file_path.replace(os.sep, '/'))
+    return sorted(rel_file_paths)
+
+
+class Benchmark:
+    """
+    Downloads all files of a recording from the local benchmark server with batch_download_from_bbb
+    and reports the throughput and the retries of every round
+    """
+
+    def __init__(self, server: BenchmarkServer, recording_id: str, rounds: int, bbb_dl_args: List[str]):
+        self.server = server
+        self.recording_id = recording_id
+        self.rounds = rounds
+        self.bbb_dl_args = bbb_dl_args
+
+        self.recording_dir = PT.get_in_dir(server.recordings_dir, recording_id)
+        self.dl_jobs = get_recording_files(self.recording_dir)
+        self.file_sizes = {
+            rel_file_path: os.path.getsize(PT.get_in_dir(self.recording_dir, rel_file_path))
+            for rel_file_path in self.dl_jobs
+        }
+
+    async def download_all(self, bbb_dl) -> List[bool]:
+        async with bbb_dl.http_session():
+            return await bbb_dl.batch_download_from_bbb(self.dl_jobs, False)
+
+    def run_round(self, round_num: int) -> float:
+        """Runs one round in a new working directory, returns the throughput in bytes per second"""
+        working_dir = tempfile.mkdtemp(prefix='bbb-dl-benchmark-')
+        try:
+            args = get_bbb_dl_parser().parse_args(
+                [self.server.get_playback_url(self.recording_id), '--working-dir', working_dir, '--output-dir']
+                + [working_dir]
+                + self.bbb_dl_args
+            )
+            bbb_dl = get_bbb_dl(args)
+            self.server.reset_stats()
+            with Timer() as t:
+                dl_results = asyncio.run(self.download_all(bbb_dl))
+        finally:
+            shutil.rmtree(working_dir, ignore_errors=True)
+
+        stats = self.server.stats
+        downloaded = sum(self.file_sizes[rel_file_path] for rel_file_path, ok in zip(self.dl_jobs, dl_results) if ok)
+        throughput = downloaded / max(t.duration, 0.001)
+        Log.info(
+            f'Round {round_num}: {sum(dl_results)} / {len(dl_results)} files, {format_bytes(downloaded)}'
+            + f' in {formatSeconds(t.duration, msec=True)}s, {format_bytes(throughput)}/s,'
+            + f' {stats.requests} requests, {stats.retries} retries, {format_bytes(stats.sent_bytes)} sent'
+        )
+        Log.info(
+            '    Statuses: '
+            + ', '.join(f'{status}: {count}' for status, count in sorted(stats.statuses.items()))
+            + ' | Injected faults: '
+            + (', '.join(f'{fault}: {count}' for fault, count in sorted(stats.faults.items())) or 'none')
+        )
+        return throughput
+
+    def run(self):
+        Log.info(
+            f'Benchmarking {len(self.dl_jobs)} files ({format_bytes(sum(self.file_sizes.values()))})'
+            + f' from {self.server.get_playback_url(self.recording_id)}'
+        )
+        throughputs = [self.run_round(round_num) for round_num in range(1, self.rounds + 1)]
+        Log.success(
+            f'Median throughput of {self.rounds} rounds: {format_bytes(statistics.median(throughputs))}/s'
+            + f' (min {format_bytes(min(throughputs))}/s, max {format_bytes(max(throughputs))}/s)'
+        )
+
+
+def get_parser():
+    """
+    Creates a new argument parser.
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            'Serves a BBB recording from a local stand-in server that injects faults, and benchmarks the downloads'
+            + ' of bbb-dl against it. All unknown options are passed to bbb-dl (e.g. --dl-segments 8)'
+        )
+    )
+
+    parser.add_argument(
+        '-rd',
+        '--recording-dir',
+        type=str,
+        default=None,
+        help=(
+            'Path to a published recording directory (e.g. /var/bigbluebutton/published/presentation/<id>) that'
+            + ' is served. If it is not set, a synthetic recording is generated'
+        ),
+    )
+    parser.add_argument(
+        '--webcams-size',
+        type=str,
+        default='256M',
+        help='Size of the webcams video of the generated recording (default 256M)',
+    )
+    parser.add_argument(
+        '--num-slides',
+        type=int,
+        default=200,
+        help='Number of slide images of the generated recording (default 200)',
+    )
+    parser.add_argument(
+        '--slide-size',
+        type=str,
+        default='100K',
+        help='Size of each slide image of the generated recording (default 100K)',
+    )
+
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0,
+        help='Delay of every response in milliseconds',
+    )
+    parser.add_argument(
+        '--bandwidth',
+        type=str,
+        default=None,
+        help='Bandwidth of every connection to the server (e.g. 5M, default unlimited)',
+    )
+    parser.add_argument(
+        '--throttle-rate',
+        type=float,
+        default=0,
+        help='Rate of responses that are answered with 429 Too Many Requests (e.g. 0.05)',
+    )
+    parser.add_argument(
+        '--error-rate',
+        type=float,
+        default=0,
+        help='Rate of responses that are answered with a 5xx status (e.g. 0.05)',
+    )
+    parser.add_argument(
+        '--error-statuses',
+        type=str,
+        default='503',
+        help='Comma separated list of the injected 5xx statuses (default 503)',
+    )
+    parser.add_argument(
+        '--drop-rate',
+        type=float,
+        default=0,
+        help='Rate of responses whose connection is dropped in the middle of the body (e.g. 0.05)',
+    )
+    parser.add_argument(
+        '--no-range',
+        action='store_true',
+        help='Ignore Range headers, like a server without range support',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Seed of the fault injection, to repeat a benchmark with the same faults',
+    )
+
+    parser.add_argument(
+        '--rounds',
+        type=int,
+        default=3,
+        help='Number of download rounds (default 3)',
+    )
+    parser.add_argument(
+        '-p',
+        '--port',
+        type=int,
+        default=0,
+        help='Port of the server (default: a free port)',
+    )
+    parser.add_argument(
+        '--serve-only',
+        action='store_true',
+        help='Only start the server and print the URL of the recording, e.g. to test bbb-dl or bbb-dl-batch with it',
+    )
+
+    return parser
+
+
+def parse_size_option(value: str, option_name: str) -> int:
+    size = parse_bytes(value)
+    if size is None:
+        Log.error(f'Error: Invalid size "{value}" for {option_name}, use e.g. 500K, 2M or 1G')
+        exit(1)
+    return size
+
+
+# --- called at the program invocation: -------------------------------------
+def main(args=None):
+    just_fix_windows_console()
+    args, bbb_dl_args = get_parser().parse_known_args(args)
+
+    faults = FaultConfig(
+        latency=args.latency / 1000,
+        bandwidth=parse_size_option(args.bandwidth, '--bandwidth') or None if args.bandwidth is not None else None,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        error_statuses=[int(status) for status in args.error_statuses.split(',')],
+        drop_rate=args.drop_rate,
+        no_range=args.no_range,
+    )
+
+    generated_dir = None
+    if args.recording_dir is not None:
+        recording_dir = PT.get_abs_path(args.recording_dir)
+        if not os.path.isdir(recording_dir):
+            Log.error(f'Error: The recording directory {recording_dir} does not exist')
+            exit(1)
+        recordings_dir, recording_id = os.path.split(recording_dir)
+    else:
+        generated_dir = tempfile.mkdtemp(prefix='bbb-dl-benchmark-recording-')
+        recordings_dir = generated_dir
+        Log.info('Generating synthetic recording...')
+        recording_id = generate_recording(
+            recordings_dir,
+            parse_size_option(args.webcams_size, '--webcams-size'),
+            args.num_slides,
+            parse_size_option(args.slide_size, '--slide-size'),
+        )
+
+    try:
+        with BenchmarkServer(recordings_dir, faults, args.port, args.seed) as server:
+            if args.serve_only:
+                Log.success(f'Serving {recording_id} at: {server.get_playback_url(recording_id)}')
+                Log.info('Press Ctrl+C to stop the server')
+                try:
+                    while True:
+                        time.sleep(3600)
+                except KeyboardInterrupt:
+                    pass
+            else:
+                Benchmark(server, recording_id, max(1, args.rounds), bbb_dl_args).run()
+    finally:
+        if generated_dir is not None:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import glob
+import os
+
+from bbb_dl.locks import FileLock
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+from bbb_dl.utils import format_bytes
+
+
+class DiskBudget:
+    """
+    Budget for the temporary files of all bbb-dl processes that use the same working directory.
+    Every job reserves its estimated peak usage before it downloads the large files, and waits until
+    the reservations of the other jobs leave enough room. A reservation is a file with its size, next to a
+    lock file that the job holds while it runs, so reservations of crashed jobs are detected and removed.
+    """
+
+    poll_interval = 5
+
+    def __init__(self, budget_dir: str, max_size: int, verbose: bool):
+        self.budget_dir = budget_dir
+        self.max_size = max_size
+        self.verbose = verbose
+        PT.make_dirs(budget_dir)
+        self.lock_path = PT.get_in_dir(budget_dir, 'budget.lock')
+        self.reservation_path = None
+        self.reservation_lock = None
+
+    def get_reserved(self) -> int:
+        """Sums up the reservations of the running jobs, reservations of stopped jobs are removed"""
+        reserved = 0
+        for reservation_path in glob.glob(PT.get_in_dir(self.budget_dir, '*.reservation')):
+            if reservation_path == self.reservation_path:
+                continue
+            lock = FileLock(reservation_path + '.lock')
+            if lock.try_acquire():
+                # The job that made the reservation is not running anymore
+                lock.release()
+                self.remove_files(reservation_path)
+                continue
+            try:
+                with open(reservation_path, 'r', encoding='utf-8') as reservation_file:
+                    reserved += int(reservation_file.read())
+            except (OSError, ValueError):
+                pass
+        return reserved
+
+    @staticmethod
+    def remove_files(reservation_path: str):
+        for path in [reservation_path, reservation_path + '.lock']:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def try_reserve(self, name: str, size: int) -> bool:
+        with FileLock(self.lock_path):
+            if self.get_reserved() + size > self.max_size:
+                return False
+            self.reservation_path = PT.get_in_dir(self.budget_dir, f'{name}-{os.getpid()}.reservation')
+            self.reservation_lock = FileLock(self.reservation_path + '.lock')
+            self.reservation_lock.acquire()
+            with open(self.reservation_path, 'w', encoding='utf-8') as reservation_file:
+                reservation_file.write(str(size))
+        return True
+
+    async def reserve(self, name: str, size: int):
+        """Waits until `size` bytes of the budget are free and reserves them for this job"""
+        waiting = False
+        while not self.try_reserve(name, size):
+            if not waiting:
+                Log.info(
+                    f'Waiting until {format_bytes(size)} of the disk budget ({format_bytes(self.max_size)})'
+                    + ' are no longer reserved by other bbb-dl processes...'
+                )
+                waiting = True
+            await asyncio.sleep(self.poll_interval)
+        if self.verbose:
+            Log.debug(f'Reserved {format_bytes(size)} of the disk budget')
+
+    def release(self):
+        if self.reservation_path is not None:
+            self.reservation_lock.release()
+            self.remove_files(self.reservation_path)
+            self.reservation_path = None
+            self.reservation_lock = None
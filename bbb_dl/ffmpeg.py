@@ -1,10 +1,11 @@
+import asyncio
 import json
 import os
 import subprocess
 from dataclasses import dataclass
 from itertools import cycle
 from subprocess import CalledProcessError
-from typing import List
+from typing import Dict, List, Tuple
 
 from ffmpeg import Progress
 from ffmpeg.asyncio import FFmpeg
@@ -23,7 +24,9 @@ class VideoInfo:
 
 
 class FFMPEG:
-    def __init__(self, verbose: bool, ffmpeg_location: str, encoder: str, audiocodec: str, preset: str, crf: int):
+    def __init__(
+        self, verbose: bool, ffmpeg_location: str, encoder: str, audiocodec: str, preset: str, crf: int, threads: int
+    ):
         self.verbose = verbose
         self.ffmpeg_path = 'ffmpeg'
         self.ffprobe_path = 'ffprobe'
@@ -53,8 +56,14 @@ class FFMPEG:
         self.audiocodec = audiocodec
         self.preset = preset
         self.crf = crf
+        # Threads per encoding, the thread count does not change the quality of the output
+        self.threads = threads
         self.stderr_log = []
 
+    def get_encoding_options(self) -> Dict[str, str]:
+        """Options that change the output of every encoding"""
+        return {'encoder': self.encoder, 'audiocodec': self.audiocodec, 'preset': self.preset, 'crf': str(self.crf)}
+
     def on_error(self, code: int):
         if self.verbose:
             for line in self.stderr_log:
@@ -89,12 +98,14 @@ class FFMPEG:
             if line.find('bitrate=') == -1 and line.find('time=') == -1:
                 self.stderr_log.append(line)
 
-    def add_standard_handlers(self, ffmpeg_obj):
+    def add_standard_handlers(self, ffmpeg_obj, show_progress: bool = True):
+        """Runs next to other stages or downloads do not show their progress, to not disturb the other status lines"""
         ffmpeg_obj.on("start", self.on_start)
         ffmpeg_obj.on("error", self.on_error)
-        ffmpeg_obj.on("progress", self.on_progress)
         ffmpeg_obj.on("stderr", self.on_log_stderr)
-        ffmpeg_obj.on("completed", self.on_completed)
+        if show_progress:
+            ffmpeg_obj.on("progress", self.on_progress)
+            ffmpeg_obj.on("completed", self.on_completed)
 
     def get_video_infos(self, video_path: str) -> VideoInfo:
         try:
@@ -128,15 +139,16 @@ class FFMPEG:
             print(f"Error: {err}")
             exit(-10)
 
-    async def freeze_detect(self, video_path: str) -> bool:
+    async def freeze_detect(self, video_path: str, stream: asyncio.StreamReader = None) -> bool:
         """
         return true if video is 100% freezed
+        If a stream is given, the video is read from it instead of from video_path
         """
         ffmpeg = (
             FFmpeg(self.ffmpeg_path)
             .option("hide_banner")
             # .option("nostats")
-            .input(video_path)
+            .input(video_path if stream is None else 'pipe:0')
             .output(
                 '-',
                 vf='freezedetect=n=-60dB:d=2',
@@ -157,98 +169,111 @@ class FFMPEG:
                 start = float(line.rsplit('lavfi.freezedetect.freeze_start: ', 1)[1])
                 freeze_starts.append(start)
 
-        self.add_standard_handlers(ffmpeg)
+        # Runs next to the capturing of the frames
+        self.add_standard_handlers(ffmpeg, False)
 
-        await ffmpeg.execute()
+        await ffmpeg.execute(stream)
         if len(freeze_ends) == 0 and len(freeze_starts) == 1 and freeze_starts[0] <= 10:
             return True
         return False
 
-    async def create_slideshow(self, concat_file_path: str, output_path: str):
-        ffmpeg = (
-            FFmpeg(self.ffmpeg_path)
-            .option("hide_banner")
-            .input(
-                concat_file_path,
-                f='concat',
-                # safe='0',
-                # hwaccel="auto",  # In tests it was slower with hwaccel
-            )
-            .output(
-                output_path,
-                {
-                    'c:v': self.encoder,
-                    'c:a': self.audiocodec,
-                },
-                framerate='24',
-                r='24',
-                pix_fmt='yuv420p',
-                # g='1',  # activate intra frame codec
-                strict='experimental',
-                crf=self.crf,
-                preset=self.preset,
-            )
-        )
-        self.add_standard_handlers(ffmpeg)
+    def get_command(self, inputs: List[Tuple[str, Dict]], output_options: Dict) -> Dict:
+        """
+        Describes an encoding as a JSON serializable dict, so that it can be stored in a render plan and run later,
+        possibly on another machine. The output path is chosen when the command is run.
+        """
+        return {
+            'inputs': [{'path': path, 'options': options} for path, options in inputs],
+            'output_options': output_options,
+        }
+
+    async def run_command(self, command: Dict, output_path: str, base_dir: str = None, show_progress: bool = True):
+        """Runs a command of `get_command`, relative input paths are resolved against base_dir"""
+        ffmpeg = FFmpeg(self.ffmpeg_path).option("hide_banner")
+        for command_input in command['inputs']:
+            input_path = command_input['path']
+            if base_dir is not None:
+                input_path = PT.get_in_dir(base_dir, input_path)
+            ffmpeg = ffmpeg.input(input_path, dict(command_input['options']))
+
+        output_options = dict(command['output_options'])
+        if 'threads' in output_options:
+            # The thread count belongs to the machine that runs the encoding, not to the one that planned it
+            output_options['threads'] = self.threads
+        ffmpeg = ffmpeg.output(output_path, output_options)
+        self.add_standard_handlers(ffmpeg, show_progress)
 
         await ffmpeg.execute()
 
-    async def resize_deskshare(self, deskshare_path: str, resized_deskshare_path: str, width: int, height: int):
-        ffmpeg = (
-            FFmpeg(self.ffmpeg_path)
-            .option("hide_banner")
-            .input(
-                deskshare_path,
-                # hwaccel="auto", # Use encoder to activate hwaccel
-            )
-            .output(
-                resized_deskshare_path,
-                {
-                    'c:v': self.encoder,
-                    'c:a': self.audiocodec,
-                },
-                vf=(
+    def get_encoding_output_options(self) -> Dict:
+        return {
+            'c:v': self.encoder,
+            'c:a': self.audiocodec,
+            'strict': 'experimental',
+            'crf': self.crf,
+            'preset': self.preset,
+            'threads': self.threads,
+        }
+
+    def get_create_slideshow_command(self, concat_file_path: str) -> Dict:
+        return self.get_command(
+            [
+                (
+                    concat_file_path,
+                    {
+                        'f': 'concat',
+                        # Frames in memory are referenced by absolute paths
+                        'safe': '0',
+                        # 'hwaccel': 'auto',  # In tests it was slower with hwaccel
+                    },
+                )
+            ],
+            {
+                **self.get_encoding_output_options(),
+                'framerate': '24',
+                'r': '24',
+                'pix_fmt': 'yuv420p',
+                # 'g': '1',  # activate intra frame codec
+            },
+        )
+
+    def get_resize_deskshare_command(self, deskshare_path: str, width: int, height: int) -> Dict:
+        return self.get_command(
+            [
+                (
+                    deskshare_path,
+                    {
+                        # 'hwaccel': 'auto', # Use encoder to activate hwaccel
+                    },
+                )
+            ],
+            {
+                **self.get_encoding_output_options(),
+                'vf': (
                     f'scale=w={width}:h={height}:force_original_aspect_ratio=decrease,'
                     + f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=white'
                 ),
-                strict='experimental',
-                crf=self.crf,
-                preset=self.preset,
-                framerate='24',
-                r='24',
-                pix_fmt='yuv420p',
-                # g='1',  # activate intra frame codec
-            )
+                'framerate': '24',
+                'r': '24',
+                'pix_fmt': 'yuv420p',
+                # 'g': '1',  # activate intra frame codec
+            },
         )
 
-        self.add_standard_handlers(ffmpeg)
-
-        await ffmpeg.execute()
-
-    async def add_deskshare_to_slideshow(self, concat_file_path: str, output_path: str):
-        ffmpeg = (
-            FFmpeg(self.ffmpeg_path)
-            .option("hide_banner")
-            .input(
-                concat_file_path,
-                f='concat',
-                # safe='0',
-                # hwaccel="auto",   # In tests it was slower with hwaccel
-            )
-            .output(
-                output_path,
-                {
-                    'c:v': self.encoder,
-                    'c:a': self.audiocodec,
-                },
-                strict='experimental',
-                crf=self.crf,
-                preset=self.preset,
-            )
+    def get_add_deskshare_command(self, concat_file_path: str) -> Dict:
+        return self.get_command(
+            [
+                (
+                    concat_file_path,
+                    {
+                        'f': 'concat',
+                        # 'safe': '0',
+                        # 'hwaccel': 'auto',   # In tests it was slower with hwaccel
+                    },
+                )
+            ],
+            self.get_encoding_output_options(),
         )
-        self.add_standard_handlers(ffmpeg)
-
-        await ffmpeg.execute()
 
     def get_webcam_size(self, slideshow_width, slideshow_height):
         webcam_width = slideshow_width // 5
@@ -264,69 +289,43 @@ class FFMPEG:
 
         return webcam_width, webcam_height
 
-    async def add_webcam_to_slideshow(
+    def get_add_webcam_command(
         self,
         slideshow_path: str,
         webcams_path: str,
         slideshow_width: int,
         slideshow_height: int,
-        result_path: str,
-    ):
+    ) -> Dict:
         webcam_width, webcam_height = self.get_webcam_size(slideshow_width, slideshow_height)
 
-        ffmpeg = (
-            FFmpeg(self.ffmpeg_path)
-            .option("hide_banner")
-            .input(webcams_path)
-            .input(slideshow_path)
-            .output(
-                result_path,
-                {
-                    'c:v': self.encoder,
-                    'c:a': self.audiocodec,
-                },
-                filter_complex=(
+        return self.get_command(
+            [(webcams_path, {}), (slideshow_path, {})],
+            {
+                **self.get_encoding_output_options(),
+                'filter_complex': (
                     f'[0:v]scale={webcam_width}:{webcam_height},setpts=PTS-STARTPTS,'
                     + 'format=rgba,colorchannelmixer=aa=0.8'
                     + '[ovrl];[1:v]fps=24,setpts=PTS-STARTPTS[bg];[bg][ovrl]overlay=W-w:H-h:shortest=1'
                 ),
-                strict='experimental',
-                crf=self.crf,
-                preset=self.preset,
-            )
+            },
         )
-        self.add_standard_handlers(ffmpeg)
-
-        await ffmpeg.execute()
 
-    async def add_audio_to_slideshow(self, slideshow_path: str, webcams_path: str, result_path: str):
-        ffmpeg = (
-            FFmpeg(self.ffmpeg_path)
-            .option("hide_banner")
-            .input(webcams_path)
-            .input(slideshow_path)
-            .output(
-                result_path,
-                {
-                    'c:v': self.encoder,
-                    'c:a': self.audiocodec,
-                },
-                map=['0:a', '1:v'],
-                strict='experimental',
-                crf=self.crf,
-                preset=self.preset,
-                shortest=None,
-            )
+    def get_add_audio_command(self, slideshow_path: str, webcams_path: str) -> Dict:
+        return self.get_command(
+            [(webcams_path, {}), (slideshow_path, {})],
+            {
+                **self.get_encoding_output_options(),
+                'map': ['0:a', '1:v'],
+                'shortest': None,
+            },
         )
-        self.add_standard_handlers(ffmpeg)
 
-        await ffmpeg.execute()
-
-    async def extract_audio(self, webcams_path: str, result_path: str):
+    async def extract_audio(self, webcams_path: str, result_path: str, stream: asyncio.StreamReader = None):
+        """If a stream is given, the audio is read from it instead of from webcams_path"""
         ffmpeg = (
             FFmpeg(self.ffmpeg_path)
             .option("hide_banner")
-            .input(webcams_path)
+            .input(webcams_path if stream is None else 'pipe:0')
             .output(
                 result_path,
                 {
@@ -335,6 +334,6 @@ class FFMPEG:
                 },
             )
         )
-        self.add_standard_handlers(ffmpeg)
+        self.add_standard_handlers(ffmpeg, stream is None)
 
-        await ffmpeg.execute()
+        await ffmpeg.execute(stream)
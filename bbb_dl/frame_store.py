@@ -0,0 +1,88 @@
+import os
+import shutil
+
+from bbb_dl.utils import PathTools as PT
+
+
+class FrameStore:
+    """
+    Decides where the captured frames are stored. Frames go into a memory backed directory (a tmpfs like /dev/shm)
+    until `memory_cap` bytes are used there, further frames spill into the frames directory in the working directory.
+    Frames are looked up in both directories, so the slideshow reads each frame from wherever it landed.
+    Without a memory directory all frames are stored in the frames directory.
+    """
+
+    def __init__(self, disk_dir: str, memory_dir: str = None, memory_cap: int = 0, frame_size: int = 0):
+        self.disk_dir = disk_dir
+        self.memory_dir = memory_dir
+        self.memory_cap = memory_cap
+        # Expected size of a frame, until the average size of the captured frames is known
+        self.frame_size = frame_size
+        self.captured_count = 0
+        self.captured_size = 0
+        # Bytes in the memory directory, including the expected sizes of the frames that are being captured
+        self.memory_used = 0
+        self.expected_sizes = {}
+        if memory_dir is not None:
+            PT.make_dirs(memory_dir)
+            self.count_memory_used()
+
+    def count_memory_used(self):
+        """Counts the frames in memory again, e.g. after another process captured frames of the same key"""
+        self.memory_used = sum(self.expected_sizes.values())
+        if self.memory_dir is not None:
+            for entry in os.scandir(self.memory_dir):
+                if entry.is_file():
+                    self.memory_used += entry.stat().st_size
+
+    def find(self, capture_filename: str) -> str:
+        """@return: The path of a frame that was captured before, None if it needs to be captured"""
+        for frames_dir in [self.memory_dir, self.disk_dir]:
+            if frames_dir is not None:
+                capture_path = PT.get_in_dir(frames_dir, capture_filename)
+                if os.path.isfile(capture_path):
+                    return capture_path
+        return None
+
+    def get_expected_size(self) -> int:
+        if self.captured_count > 0:
+            return self.captured_size // self.captured_count
+        return self.frame_size
+
+    def allocate(self, capture_filename: str) -> str:
+        """@return: The path that a new frame is captured to"""
+        if self.memory_dir is not None:
+            expected_size = self.get_expected_size()
+            free_memory = shutil.disk_usage(self.memory_dir).free
+            # The tmpfs may be smaller than the cap or shared with other programs
+            if self.memory_used + expected_size <= self.memory_cap and expected_size * 2 < free_memory:
+                capture_path = PT.get_in_dir(self.memory_dir, capture_filename)
+                self.memory_used += expected_size
+                self.expected_sizes[capture_path] = expected_size
+                return capture_path
+        return PT.get_in_dir(self.disk_dir, capture_filename)
+
+    def add_captured(self, capture_path: str):
+        """Replaces the expected size of a captured frame by its real size"""
+        size = os.path.getsize(capture_path)
+        if self.is_in_memory(capture_path):
+            self.memory_used += size - self.expected_sizes.pop(capture_path, 0)
+        self.captured_count += 1
+        self.captured_size += size
+
+    def is_in_memory(self, capture_path: str) -> bool:
+        return self.memory_dir is not None and os.path.dirname(capture_path) == self.memory_dir
+
+    def prune_memory(self):
+        """Removes the frames in memory of other frame keys of the recording"""
+        if self.memory_dir is None:
+            return
+        recording_dir = os.path.dirname(self.memory_dir)
+        for entry in os.scandir(recording_dir):
+            if entry.path != self.memory_dir:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def remove_memory(self):
+        if self.memory_dir is not None:
+            shutil.rmtree(self.memory_dir, ignore_errors=True)
+            self.memory_used = 0
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import List
+
+from bbb_dl.locks import FileLock
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+from bbb_dl.utils import format_bytes
+
+
+def read_first_line(path: str) -> str:
+    try:
+        with open(path, 'r', encoding='utf-8') as limit_file:
+            return limit_file.readline().strip()
+    except OSError:
+        return None
+
+
+def get_cpu_limit() -> int:
+    """
+    Number of CPUs that this process can use: the CPU quota of the cgroup (e.g. of a container) or
+    the CPUs the process is allowed to run on, whichever is smaller
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = read_first_line('/sys/fs/cgroup/cpu.max')
+    if cpu_max is not None and not cpu_max.startswith('max'):
+        try:
+            quota_us, period_us = cpu_max.split()
+            quota = int(quota_us) / int(period_us)
+        except ValueError:
+            pass
+    # cgroup v1: the quota is -1 if it is not limited
+    quota_us = read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period_us = read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota is None and quota_us is not None and period_us is not None:
+        try:
+            if int(quota_us) > 0:
+                quota = int(quota_us) / int(period_us)
+        except ValueError:
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def get_memory_limit() -> int:
+    """Memory that this process can use in bytes: the memory limit of the cgroup or the physical memory"""
+    limit = None
+    try:
+        limit = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    for limit_path in ['/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes']:
+        cgroup_limit = read_first_line(limit_path)
+        try:
+            # "max" (v2) or a huge number (v1) if the memory is not limited
+            if cgroup_limit is not None and int(cgroup_limit) < (limit or 2**62):
+                limit = int(cgroup_limit)
+        except ValueError:
+            pass
+    return limit
+
+
+class ResourceGovernor:
+    """
+    Shares a CPU budget between the capture and encode stages of all bbb-dl processes that use the same
+    working directory (e.g. several bbb-dl-batch workers). The budget is a number of CPU slots, each slot is
+    a lock file. A Chromium instance takes one slot, an ffmpeg encoding takes one slot per thread.
+    The slots of a crashed process are free again, because its locks are released by the operating system.
+    """
+
+    poll_interval = 0.5
+    # Memory that one Chromium instance needs while capturing frames
+    CHROME_MEMORY = 512 * 1024 * 1024
+
+    def __init__(self, budget_dir: str, cpu_budget: int, verbose: bool):
+        self.budget_dir = budget_dir
+        self.cpu_budget = max(1, cpu_budget)
+        self.verbose = verbose
+        PT.make_dirs(budget_dir)
+        self.lock_path = PT.get_in_dir(budget_dir, 'budget.lock')
+
+    @classmethod
+    def get_default_chromes(cls, cpus: int, memory: int) -> int:
+        chromes = cpus
+        if memory is not None:
+            chromes = min(chromes, memory // cls.CHROME_MEMORY)
+        return max(1, chromes)
+
+    @staticmethod
+    def get_default_threads(cpus: int, parallel_encodings: int) -> int:
+        """Threads per ffmpeg encoding, so that the encodings that run at the same time use all CPUs"""
+        return max(1, cpus // parallel_encodings)
+
+    @staticmethod
+    def log_limits(cpus: int, memory: int):
+        memory_text = format_bytes(memory) if memory is not None else 'unknown'
+        Log.debug(f'Available CPUs: {cpus}, available memory: {memory_text}')
+
+    def try_acquire(self, slots: int) -> List[FileLock]:
+        """Acquires all or none of the slots, so that processes do not block each other with half of their slots"""
+        acquired = []
+        with FileLock(self.lock_path):
+            for idx in range(self.cpu_budget):
+                lock = FileLock(PT.get_in_dir(self.budget_dir, f'cpu-{idx}.lock'))
+                if lock.try_acquire():
+                    acquired.append(lock)
+                    if len(acquired) == slots:
+                        return acquired
+        for lock in acquired:
+            lock.release()
+        return None
+
+    @asynccontextmanager
+    async def cpu(self, slots: int, name: str = None):
+        """Waits until `slots` CPU slots are free and holds them, a request larger than the budget takes all slots"""
+        slots = min(max(1, slots), self.cpu_budget)
+        waiting = False
+        acquired = self.try_acquire(slots)
+        while acquired is None:
+            if not waiting and self.verbose and name is not None:
+                Log.debug(f'Waiting for {slots} free CPU slots for {name}')
+            waiting = True
+            await asyncio.sleep(self.poll_interval)
+            acquired = self.try_acquire(slots)
+        try:
+            yield
+        finally:
+            for lock in acquired:
+                lock.release()
@@ -0,0 +1,136 @@
+import asyncio
+import errno
+
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+if fcntl is not None:
+    # flock fails with these errors if a non blocking lock is held by another process
+    CONTENDED_ERRNOS = {errno.EWOULDBLOCK, errno.EAGAIN}
+else:
+    # msvcrt.locking fails with EACCES if the lock is held, and with EDEADLOCK after retrying for 10 seconds
+    CONTENDED_ERRNOS = {errno.EACCES, errno.EDEADLOCK}
+
+
+class FileLock:
+    """
+    Advisory lock on a lock file, to coordinate bbb-dl processes that share a working directory.
+    A shared lock can be held by several processes at once, an exclusive lock only by one.
+    On Windows all locks are exclusive.
+    Usage:
+
+    async with FileLock(lock_path, 'the slideshow'):
+        ...
+    """
+
+    poll_interval = 0.5
+
+    def __init__(self, lock_path: str, name: str = None):
+        self.lock_path = lock_path
+        self.name = name
+        self.file_obj = None
+        self.locked = False
+
+    def open(self):
+        if self.file_obj is None:
+            PT.make_base_dir(self.lock_path)
+            self.file_obj = open(self.lock_path, 'a+b')
+
+    def lock(self, shared: bool, blocking: bool):
+        if fcntl is not None:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(self.file_obj.fileno(), flags if blocking else flags | fcntl.LOCK_NB)
+        elif not self.locked:
+            self.file_obj.seek(0)
+            msvcrt.locking(self.file_obj.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+
+    def try_acquire(self, shared: bool = False) -> bool:
+        """
+        Acquires the lock if it is free, a held shared lock can be converted to an exclusive lock.
+        The conversion is not atomic: flock drops the shared lock before it tries the exclusive one, so if that
+        fails the shared lock is taken again and another process may have held the lock exclusively in between.
+        """
+        self.open()
+        try:
+            self.lock(shared, False)
+        except OSError as err:
+            if not self.locked:
+                self.close()
+            elif not shared and fcntl is not None:
+                self.relock_shared()
+            if err.errno not in CONTENDED_ERRNOS:
+                # e.g. the file system does not support locks
+                raise
+            return False
+        self.locked = True
+        return True
+
+    def relock_shared(self):
+        """Takes the shared lock again, that a failed conversion to an exclusive lock dropped"""
+        try:
+            self.lock(True, True)
+        except OSError:
+            self.locked = False
+            self.close()
+            raise
+
+    def acquire(self, shared: bool = False):
+        """Blocks until the lock is acquired, only for locks that are held for a short time"""
+        self.open()
+        while True:
+            try:
+                # On Windows this only retries for 10 seconds
+                self.lock(shared, True)
+                break
+            except OSError as err:
+                if err.errno not in CONTENDED_ERRNOS:
+                    self.close()
+                    raise
+        self.locked = True
+
+    async def acquire_async(self, shared: bool = False):
+        """Waits on the event loop until the lock is acquired"""
+        waiting = False
+        while not self.try_acquire(shared):
+            if not waiting and self.name is not None:
+                Log.info(f'Waiting for another bbb-dl process that is working on {self.name}...')
+            waiting = True
+            await asyncio.sleep(self.poll_interval)
+        if waiting and self.name is not None:
+            Log.info(f'The other bbb-dl process finished {self.name}')
+
+    def close(self):
+        if self.file_obj is not None:
+            self.file_obj.close()
+            self.file_obj = None
+
+    def release(self):
+        if self.locked:
+            if fcntl is not None:
+                fcntl.flock(self.file_obj.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file_obj.seek(0)
+                msvcrt.locking(self.file_obj.fileno(), msvcrt.LK_UNLCK, 1)
+            self.locked = False
+        self.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *args):
+        self.release()
@@ -8,7 +8,8 @@ import os
 import re
 import shutil
 import traceback
-from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from enum import Enum
 from functools import partial
@@ -17,34 +18,49 @@ from io import StringIO
 from itertools import cycle
 from pathlib import Path
 from threading import Thread
-from typing import Any, Dict, List, Tuple
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 from xml.etree import ElementTree as ET
-from xml.etree.ElementTree import Element, ParseError
+from xml.etree.ElementTree import ParseError
 
-import aiofiles
 import aiohttp
 from aiohttp.client_exceptions import ClientError, ClientResponseError
 from colorama import just_fix_windows_console
 from playwright.async_api import async_playwright
 from playwright.async_api._generated import Page
 
+from bbb_dl.disk_budget import DiskBudget
 from bbb_dl.ffmpeg import FFMPEG
+from bbb_dl.frame_store import FrameStore
+from bbb_dl.governor import ResourceGovernor, get_cpu_limit, get_memory_limit
+from bbb_dl.locks import FileLock
+from bbb_dl.manifest import DownloadManifest, hash_file
+from bbb_dl.progress import DownloadProgress
+from bbb_dl.render_plan import load_render_plan, write_concat_file, write_render_plan
+from bbb_dl.scheduler import StageScheduler
+from bbb_dl.sources import LocalDirectorySource
+from bbb_dl.stage_cache import FileHashCache, StageCache
+from bbb_dl.store import AssetStore
+from bbb_dl.stream_parser import ParsedShapes, TimedEvent, parse_shapes, parse_timed_events
+from bbb_dl.streaming import ChunkStreamReader, DownloadStream, GrowingFileReader, StreamBrokenError
+from bbb_dl.throttling import AdaptiveLimiter, BackoffPolicy, HostCircuitBreaker, TokenBucket
 from bbb_dl.utils import KNOWN_VIDEO_AUDIO_EXTENSIONS, BBBDLCookieJar, Log
 from bbb_dl.utils import PathTools as PT
 from bbb_dl.utils import (
     QuietRequestHandler,
     SslHelper,
     Timer,
-    _s,
-    _x,
     append_get_idx,
     convert_to_aiohttp_cookie_jar,
     format_bytes,
     formatSeconds,
     get_free_port,
+    parse_bytes,
     xpath_text,
 )
 from bbb_dl.version import __version__
+from bbb_dl.writer import ChunkWriter, preallocate
 
 
 class ActionType(Enum):
@@ -92,10 +108,29 @@ class Deskshare:
     height: int
 
 
+@dataclass
+class Media:
+    webcams_rel_path: str
+    deskshare_rel_path: str = None
+
+
+@dataclass
+class Slides:
+    frames: Dict[float, Frame]
+    only_zooms: Dict[float, Frame]
+    partitions: List[Tuple]
+    # Key of the captured frames, they are stored in a frames directory per key
+    key: str
+
+
 class ContentRangeError(ConnectionError):
     pass
 
 
+class IncompleteDownloadError(ConnectionError):
+    pass
+
+
 class BBBDL:
     VALID_URL_RE = re.compile(
         r'''(?x)
@@ -106,6 +141,48 @@ class BBBDL:
         '''
     )
     NUMBER_RE = re.compile(r'\d+')
+    CONTENT_RANGE_RE = re.compile(r'bytes\s+(?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+|\*)')
+
+    # Number of stages of each resource class that run at the same time
+    RESOURCE_LIMITS = {'network': 2, 'browser': 1, 'encoder': 2}
+
+    # Rough sizes for the estimate of the peak disk usage, they are chosen rather too large
+    FRAME_BYTES_PER_PIXEL = 0.2
+    SLIDESHOW_BYTES_PER_SECOND = 64 * 1024
+    MEDIA_BYTES_PER_SECOND = 256 * 1024
+    DEFAULT_SLIDESHOW_SIZE = (1920, 1080)
+
+    # 408 (timeout), 409 (conflict), 429 (too many requests) and 503 (service unavailable) are retried
+    RETRY_STATUSES = [408, 409, 429, 503]
+    # Statuses that signal that the server is overloaded or throttles us
+    THROTTLE_STATUSES = [408, 429, 503]
+
+    # Files of the recording that are read by the stages of the render pipeline
+    STAGE_ASSETS = {
+        'parse_metadata': ['metadata.xml'],
+        'parse_slides_data': ['shapes.svg', 'panzooms.xml'],
+        'parse_cursors': ['cursor.xml'],
+        'parse_deskshare_data': ['deskshare.xml'],
+    }
+    # Files of the recording that no stage reads, they are only downloaded for backups
+    BACKUP_ASSETS = [
+        'captions.json',
+        'events.xml',
+        'presentation_text.json',
+        'slides_new.xml',
+        'notes.html',
+        'polls.json',
+        'external_videos.json',
+    ]
+    # Variants of the media files in priority order, only the first one that the server has is downloaded
+    WEBCAMS_VARIANTS = ['video/webcams.webm', 'video/webcams.mp4']
+    DESKSHARE_VARIANTS = ['deskshare/deskshare.webm', 'deskshare/deskshare.mp4']
+    # Large media files that are downloaded over multiple connections if the server supports ranges
+    SEGMENTED_DL_FILES = WEBCAMS_VARIANTS + DESKSHARE_VARIANTS
+    # Files of the slides that a recording may not have, they are downloaded with the meta information
+    OPTIONAL_SLIDES_ASSETS = ['panzooms.xml', 'cursor.xml']
+    # Size of the reads from the network, received data is written to disk in blocks of several chunks
+    DL_CHUNK_SIZE = 1024 * 1024
 
     headers = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -139,6 +216,24 @@ class BBBDL:
         force_height: int,
         preset: str,
         crf: str,
+        dl_segments: int,
+        use_asset_store: bool,
+        asset_store_max_size: int,
+        revalidate: bool,
+        max_parallel_dl: int,
+        max_dl_retries: int,
+        max_bandwidth: str,
+        bandwidth_control_file: str,
+        source_dir: str,
+        stream_webcams: bool,
+        audio_only_stream: bool,
+        disk_budget: str,
+        frame_memory_cap: str,
+        frame_memory_dir: str,
+        cpu_budget: int,
+        ffmpeg_threads: int,
+        plan_path: str,
+        execute_path: str,
     ):
         # Rendering options
         self.skip_webcam_opt = skip_webcam
@@ -149,15 +244,66 @@ class BBBDL:
         # BBB-dl Options
         self.keep_tmp_files = keep_tmp_files
         self.backup = backup
+        self.stream_webcams = stream_webcams
+        self.audio_only_stream = audio_only_stream
+        self.revalidate = revalidate
+        if [backup, plan_path is not None, execute_path is not None].count(True) > 1:
+            Log.error('Error: Please use only one of the options --backup, --plan and --execute')
+            exit(-17)
+        # In the plan mode the recording is parsed and the render plan is written instead of the video
+        self.plan_path = PT.get_abs_path(plan_path) if plan_path is not None else None
+        # In the execute mode the frames and encodings of a render plan are rendered without parsing the recording
+        self.plan = load_render_plan(PT.get_abs_path(execute_path)) if execute_path is not None else None
         self.working_dir = self.get_working_dir(working_dir)
+        self.disk_budget = None
+        if disk_budget is not None:
+            max_size = parse_bytes(disk_budget)
+            if max_size is None:
+                Log.error(f'Error: Invalid disk budget "{disk_budget}". Use e.g. 500M, 20G or 1T')
+                exit(-14)
+            self.disk_budget = DiskBudget(PT.get_in_dir(self.working_dir, 'disk-budget'), max_size, verbose)
+        # In the disk budget mode, intermediate files are removed as soon as no stage needs them anymore
+        self.remove_intermediates = self.disk_budget is not None and not keep_tmp_files
         self.verbose = verbose
         self.skip_cert_verify = skip_cert_verify
         self.allow_insecure_ssl = allow_insecure_ssl
         self.use_all_ciphers = use_all_ciphers
         self.force_tls_version = force_tls_version
-        self.max_dl_retries = 10
-        self.max_parallel_dl = 5
-        self.max_parallel_chromes = int(max_parallel_chromes)
+        self.max_dl_retries = max(1, int(max_dl_retries))
+        self.max_parallel_dl = max(1, int(max_parallel_dl))
+        self.initial_parallel_dl = 5
+        # The defaults of the CPU budget, the browsers and the ffmpeg threads follow the limits of the cgroup
+        cpus = get_cpu_limit()
+        memory = get_memory_limit()
+        if verbose:
+            ResourceGovernor.log_limits(cpus, memory)
+        self.governor = ResourceGovernor(
+            PT.get_in_dir(self.working_dir, 'cpu-budget'), int(cpu_budget) if cpu_budget is not None else cpus, verbose
+        )
+        if max_parallel_chromes is not None:
+            self.max_parallel_chromes = int(max_parallel_chromes)
+        else:
+            self.max_parallel_chromes = ResourceGovernor.get_default_chromes(cpus, memory)
+        if ffmpeg_threads is not None:
+            ffmpeg_threads = max(1, int(ffmpeg_threads))
+        else:
+            ffmpeg_threads = ResourceGovernor.get_default_threads(cpus, self.RESOURCE_LIMITS['encoder'])
+        self.dl_segments = max(1, int(dl_segments))
+        self.min_segmented_dl_size = 32 * 1024 * 1024
+        self.session = None
+        self.dl_limiter = None
+        self.dl_lock_slots = None
+        # Downloads that are read by consumers while they are running, by rel_file_path
+        self.download_streams: Dict[str, DownloadStream] = {}
+        self.freeze_detection = None
+        self.audio_extraction = None
+        self.backoff_policy = BackoffPolicy()
+        self.circuit_breaker = HostCircuitBreaker(self.backoff_policy, verbose)
+        self.bandwidth_limiter = TokenBucket(
+            self.get_max_bandwidth(max_bandwidth),
+            PT.get_abs_path(bandwidth_control_file) if bandwidth_control_file is not None else None,
+            verbose,
+        )
 
         # Job Options
         self.dl_url = dl_url
@@ -166,7 +312,7 @@ class BBBDL:
         self.slideshow_width = int(force_width) if force_width is not None else None
         self.slideshow_height = int(force_height) if force_height is not None else None
 
-        self.ffmpeg = FFMPEG(verbose, ffmpeg_location, encoder, audiocodec, preset, crf)
+        self.ffmpeg = FFMPEG(verbose, ffmpeg_location, encoder, audiocodec, preset, crf, ffmpeg_threads)
 
         self.cookies_path = PT.make_path(self.working_dir, "cookies.txt")
         self.cookies_text = None
@@ -175,20 +321,71 @@ class BBBDL:
                 self.cookies_text = cookie_file.read()
 
         # Check DL-URL
-        m_obj = re.match(self.VALID_URL_RE, self.dl_url)
+        recording_dir = None
+        if self.dl_url.startswith('file://'):
+            # Published recording directory, e.g. file:///var/bigbluebutton/published/presentation/<id>
+            recording_dir = url2pathname(urlparse(self.dl_url).path)
+            self.video_id = os.path.basename(os.path.normpath(recording_dir))
+            self.video_website = None
+            self.presentation_base_url = self.dl_url.rstrip('/')
+        else:
+            m_obj = re.match(self.VALID_URL_RE, self.dl_url)
 
-        if m_obj is None:
-            Log.error(
-                f'Error: Your URL {self.dl_url} does not match the bbb session pattern.'
-                + ' If you think this URL should work, please open an issue on https://github.com/C0D3D3V/bbb-dl/issues'
-            )
-            exit(-4)
+            if m_obj is None:
+                Log.error(
+                    f'Error: Your URL {self.dl_url} does not match the bbb session pattern.'
+                    + ' If you think this URL should work, please open an issue on'
+                    + ' https://github.com/C0D3D3V/bbb-dl/issues'
+                )
+                exit(-4)
+
+            self.video_id = m_obj.group('id')
+            self.video_website = m_obj.group('website')
+            self.presentation_base_url = self.video_website + '/presentation/' + self.video_id
+            if source_dir is not None:
+                recording_dir = PT.get_in_dir(source_dir, self.video_id)
+
+        if self.plan is not None and self.plan['video_id'] != self.video_id:
+            Log.error(f'Error: The render plan is for the recording {self.plan["url"]} and not for {self.dl_url}')
+            exit(-18)
+
+        self.source = None
+        if recording_dir is not None:
+            if not os.path.isdir(recording_dir):
+                Log.error(f'Error: The recording directory {recording_dir} does not exist')
+                exit(-13)
+            self.source = LocalDirectorySource(recording_dir, backup, verbose)
+
+        # Processes that work on the same recording share its temporary directory, they hold a shared lock
+        # on the recording and exclusive locks on the files and stages that they are working on
+        short_video_id = self.get_short_video_id(self.video_id)
+        self.lock_dir = PT.get_in_dir(self.working_dir, short_video_id + '.locks')
+        self.recording_lock = FileLock(PT.get_in_dir(self.working_dir, short_video_id + '.lock'))
+        self.recording_lock.acquire(shared=True)
 
-        self.video_id = m_obj.group('id')
-        self.video_website = m_obj.group('website')
-        self.presentation_base_url = self.video_website + '/presentation/' + self.video_id
         self.tmp_dir = self.get_tmp_dir(self.video_id)
-        self.frames_dir = self.get_frames_dir()
+        # Set after parsing the slides, the frames directory depends on the inputs and options of the capturing
+        self.frames_dir = None
+        self.frame_store = None
+        self.frame_memory_cap, self.frame_memory_dir = self.get_frame_memory(frame_memory_cap, frame_memory_dir)
+        self.stage_cache = StageCache(PT.get_in_dir(self.tmp_dir, 'stages'), verbose)
+        self.hash_cache = FileHashCache(PT.get_in_dir(self.tmp_dir, 'hashes.json'))
+        self.manifest = DownloadManifest(PT.get_in_dir(self.tmp_dir, 'manifest.json'), self.get_lock_path('manifest'))
+        self.asset_store = None
+        if use_asset_store:
+            self.asset_store = AssetStore(
+                PT.get_in_dir(self.working_dir, 'asset-store'), int(asset_store_max_size) * 1024 * 1024, verbose
+            )
+
+    @staticmethod
+    def get_max_bandwidth(max_bandwidth: str) -> int:
+        if max_bandwidth is None:
+            return None
+        rate = parse_bytes(max_bandwidth)
+        if rate is None:
+            Log.error(f'Error: Invalid bandwidth limit "{max_bandwidth}". Use e.g. 500K, 2M or 1G')
+            exit(-12)
+        return rate
 
     def get_cookie_jar(self) -> aiohttp.CookieJar:
         if self.cookies_text is not None:
@@ -197,66 +394,265 @@ class BBBDL:
             return convert_to_aiohttp_cookie_jar(cookie_jar)
         return None
 
-    def run(self):
-        if not self.backup:
-            Log.yellow(f'Output directory for the final video is: {self.output_dir}')
-            Log.yellow(f'Directory for the temporary files is: {self.tmp_dir}')
-        else:
-            Log.yellow(f'Output directory for backup is: {self.tmp_dir}')
+    def get_ssl_context(self):
+        return SslHelper.get_ssl_context(
+            skip_cert_verify=self.skip_cert_verify,
+            allow_insecure_ssl=self.allow_insecure_ssl,
+            use_all_ciphers=self.use_all_ciphers,
+            force_tls_version=self.force_tls_version,
+        )
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """
+        Creates a session with a keep-alive connection pool, so that all downloads of a run
+        reuse the same TCP / TLS connections, the DNS cache and the cookie jar.
+        """
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.max_parallel_dl * self.dl_segments,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            ssl=self.get_ssl_context(),
+        )
+        return aiohttp.ClientSession(
+            connector=connector, cookie_jar=self.get_cookie_jar(), read_bufsize=self.DL_CHUNK_SIZE
+        )
+
+    @asynccontextmanager
+    async def http_session(self):
+        """
+        Yields the session of the current run. The session and the download limiter are only created once
+        and closed by the outermost user, nested users share them.
+        """
+        if self.session is not None:
+            yield self.session
+            return
 
+        self.session = self.create_session()
+        self.dl_limiter = AdaptiveLimiter(self.initial_parallel_dl, self.max_parallel_dl, self.verbose)
+        # Limits the open lock files of the downloads
+        self.dl_lock_slots = asyncio.Semaphore(self.max_parallel_dl)
+        try:
+            yield self.session
+        finally:
+            await self.session.close()
+            self.session = None
+            self.dl_limiter = None
+            self.dl_lock_slots = None
+
+    async def download_meta_files(self):
         Log.info("Downloading meta information")
+        if self.plan is not None:
+            # The metadata is taken from the render plan, shapes.svg is still needed for capturing the frames
+            _ = await self.batch_download_from_bbb(['shapes.svg'])
+            return
+        _ = await self.batch_download_from_bbb(['metadata.xml', 'shapes.svg'])
+        # The slides are parsed before the large files are downloaded, e.g. to estimate the disk usage of the job
+        _ = await self.batch_download_from_bbb(
+            [asset for asset in self.get_required_assets() if asset in self.OPTIONAL_SLIDES_ASSETS], False
+        )
+
+    async def resolve_media_variants(self) -> Media:
+        async with self.http_session() as session:
+            webcams_rel_path, deskshare_rel_path = await asyncio.gather(
+                self.resolve_media_variant(self.WEBCAMS_VARIANTS, session),
+                self.resolve_media_variant(self.DESKSHARE_VARIANTS, session),
+            )
+        return Media(webcams_rel_path, deskshare_rel_path)
+
+    async def download_media_files(self, media_variants: Media) -> Media:
+        """
+        Downloads the webcams and deskshare videos and the other files of the recording that this run needs
+        (all files for a backup), except of the slides
+        @return: The variants of the videos that were downloaded, deskshare_rel_path is None if there is none
+        """
+        webcams_rel_path = media_variants.webcams_rel_path
+        deskshare_rel_path = media_variants.deskshare_rel_path
+        async with self.http_session() as session:
+            Log.info("Downloading webcams / deskshare")
+            dl_jobs = [
+                asset
+                for asset in self.get_required_assets()
+                if asset not in ['metadata.xml', 'shapes.svg'] + self.OPTIONAL_SLIDES_ASSETS
+            ]
+            if webcams_rel_path is not None:
+                cam_idx = append_get_idx(dl_jobs, webcams_rel_path)
+                if (
+                    self.can_stream(webcams_rel_path)
+                    and not self.backup
+                    and self.plan is None
+                    and not self.skip_webcam_opt
+                    and not self.skip_webcam_freeze_detection_opt
+                ):
+                    Log.info(f'Try to detect freeze in {webcams_rel_path} while it is downloaded...')
+                    webcams_path = PT.get_in_dir(self.tmp_dir, webcams_rel_path)
+                    self.freeze_detection = self.stream_download(
+                        webcams_rel_path, partial(self.ffmpeg.freeze_detect, webcams_path)
+                    )
+            if deskshare_rel_path is not None:
+                dsk_idx = append_get_idx(dl_jobs, deskshare_rel_path)
+
+            dl_results = await self.batch_download_from_bbb(dl_jobs, False)
+
+            if webcams_rel_path is not None:
+                webcams_rel_path = await self.download_media_variant(
+                    self.WEBCAMS_VARIANTS, webcams_rel_path, dl_results[cam_idx], session
+                )
+            if webcams_rel_path is None:
+                Log.error('Error: webcams video is essential. Abort! Please try again later!')
+                exit(4)
+
+            if deskshare_rel_path is not None:
+                deskshare_rel_path = await self.download_media_variant(
+                    self.DESKSHARE_VARIANTS, deskshare_rel_path, dl_results[dsk_idx], session
+                )
+
+        return Media(webcams_rel_path, deskshare_rel_path)
+
+    def load_shapes(self) -> ParsedShapes:
+        return self.load_xml('shapes.svg', parse=parse_shapes)
+
+    async def download_slides(self, loaded_shapes: ParsedShapes):
+        """Downloads the slide images that are referenced in shapes.svg"""
+        Log.info("Downloading slides")
+        dl_jobs = loaded_shapes.image_urls
+        _ = await self.batch_download_from_bbb(dl_jobs)
+
+    async def download_planned_slides(self):
+        """Downloads the slide images of the executed render plan, without parsing shapes.svg again"""
+        Log.info("Downloading slides")
+        _ = await self.batch_download_from_bbb(self.plan['slide_images'])
+
+    def get_required_assets(self) -> List[str]:
+        """
+        Returns the files of the recording that are read by the stages of this run.
+        Backups contain all files of the recording, also those that no stage reads.
+        """
+        if self.backup:
+            stages = list(self.STAGE_ASSETS.keys())
+        elif self.plan is not None:
+            # The slides and the metadata are parsed in the render plan
+            stages = ['parse_deskshare_data']
+        else:
+            stages = ['parse_metadata', 'parse_slides_data', 'parse_deskshare_data']
+            if not self.skip_cursor_opt:
+                stages.append('parse_cursors')
+
+        assets = [asset for stage in stages for asset in self.STAGE_ASSETS[stage]]
+        if self.backup:
+            assets += self.BACKUP_ASSETS
+        return assets
+
+    async def download_audio_only_files(self) -> Tuple[str, Metadata]:
+        """
+        Downloads the files needed for the audio only mode within one session
+        @return: webcams_rel_path (None if the audio was already extracted from a stream of it) and the parsed metadata
+        """
+        async with self.http_session() as session:
+            Log.info("Downloading meta information")
+
+            dl_jobs = self.STAGE_ASSETS['parse_metadata']
+            _ = await self.batch_download_from_bbb(dl_jobs)
+            metadata = self.parse_metadata()
+
+            Log.info("Downloading webcams file")
+            webcams_rel_path = await self.resolve_media_variant(self.WEBCAMS_VARIANTS, session)
+            if webcams_rel_path is not None:
+                result_path = self.get_output_audio_file_path(metadata)
+                if (
+                    self.audio_only_stream
+                    and self.source is None
+                    and self.is_pipeable(webcams_rel_path)
+                    and not os.path.isfile(result_path)
+                ):
+                    if await self.extract_audio_from_server(webcams_rel_path, result_path, session):
+                        return None, metadata
+                if self.can_stream(webcams_rel_path) and not os.path.isfile(result_path):
+                    Log.info(f'Start extracting audio while {webcams_rel_path} is downloaded...')
+                    webcams_path = PT.get_in_dir(self.tmp_dir, webcams_rel_path)
+                    self.audio_extraction = self.stream_download(
+                        webcams_rel_path, partial(self.ffmpeg.extract_audio, webcams_path, result_path)
+                    )
+                dl_results = await self.batch_download_from_bbb([webcams_rel_path], False)
+                webcams_rel_path = await self.download_media_variant(
+                    self.WEBCAMS_VARIANTS, webcams_rel_path, dl_results[0], session
+                )
 
-        dl_jobs = ['metadata.xml', 'shapes.svg']
-        _ = asyncio.run(self.batch_download_from_bbb(dl_jobs))
-
-        Log.info("Downloading webcams / deskshare")
-        dl_jobs = [
-            'cursor.xml',
-            'panzooms.xml',
-            'captions.json',
-            'deskshare.xml',
-            'events.xml',
-            'presentation_text.json',
-            'slides_new.xml',
-            'notes.html',
-            'polls.json',
-            'external_videos.json',
-        ]
-        cam_webm_idx = append_get_idx(dl_jobs, 'video/webcams.webm')
-        cam_mp4_idx = append_get_idx(dl_jobs, 'video/webcams.mp4')
-        dsk_webm_idx = append_get_idx(dl_jobs, 'deskshare/deskshare.webm')
-        dsk_mp4_idx = append_get_idx(dl_jobs, 'deskshare/deskshare.mp4')
-
-        dl_results = asyncio.run(self.batch_download_from_bbb(dl_jobs, False))
-
-        if not dl_results[cam_webm_idx] and not dl_results[cam_mp4_idx]:
+        if webcams_rel_path is None:
             Log.error('Error: webcams video is essential. Abort! Please try again later!')
             exit(4)
-        webcams_rel_path = 'video/webcams.webm' if dl_results[cam_webm_idx] else 'video/webcams.mp4'
-        webcams_path = PT.get_in_dir(self.tmp_dir, webcams_rel_path)
+        return webcams_rel_path, metadata
 
-        deskshare_rel_path = (
-            'deskshare/deskshare.webm'
-            if dl_results[dsk_webm_idx]
-            else 'deskshare/deskshare.mp4' if dl_results[dsk_mp4_idx] else None
-        )
-        deskshare_path = PT.get_in_dir(self.tmp_dir, deskshare_rel_path) if deskshare_rel_path is not None else None
+    @staticmethod
+    def is_pipeable(rel_file_path: str) -> bool:
+        """Only WebM (Matroska) files can be read by ffmpeg from a pipe, MP4 files often have their index at the end"""
+        return rel_file_path.endswith('.webm')
 
-        Log.info("Downloading slides")
-        loaded_shapes = self.load_xml('shapes.svg')
-        dl_jobs = self.get_all_image_urls(loaded_shapes)
-        _ = asyncio.run(self.batch_download_from_bbb(dl_jobs))
+    def can_stream(self, rel_file_path: str) -> bool:
+        """On Windows an open file can not be renamed, so the .part file of a download can not be read while it grows"""
+        return self.stream_webcams and self.is_pipeable(rel_file_path) and os.name != 'nt'
 
-        metadata = self.parse_metadata()
-        deskshare_events = self.parse_deskshare_data(metadata.duration)
-        if deskshare_path is None and len(deskshare_events) == 0:
-            Log.yellow('No desk was shared in this session')
-        elif deskshare_path is None and len(deskshare_events) > 0:
-            Log.error(
-                'Error: deskshare video is essential, because a desk was shared in this session.'
-                + ' Abort! Please try again later!'
-            )
-            exit(5)
+    def stream_download(self, rel_file_path: str, consumer) -> asyncio.Task:
+        """
+        Starts `consumer(reader)` with a reader that returns the bytes of rel_file_path while the next download
+        of the file is running. Use get_stream_result() to get the result of the consumer.
+        """
+        local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+        stream = self.download_streams.setdefault(rel_file_path, DownloadStream(rel_file_path, local_path))
+        return asyncio.create_task(self.consume_stream(GrowingFileReader(stream), consumer))
+
+    async def consume_stream(self, reader: GrowingFileReader, consumer):
+        try:
+            async with self.governor.cpu(1, reader.stream.rel_file_path):
+                return await consumer(reader)
+        finally:
+            reader.close()
+
+    async def get_stream_result(self, consumer_task: asyncio.Task, rel_file_path: str) -> Tuple[bool, Any]:
+        """
+        Waits for a consumer that was started with stream_download()
+        @return: If the consumer succeeded and its result. If not, the downloaded file needs to be processed again.
+        """
+        try:
+            return True, await consumer_task
+        except Exception as err:
+            Log.warning(f'Reading {rel_file_path} while it was downloaded failed, the downloaded file is used instead')
+            if self.verbose:
+                Log.info(f'Error: {str(err)}')
+            return False, None
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    def run_audio_only(self):
+        asyncio.run(self.run_audio_only_async())
+
+    async def run_async(self):
+        """Runs all stages of the video mode inside one event loop, sharing one session"""
+        async with self.http_session():
+            await self._run_async()
+
+    async def run_audio_only_async(self):
+        """Runs all stages of the audio only mode inside one event loop, sharing one session"""
+        async with self.http_session():
+            await self._run_audio_only_async()
+
+    async def _run_async(self):
+        if self.backup:
+            Log.yellow(f'Output directory for backup is: {self.tmp_dir}')
+        elif self.plan_path is not None:
+            Log.yellow(f'Render plan is written to: {self.plan_path}')
+            Log.yellow(f'Directory for the temporary files is: {self.tmp_dir}')
+        else:
+            Log.yellow(f'Output directory for the final video is: {self.output_dir}')
+            Log.yellow(f'Directory for the temporary files is: {self.tmp_dir}')
+
+        scheduler = self.get_video_stages()
+        results = await scheduler.run()
+        # Progress of downloads that is not saved yet
+        await self.manifest.save_async()
+
+        if self.disk_budget is not None:
+            self.disk_budget.release()
 
         if self.backup:
             Log.success("Backup Finished")
@@ -264,31 +660,133 @@ class BBBDL:
             Log.yellow(f"Backup is located in: {self.tmp_dir}")
             return
 
-        frames, only_zooms, partitions = self.parse_slides_data(loaded_shapes, metadata)
-
-        if self.slideshow_width is None and self.slideshow_height is None:
-            guessed_slideshow_width, guessed_slideshow_height = self.get_slideshow_size(
-                only_zooms, deskshare_path, loaded_shapes
+        if self.plan_path is not None:
+            Log.success(f"Render plan written to: {results['plan_path']}")
+            Log.info(
+                "You can run bbb-dl with the option --execute on this or another machine to render the video"
+                + " based on the plan!"
             )
-            if self.slideshow_width is None:
-                self.slideshow_width = guessed_slideshow_width
-            if self.slideshow_height is None:
-                self.slideshow_height = guessed_slideshow_height
-
-        self.create_frames(frames, only_zooms, partitions)
-
-        slideshow_path = self.create_slideshow(frames)
-        slideshow_path = self.add_deskshare_to_slideshow(slideshow_path, deskshare_path, deskshare_events, metadata)
+            return
 
-        result_path = self.final_mux(slideshow_path, webcams_path, webcams_rel_path, metadata)
+        scheduler.print_summary()
+        result_path = results['result_path']
 
         if not self.keep_tmp_files:
             self.remove_tmp_dir()
         else:
+            self.prune_outdated_stages()
             Log.warning(f'Temporary directory will not be deleted: {self.tmp_dir}')
         Log.success(f'All done! Final video: {result_path}')
 
-    def run_audio_only(self):
+    def get_video_stages(self) -> StageScheduler:
+        """
+        The stages of the video mode with their dependencies. Each stage stores its result under its name
+        and gets the results of its inputs as keyword arguments.
+        For a backup only the stages that download and check the files are run. In the plan mode the recording
+        is parsed and written as render plan, in the execute mode the parsing is replaced by the plan.
+        """
+        scheduler = StageScheduler(self.RESOURCE_LIMITS, self.verbose, self.governor)
+        scheduler.add('meta_files', self.download_meta_files, resource='network')
+        if self.plan is not None:
+            scheduler.add('media_variants', self.load_planned_media)
+            scheduler.add('metadata', self.load_planned_metadata)
+        else:
+            scheduler.add('media_variants', self.resolve_media_variants, resource='network')
+            scheduler.add('metadata', self.parse_metadata, after=['meta_files'])
+        reservation_inputs = ['metadata', 'media_variants']
+        if self.plan is None:
+            scheduler.add('loaded_shapes', self.load_shapes, after=['meta_files'])
+            if not self.backup:
+                scheduler.add('slides_data', self.parse_slides_data, inputs=['loaded_shapes', 'metadata'])
+                # The disk usage of the frames is estimated from the parsed slides
+                reservation_inputs += ['loaded_shapes', 'slides_data']
+        reservation = []
+        if self.disk_budget is not None:
+            # The large files are only downloaded after the estimated disk usage of the job is reserved
+            scheduler.add('disk_reservation', self.reserve_disk_budget, inputs=reservation_inputs)
+            reservation = ['disk_reservation']
+        scheduler.add(
+            'media', self.download_media_files, inputs=['media_variants'], after=reservation, resource='network'
+        )
+        if self.plan is not None:
+            scheduler.add('slide_images', self.download_planned_slides, after=reservation, resource='network')
+        else:
+            scheduler.add(
+                'slide_images', self.download_slides, inputs=['loaded_shapes'], after=reservation, resource='network'
+            )
+        scheduler.add('deskshare_events', self.get_deskshare_events, inputs=['metadata', 'media'])
+        if self.backup:
+            return scheduler
+
+        if self.plan is not None:
+            # The slide images are still needed for capturing the frames
+            scheduler.add('slides', self.load_planned_slides, after=['slide_images'])
+            scheduler.add('webcam_is_empty', self.load_planned_webcam_freeze)
+        else:
+            scheduler.add(
+                'slides', self.parse_slides, inputs=['loaded_shapes', 'slides_data', 'media'], after=['slide_images']
+            )
+            scheduler.add('webcam_is_empty', self.detect_webcam_freeze, inputs=['media'], resource='encoder')
+        if self.plan_path is not None:
+            scheduler.add(
+                'plan_path',
+                self.write_render_plan,
+                inputs=['loaded_shapes', 'slides', 'media', 'deskshare_events', 'webcam_is_empty', 'metadata'],
+            )
+            return scheduler
+
+        scheduler.add(
+            'frames',
+            self.create_frames,
+            inputs=['slides'],
+            resource='browser',
+            lock=self.get_lock('frames', 'the frames'),
+            cleanup=self.remove_frames if self.remove_intermediates else None,
+        )
+        scheduler.add(
+            'slideshow_path',
+            self.create_slideshow,
+            inputs=['slides'],
+            after=['frames'],
+            resource='encoder',
+            cpu=self.ffmpeg.threads,
+            lock=self.get_lock('slideshow', 'the slideshow'),
+            cleanup=self.remove_intermediate if self.remove_intermediates else None,
+        )
+        # The deskshare is resized to the slideshow size, that is known after parsing the slides
+        scheduler.add(
+            'resized_deskshare_path',
+            self.resize_deskshare,
+            inputs=['media', 'deskshare_events'],
+            after=['slides'],
+            resource='encoder',
+            cpu=self.ffmpeg.threads,
+            lock=self.get_lock('resize_deskshare', 'the resized deskshare'),
+            cleanup=self.remove_intermediate if self.remove_intermediates else None,
+        )
+        scheduler.add(
+            'presentation_path',
+            self.add_deskshare_to_slideshow,
+            inputs=['slideshow_path', 'resized_deskshare_path', 'deskshare_events', 'metadata'],
+            resource='encoder',
+            cpu=self.ffmpeg.threads,
+            lock=self.get_lock('presentation', 'the slideshow with deskshare'),
+            cleanup=self.remove_intermediate if self.remove_intermediates else None,
+        )
+        scheduler.add(
+            'result_path',
+            self.final_mux,
+            inputs=['presentation_path', 'media', 'webcam_is_empty', 'metadata'],
+            resource='encoder',
+            cpu=self.ffmpeg.threads,
+            lock=self.get_lock('final_mux', 'the final video'),
+        )
+        return scheduler
+
+    async def _run_audio_only_async(self):
+        if self.plan_path is not None or self.plan is not None:
+            Log.error('Please use the plan and execute options only without the audio only mode')
+            exit(-11)
         if not self.backup:
             Log.yellow(f'Output directory for the final audio is: {self.output_dir}')
             Log.yellow(f'Directory for the temporary files is: {self.tmp_dir}')
@@ -296,26 +794,14 @@ class BBBDL:
             Log.error('Please use the backup option only without the audio only mode')
             exit(-11)
 
-        Log.info("Downloading meta information")
-
-        dl_jobs = ['metadata.xml']
-        _ = asyncio.run(self.batch_download_from_bbb(dl_jobs))
-
-        Log.info("Downloading webcams file")
-        dl_jobs = []
-        cam_webm_idx = append_get_idx(dl_jobs, 'video/webcams.webm')
-        cam_mp4_idx = append_get_idx(dl_jobs, 'video/webcams.mp4')
-
-        dl_results = asyncio.run(self.batch_download_from_bbb(dl_jobs, False))
-
-        if not dl_results[cam_webm_idx] and not dl_results[cam_mp4_idx]:
-            Log.error('Error: webcams video is essential. Abort! Please try again later!')
-            exit(4)
-        webcams_rel_path = 'video/webcams.webm' if dl_results[cam_webm_idx] else 'video/webcams.mp4'
-        webcams_path = PT.get_in_dir(self.tmp_dir, webcams_rel_path)
-
-        metadata = self.parse_metadata()
-        result_path = self.extract_audio(webcams_path, metadata)
+        async with self.get_lock('audio', 'the audio'):
+            webcams_rel_path, metadata = await self.download_audio_only_files()
+            await self.manifest.save_async()
+            if webcams_rel_path is None:
+                result_path = self.get_output_audio_file_path(metadata)
+            else:
+                webcams_path = PT.get_in_dir(self.tmp_dir, webcams_rel_path)
+                result_path = await self.extract_audio(webcams_path, metadata)
 
         if not self.keep_tmp_files:
             self.remove_tmp_dir()
@@ -323,6 +809,18 @@ class BBBDL:
             Log.warning(f'Temporary directory will not be deleted: {self.tmp_dir}')
         Log.success(f'All done! Final audio: {result_path}')
 
+    def get_deskshare_events(self, metadata: Metadata, media: Media) -> List[Deskshare]:
+        deskshare_events = self.parse_deskshare_data(metadata.duration)
+        if media.deskshare_rel_path is None and len(deskshare_events) == 0:
+            Log.yellow('No desk was shared in this session')
+        elif media.deskshare_rel_path is None and len(deskshare_events) > 0:
+            Log.error(
+                'Error: deskshare video is essential, because a desk was shared in this session.'
+                + ' Abort! Please try again later!'
+            )
+            exit(5)
+        return deskshare_events
+
     def parse_deskshare_data(self, recording_duration) -> List[Deskshare]:
         result_list = []
         loaded_deskshare = self.load_xml('deskshare.xml', False)
@@ -346,7 +844,7 @@ class BBBDL:
         result_list = sorted(result_list, key=lambda item: item.start_timestamp)
         return result_list
 
-    def get_slideshow_size(self, only_zooms: Dict[float, Frame], deskshare_path: str, loaded_shapes: Element):
+    def get_slideshow_size(self, only_zooms: Dict[float, Frame], deskshare_path: str, loaded_shapes: ParsedShapes):
         widths = []
         heights = []
         if deskshare_path is not None:
@@ -379,7 +877,13 @@ class BBBDL:
 
         return max_width, max_height
 
-    def create_frames(self, frames: Dict[float, Frame], only_zooms: Dict[float, Frame], partitions: List[Tuple]):
+    async def create_frames(self, slides: Slides):
+        # Another process may have captured the frames while this one waited for the lock of the frames
+        self.frame_store.count_memory_used()
+        if self.find_captured_frames(slides.frames) == 0:
+            Log.warning('All frames are already captured with the same inputs and options! Skipping capturing!')
+            return
+
         Log.info('Start capturing frames...')
         Log.info(f'Output directory for frames is: {self.frames_dir}')
         Log.info('Initialization takes a few seconds...')
@@ -399,7 +903,9 @@ class BBBDL:
         thread.start()
 
         with Timer() as t:
-            _ = asyncio.run(self.multi_capture_frames(f'http://localhost:{port}', frames, only_zooms, partitions))
+            await self.multi_capture_frames(
+                f'http://localhost:{port}', slides.frames, slides.only_zooms, slides.partitions
+            )
 
         print()
         Log.info(f'Frames capturing is finished and took: {formatSeconds(t.duration)}.')
@@ -478,7 +984,7 @@ class BBBDL:
         semaphore: asyncio.Semaphore,
         status_dict: Dict,
     ):
-        async with semaphore, async_playwright() as p:
+        async with semaphore, self.governor.cpu(1, 'a browser'), async_playwright() as p:
             first_timestamp = partition[0]
             last_timestamp = partition[1]
 
@@ -490,7 +996,7 @@ class BBBDL:
                     break
                 if timestamp < first_timestamp:
                     continue
-                if not os.path.isfile(frame.capture_path):
+                if frame.capture_path is None:
                     partition_already_done = False
                     break
                 total_frames_in_partition += 1
@@ -575,8 +1081,11 @@ class BBBDL:
                                     current_view_box.y + (action.y * current_view_box.height),
                                 )
 
-                if not os.path.isfile(frame.capture_path):
-                    await page.screenshot(path=frame.capture_path)
+                if frame.capture_path is None:
+                    capture_path = self.frame_store.allocate(frame.capture_filename)
+                    await page.screenshot(path=capture_path)
+                    self.frame_store.add_captured(capture_path)
+                    frame.capture_path = capture_path
                 status_dict['done'] += 1
 
             await browser.close()
@@ -677,22 +1186,12 @@ class BBBDL:
             [x, y],
         )
 
-    def get_all_image_urls(self, loaded_shapes: Element) -> (List[str], List[Tuple[int]]):
-        image_urls = []
-        shapes_images = loaded_shapes.findall(_s(".//svg:image"))
-        for image in shapes_images:
-            image_rel_path = image.get(_x('xlink:href'))
-            if image_rel_path not in image_urls:
-                image_urls.append(image_rel_path)
-        return image_urls
-
-    def get_all_slide_sizes(self, loaded_shapes: Element) -> (List[int], List[int]):
+    def get_all_slide_sizes(self, loaded_shapes: ParsedShapes) -> (List[int], List[int]):
         widths = []
         heights = []
-        slides = loaded_shapes.findall(_s("./svg:image[@class='slide']"))
-        for image in slides:
-            image_width = int(float(image.get('width')))
-            image_height = int(float(image.get('height')))
+        for image in loaded_shapes.slides:
+            image_width = int(float(image.width))
+            image_height = int(float(image.height))
             widths.append(image_width)
             heights.append(image_height)
         return widths, heights
@@ -721,7 +1220,62 @@ class BBBDL:
 
         return Metadata(date, date_formatted, duration, title, bbb_version)
 
-    def parse_slides_data(self, loaded_shapes: Element, metadata: Metadata) -> Dict[float, Frame]:
+    async def parse_slides(self, loaded_shapes: ParsedShapes, slides_data: Tuple, media: Media) -> Slides:
+        """Takes the parsed slides and sets the size of the slideshow, if it is not forced"""
+        frames, only_zooms, partitions = slides_data
+
+        if self.slideshow_width is None and self.slideshow_height is None:
+            deskshare_path = (
+                PT.get_in_dir(self.tmp_dir, media.deskshare_rel_path) if media.deskshare_rel_path is not None else None
+            )
+            guessed_slideshow_width, guessed_slideshow_height = self.get_slideshow_size(
+                only_zooms, deskshare_path, loaded_shapes
+            )
+            if self.slideshow_width is None:
+                self.slideshow_width = guessed_slideshow_width
+            if self.slideshow_height is None:
+                self.slideshow_height = guessed_slideshow_height
+
+        key = self.stage_cache.get_key(
+            'frames',
+            [
+                await self.get_input_hash(rel_file_path)
+                for rel_file_path in ['shapes.svg', 'panzooms.xml', 'cursor.xml']
+            ],
+            self.skip_annotations_opt,
+            self.skip_cursor_opt,
+            self.skip_zoom_opt,
+            self.slideshow_width,
+            self.slideshow_height,
+        )
+        return self.get_slides(frames, only_zooms, partitions, key)
+
+    def get_slides(
+        self, frames: Dict[float, Frame], only_zooms: Dict[float, Frame], partitions: List[Tuple], key: str
+    ) -> Slides:
+        """Sets up the frames directory and the frame store of the frames key and finds the captured frames"""
+        self.frames_dir = self.get_frames_dir(key)
+        self.frame_store = FrameStore(
+            self.frames_dir,
+            PT.get_in_dir(self.frame_memory_dir, 'frames-' + key) if self.frame_memory_dir is not None else None,
+            self.frame_memory_cap,
+            self.get_frame_size(self.slideshow_width, self.slideshow_height),
+        )
+        self.stage_cache.keep('frames', self.frames_dir)
+        self.find_captured_frames(frames)
+        return Slides(frames, only_zooms, partitions, key)
+
+    def find_captured_frames(self, frames: Dict[float, Frame]) -> int:
+        """@return: The number of frames that still need to be captured"""
+        missing = 0
+        for frame in frames.values():
+            frame.capture_path = self.frame_store.find(frame.capture_filename)
+            if frame.capture_path is None:
+                missing += 1
+        return missing
+
+    def parse_slides_data(self, loaded_shapes: ParsedShapes, metadata: Metadata) -> Tuple:
+        """@return: The frames, the frames that only zoom and the partitions of the slides"""
         frames = {}
 
         partitions = self.parse_slide_partitions(loaded_shapes, metadata.duration)
@@ -730,12 +1284,12 @@ class BBBDL:
             self.parse_drawings(loaded_shapes, frames, metadata.duration)
 
         only_zooms = {}
-        loaded_zooms = self.load_xml('panzooms.xml', False)
+        loaded_zooms = self.load_xml('panzooms.xml', False, partial(parse_timed_events, value_tag='viewBox'))
         if loaded_zooms is not None:
             self.parse_zooms(loaded_zooms, frames, only_zooms, metadata.duration)
 
         if not self.skip_cursor_opt:
-            loaded_cursors = self.load_xml('cursor.xml', False)
+            loaded_cursors = self.load_xml('cursor.xml', False, partial(parse_timed_events, value_tag='cursor'))
             if loaded_cursors is not None:
                 self.parse_cursors(loaded_cursors, frames, metadata.duration)
 
@@ -747,28 +1301,25 @@ class BBBDL:
     def get_frame_by_timestamp(self, frames: Dict[float, Frame], timestamp: float):
         if timestamp not in frames:
             capture_filename = f'{timestamp}.png'
-            capture_path = PT.get_in_dir(self.frames_dir, capture_filename)
-            frames[timestamp] = Frame(timestamp, [], capture_filename, capture_path)
+            frames[timestamp] = Frame(timestamp, [], capture_filename)
         return frames[timestamp]
 
-    def parse_slide_partitions(self, loaded_shapes: Element, recording_duration: float) -> List[Tuple]:
+    def parse_slide_partitions(self, loaded_shapes: ParsedShapes, recording_duration: float) -> List[Tuple]:
         partitions = []
-        slides = loaded_shapes.findall(_s("./svg:image[@class='slide']"))
-        for image in slides:
-            image_in = float(image.get('in'))
-            image_out = float(image.get('out'))
+        for image in loaded_shapes.slides:
+            image_in = float(image.image_in)
+            image_out = float(image.image_out)
             partitions.append((image_in, image_out))
         return partitions
 
-    def parse_images(self, loaded_shapes: Element, frames: Dict[float, Frame], recording_duration: float):
-        slides = loaded_shapes.findall(_s("./svg:image[@class='slide']"))
-        for image in slides:
-            image_id = image.get('id')
+    def parse_images(self, loaded_shapes: ParsedShapes, frames: Dict[float, Frame], recording_duration: float):
+        for image in loaded_shapes.slides:
+            image_id = image.element_id
             image_id_value = self.NUMBER_RE.search(image_id).group()
-            image_in = float(image.get('in'))
-            image_out = float(image.get('out'))
-            image_width = int(float(image.get('width')))
-            image_height = int(float(image.get('height')))
+            image_in = float(image.image_in)
+            image_out = float(image.image_out)
+            image_width = int(float(image.width))
+            image_height = int(float(image.height))
             if image_in < recording_duration:
                 self.get_frame_by_timestamp(frames, image_in).actions.append(
                     Action(
@@ -787,13 +1338,12 @@ class BBBDL:
                     )
                 )
 
-    def parse_drawings(self, loaded_shapes: Element, frames: Dict[float, Frame], recording_duration: float):
-        drawings = loaded_shapes.findall(_s(".//svg:g[@timestamp]"))
-        for drawing in drawings:
-            drawing_id = drawing.get('id')
-            drawing_shape_value = drawing.get('shape')
-            drawing_in = float(drawing.get('timestamp'))
-            drawing_out = float(drawing.get('undo'))
+    def parse_drawings(self, loaded_shapes: ParsedShapes, frames: Dict[float, Frame], recording_duration: float):
+        for drawing in loaded_shapes.drawings:
+            drawing_id = drawing.element_id
+            drawing_shape_value = drawing.shape
+            drawing_in = float(drawing.timestamp)
+            drawing_out = float(drawing.undo)
             if drawing_in < recording_duration:
                 self.get_frame_by_timestamp(frames, drawing_in).actions.append(
                     Action(
@@ -812,15 +1362,14 @@ class BBBDL:
 
     def parse_zooms(
         self,
-        loaded_zooms: Element,
+        loaded_zooms: List[TimedEvent],
         frames: Dict[float, Frame],
         only_zooms: Dict[float, Frame],
         recording_duration: float,
     ):
-        zooms = loaded_zooms.findall("./event[@timestamp]")
-        for zoom in zooms:
-            zoom_in = float(zoom.get('timestamp'))
-            zoom_value = zoom.find('viewBox').text
+        for zoom in loaded_zooms:
+            zoom_in = float(zoom.timestamp)
+            zoom_value = zoom.value
             zoom_value_split = zoom_value.split(' ')  # min-x min-y width height
             zoom_x = float(zoom_value_split[0])
             zoom_y = float(zoom_value_split[1])
@@ -838,11 +1387,10 @@ class BBBDL:
                 self.get_frame_by_timestamp(frames, zoom_in).actions.append(zoom_action)
                 self.get_frame_by_timestamp(only_zooms, zoom_in).actions.append(zoom_action)
 
-    def parse_cursors(self, loaded_cursors: Element, frames: Dict[float, Frame], recording_duration: float):
-        cursors = loaded_cursors.findall("./event[@timestamp]")
-        for cursor in cursors:
-            cursor_in = float(cursor.get('timestamp'))
-            cursor_value_text = cursor.find('cursor').text.split(' ')
+    def parse_cursors(self, loaded_cursors: List[TimedEvent], frames: Dict[float, Frame], recording_duration: float):
+        for cursor in loaded_cursors:
+            cursor_in = float(cursor.timestamp)
+            cursor_value_text = cursor.value.split(' ')
             cursor_x = float(cursor_value_text[0])
             cursor_y = float(cursor_value_text[1])
             cursor_value = (float(cursor_value_text[0]), float(cursor_value_text[1]))
@@ -915,8 +1463,8 @@ class BBBDL:
             exit(-3)
         return path
 
-    def get_frames_dir(self):
-        frames_dir = PT.get_in_dir(self.tmp_dir, 'frames')
+    def get_frames_dir(self, key: str):
+        frames_dir = self.stage_cache.get_path('frames', key, '')
         try:
             PT.make_dirs(frames_dir)
         except (OSError, IOError) as err:
@@ -925,11 +1473,42 @@ class BBBDL:
 
         return frames_dir
 
-    def get_tmp_dir(self, video_id):
+    def get_frame_memory(self, frame_memory_cap: str, frame_memory_dir: str) -> Tuple[int, str]:
+        """
+        @return: The number of bytes of frames that are kept in memory and the directory for the frames of this
+                 recording in the memory backed directory, (0, None) if all frames are stored in the working directory
+        """
+        if frame_memory_cap is None:
+            return 0, None
+        memory_cap = parse_bytes(frame_memory_cap)
+        if memory_cap is None:
+            Log.error(f'Error: Invalid frame memory cap "{frame_memory_cap}". Use e.g. 500M or 2G')
+            exit(-16)
+        if frame_memory_dir is None:
+            frame_memory_dir = '/dev/shm'
+            if not os.path.isdir(frame_memory_dir):
+                Log.warning(
+                    'There is no /dev/shm on this system, the frames are stored in the working directory.'
+                    + ' You can choose a memory backed directory with the --frame-memory-dir option'
+                )
+                return 0, None
+        return memory_cap, PT.get_in_dir(
+            PT.get_abs_path(frame_memory_dir), 'bbb-dl-' + self.get_short_video_id(self.video_id)
+        )
+
+    def get_frame_size(self, width: int, height: int) -> int:
+        """Rough size of a captured frame"""
+        if width is None or height is None:
+            width, height = self.DEFAULT_SLIDESHOW_SIZE
+        return int(width * height * self.FRAME_BYTES_PER_PIXEL)
+
+    @staticmethod
+    def get_short_video_id(video_id: str) -> str:
         # We use a shorted version of the video id as name for the temporary directory
-        short_video_id = hashlib.md5(video_id.encode(encoding='utf-8')).hexdigest()
+        return hashlib.md5(video_id.encode(encoding='utf-8')).hexdigest()
 
-        tmp_dir = PT.get_in_dir(self.working_dir, short_video_id)
+    def get_tmp_dir(self, video_id):
+        tmp_dir = PT.get_in_dir(self.working_dir, self.get_short_video_id(video_id))
         try:
             PT.make_dirs(tmp_dir)
         except (OSError, IOError) as err:
@@ -939,34 +1518,311 @@ class BBBDL:
         return tmp_dir
 
     def remove_tmp_dir(self):
+        if not self.recording_lock.try_acquire(shared=False):
+            Log.info('The temporary directory is still used by another bbb-dl process, it will be removed by it')
+            return
         Log.info("Cleanup")
         try:
             if os.path.exists(self.tmp_dir):
                 shutil.rmtree(self.tmp_dir)
+            if os.path.exists(self.lock_dir):
+                shutil.rmtree(self.lock_dir)
+            if self.frame_memory_dir is not None and os.path.exists(self.frame_memory_dir):
+                shutil.rmtree(self.frame_memory_dir)
         except (OSError, IOError) as err:
             Log.error(f'Error: Unable to remove directory "{self.tmp_dir}" for temporary files: {str(err)}')
             exit(-6)
+        finally:
+            self.recording_lock.release()
+
+    def prune_outdated_stages(self):
+        """
+        Removes the stage outputs and the frames in memory of other inputs and options. Other processes on the
+        same recording may still read them, so they are only removed if no other process holds the recording lock.
+        """
+        if not self.recording_lock.try_acquire(shared=False):
+            if self.verbose:
+                Log.debug('Outdated stages are not removed, the recording is still used by another bbb-dl process')
+            return
+        try:
+            self.stage_cache.prune_outdated()
+            if self.frame_store is not None:
+                self.frame_store.prune_memory()
+        finally:
+            self.recording_lock.release()
+
+    def remove_intermediate(self, path: str):
+        """Removes an intermediate file of the disk budget mode, as soon as no stage needs it anymore"""
+        if path is None or not os.path.exists(path):
+            # A stage may have passed on the result of another stage, that was already removed
+            return
+        if self.verbose:
+            Log.debug(f'Removing {os.path.basename(path)}, it is no longer needed')
+        self.stage_cache.remove(path)
+
+    def remove_frames(self, _result=None):
+        self.remove_intermediate(self.frames_dir)
+        self.frame_store.remove_memory()
+
+    async def get_download_size(self, rel_file_path: str, session: aiohttp.ClientSession) -> int:
+        """
+        Size that a file takes in the temporary directory after it is downloaded
+        @return: The size in bytes, None if the server did not tell the size
+        """
+        local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+        if os.path.isfile(local_path):
+            return os.path.getsize(local_path)
+        if self.source is not None and not self.backup:
+            # The file is linked from the source directory
+            return 0
+        _, total_size, _ = await self.get_range_support(self.get_bbb_link(rel_file_path), session)
+        return total_size
+
+    async def estimate_peak_disk_usage(
+        self, metadata: Metadata, media_variants: Media, loaded_shapes: ParsedShapes = None, slides_data: Tuple = None
+    ) -> int:
+        """
+        Estimates the largest size that the temporary files of the job reach. The downloads stay until the end,
+        the frames, the slideshow, the resized deskshare and the slideshow with deskshare only exist
+        from their stage until their last consumer finished, if intermediate files are removed.
+        The frames are counted from the parsed slides, or from the render plan that is executed.
+        """
+        media_size = 0
+        deskshare_size = 0
+        async with self.http_session() as session:
+            for rel_file_path in [media_variants.webcams_rel_path, media_variants.deskshare_rel_path]:
+                if rel_file_path is None:
+                    continue
+                size = await self.get_download_size(rel_file_path, session)
+                if size is None:
+                    size = int(metadata.duration * self.MEDIA_BYTES_PER_SECOND)
+                media_size += size
+                if rel_file_path == media_variants.deskshare_rel_path:
+                    deskshare_size = size
+        if self.backup:
+            return media_size
+
+        if self.plan is not None:
+            # The frames and the slide images are known from the render plan
+            frame_count = len(self.plan['frames'])
+            image_count = len(self.plan['slide_images'])
+            width, height = self.plan['slideshow_size']
+        else:
+            frames, only_zooms, _ = slides_data
+            frame_count = len(frames)
+            image_count = len(loaded_shapes.image_urls)
+            width, height = self.slideshow_width, self.slideshow_height
+            if width is None or height is None:
+                width, height = self.get_slideshow_size(only_zooms, None, loaded_shapes) or self.DEFAULT_SLIDESHOW_SIZE
+        frame_size = self.get_frame_size(width, height)
+        # The slide images are about as large as the frames
+        downloads_size = media_size + image_count * frame_size
+
+        # Frames in memory do not take disk space
+        frames_size = max(0, frame_count * frame_size - self.frame_memory_cap)
+        slideshow_size = int(metadata.duration * self.SLIDESHOW_BYTES_PER_SECOND)
+        # The deskshare is encoded again in the size of the slideshow
+        resized_deskshare_size = deskshare_size
+        presentation_size = slideshow_size + resized_deskshare_size
+        if not self.remove_intermediates:
+            return downloads_size + frames_size + slideshow_size + resized_deskshare_size + presentation_size
+        return downloads_size + max(
+            frames_size + slideshow_size + resized_deskshare_size,
+            slideshow_size + resized_deskshare_size + presentation_size,
+        )
+
+    async def reserve_disk_budget(
+        self, metadata: Metadata, media_variants: Media, loaded_shapes: ParsedShapes = None, slides_data: Tuple = None
+    ):
+        """Waits until the estimated peak disk usage of the job fits into the disk budget and reserves it"""
+        peak_size = await self.estimate_peak_disk_usage(metadata, media_variants, loaded_shapes, slides_data)
+        Log.info(f'Estimated peak size of the temporary files: {format_bytes(peak_size)}')
+        if peak_size > self.disk_budget.max_size:
+            Log.error(
+                f'Error: The temporary files of this recording need about {format_bytes(peak_size)},'
+                + f' which exceeds the disk budget of {format_bytes(self.disk_budget.max_size)}. Abort!'
+            )
+            exit(-15)
+        await self.disk_budget.reserve(self.get_short_video_id(self.video_id), peak_size)
+
+    def get_lock_path(self, name: str) -> str:
+        return PT.get_in_dir(self.lock_dir, PT.to_valid_name(name.replace('/', '-')) + '.lock')
+
+    def get_lock(self, name: str, description: str) -> FileLock:
+        """Exclusive lock of a stage or file of the recording, that is shared with other processes"""
+        return FileLock(self.get_lock_path(name), description)
+
+    async def get_input_hash(self, rel_file_path: str) -> str:
+        """
+        Hash of a downloaded file, taken from the download manifest if the download was verified.
+        Other files are hashed in a worker thread, their hashes are kept until the files change.
+        @return: The sha256 hex digest, None if the file does not exist
+        """
+        local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+        if not os.path.isfile(local_path):
+            return None
+        entry = self.manifest.get(rel_file_path)
+        if entry is not None and entry.get('complete') and entry.get('sha256') is not None:
+            return entry['sha256']
+        file_hash = self.hash_cache.get(rel_file_path, local_path)
+        if file_hash is None:
+            hasher = await asyncio.get_running_loop().run_in_executor(None, hash_file, local_path)
+            file_hash = hasher.hexdigest()
+            self.hash_cache.set(rel_file_path, local_path, file_hash)
+        return file_hash
 
     def get_bbb_link(self, rel_file_path: str):
         assert not rel_file_path.startswith('/') and not rel_file_path.startswith('\\')
         return self.presentation_base_url + '/' + rel_file_path
 
-    async def get_can_continue_on_fail(self, url, session):
+    async def get_range_support(self, url: str, session: aiohttp.ClientSession) -> Tuple[bool, int, str]:
+        """
+        Probes the server with a small range request
+        @return: If the server supports range requests for the url, the total size of the file (or None)
+                 and the validator (ETag or Last-Modified) of the file (or None)
+        """
         try:
             headers = self.headers.copy()
             headers['Range'] = 'bytes=0-4'
-            ssl_context = SslHelper.get_ssl_context(
-                skip_cert_verify=self.skip_cert_verify,
-                allow_insecure_ssl=self.allow_insecure_ssl,
-                use_all_ciphers=self.use_all_ciphers,
-                force_tls_version=self.force_tls_version,
-            )
-            resp = await session.get(url, headers=headers, ssl=ssl_context)
-            return resp.headers.get('Content-Range') is not None and resp.status == 206
+            await self.circuit_breaker.wait(url)
+            async with session.get(url, headers=headers) as resp:
+                content_range = resp.headers.get('Content-Range')
+                if content_range is None or resp.status != 206:
+                    return False, None, None
+                validator = self.get_validator(resp)
+                m_obj = self.CONTENT_RANGE_RE.match(content_range)
+                if m_obj is None or m_obj.group('total') == '*':
+                    return True, None, validator
+                return True, int(m_obj.group('total')), validator
         except Exception as err:
             if self.verbose:
                 Log.debug(f"Failed to check if download can be continued on fail: {err}")
-        return False
+        return False, None, None
+
+    async def is_available_on_server(self, rel_file_path: str, session: aiohttp.ClientSession) -> bool:
+        """
+        Probes with a small range request if the server has a file. Failed probes are retried.
+        @return: False if the server answered that the file does not exist, True otherwise
+        """
+        if self.source is not None:
+            return self.source.has_file(rel_file_path)
+        url = self.get_bbb_link(rel_file_path)
+        headers = self.headers.copy()
+        headers['Range'] = 'bytes=0-0'
+        for tries_num in range(3):
+            try:
+                await self.circuit_breaker.wait(url)
+                async with self.dl_limiter:
+                    async with session.get(url, headers=headers) as resp:
+                        if resp.status in [200, 206]:
+                            return True
+                        if resp.status in [403, 404, 410]:
+                            return False
+                        if resp.status in self.RETRY_STATUSES:
+                            self.circuit_breaker.trip(url, resp.headers)
+                        if self.verbose:
+                            Log.debug(f'Probing {rel_file_path} returned status {resp.status}')
+            except (ClientError, OSError, asyncio.TimeoutError) as err:
+                if self.verbose:
+                    Log.debug(f'Failed to probe {rel_file_path}: {err}')
+            await asyncio.sleep(self.backoff_policy.get_delay(tries_num + 1))
+        # The server did not answer clearly, the download will show if the file exists
+        return True
+
+    async def resolve_media_variant(self, variants: List[str], session: aiohttp.ClientSession) -> str:
+        """
+        Chooses which of the variants of a media file (e.g. webcams.webm or webcams.mp4) is downloaded,
+        so that only one of them is downloaded. A variant that is already (partially) present in the
+        temporary directory is preferred, otherwise the variants are probed in priority order.
+        @return: rel_file_path of the chosen variant or None if the server has none of the variants
+        """
+        present_variants = []
+        for rel_file_path in variants:
+            local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+            if os.path.exists(local_path) or os.path.exists(local_path + '.part'):
+                present_variants.append(rel_file_path)
+
+        for rel_file_path in present_variants + [variant for variant in variants if variant not in present_variants]:
+            if rel_file_path in present_variants or await self.is_available_on_server(rel_file_path, session):
+                if self.verbose:
+                    Log.debug(f'Using {rel_file_path} of the variants {", ".join(variants)}')
+                return rel_file_path
+        if self.verbose:
+            Log.debug(f'The server has none of the variants {", ".join(variants)}')
+        return None
+
+    async def download_media_variant(
+        self, variants: List[str], rel_file_path: str, downloaded: bool, session: aiohttp.ClientSession
+    ) -> str:
+        """
+        Falls back to the next available variant if the chosen variant could not be downloaded
+        @return: rel_file_path of the downloaded variant or None if no variant could be downloaded
+        """
+        remaining_variants = list(variants)
+        while not downloaded and rel_file_path is not None:
+            remaining_variants.remove(rel_file_path)
+            rel_file_path = await self.resolve_media_variant(remaining_variants, session)
+            if rel_file_path is not None:
+                downloaded = (await self.batch_download_from_bbb([rel_file_path], False))[0]
+        return rel_file_path
+
+    async def is_unchanged_on_server(self, rel_file_path: str, url: str, session: aiohttp.ClientSession) -> bool:
+        """
+        Revalidates an already downloaded file with If-None-Match / If-Modified-Since.
+        Only a small range is requested, so an unchanged file costs one 304 response.
+        @return: True if the server reports the file as unchanged or it can not be revalidated
+        """
+        entry = self.manifest.get(rel_file_path)
+        if entry is None or (entry.get('etag') is None and entry.get('last_modified') is None):
+            if self.verbose:
+                Log.debug(f'{rel_file_path} has no stored validators and can not be revalidated')
+            return True
+
+        headers = self.headers.copy()
+        headers['Range'] = 'bytes=0-4'
+        if entry.get('etag') is not None:
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified') is not None:
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            await self.circuit_breaker.wait(url)
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304:
+                    return True
+                if resp.status in [200, 206]:
+                    return False
+                if self.verbose:
+                    Log.debug(f'Revalidation of {rel_file_path} returned status {resp.status}')
+        except Exception as err:
+            if self.verbose:
+                Log.debug(f'Failed to revalidate {rel_file_path}: {err}')
+        return True
+
+    async def get_can_continue_on_fail(self, url: str, session: aiohttp.ClientSession) -> bool:
+        can_continue_on_fail, _, _ = await self.get_range_support(url, session)
+        return can_continue_on_fail
+
+    @staticmethod
+    def get_validator(resp: aiohttp.ClientResponse) -> str:
+        """Returns the ETag or Last-Modified header that can be used for If-Range, or None"""
+        etag = resp.headers.get('ETag')
+        if etag is not None and not etag.startswith('W/'):
+            # Weak ETags are not allowed in If-Range
+            return etag
+        return resp.headers.get('Last-Modified')
+
+    def get_total_size(self, resp: aiohttp.ClientResponse) -> int:
+        """Returns the size of the complete file, or None if it is unknown"""
+        if resp.headers.get('Content-Encoding', 'identity') != 'identity':
+            # The received (decoded) data does not match the announced sizes
+            return None
+        if resp.status == 206:
+            m_obj = self.CONTENT_RANGE_RE.match(resp.headers.get('Content-Range', ''))
+            if m_obj is None or m_obj.group('total') == '*':
+                return None
+            return int(m_obj.group('total'))
+        content_length = resp.headers.get('Content-Length')
+        return int(content_length) if content_length is not None else None
 
     async def batch_download_from_bbb(self, dl_jobs: List[str], is_essential: bool = True) -> List[bool]:
         """
@@ -974,10 +1830,11 @@ class BBBDL:
         @param is_essential: Applied to all jobs
         """
 
-        semaphore = asyncio.Semaphore(self.max_parallel_dl)
-        dl_results = await asyncio.gather(
-            *[self.download_from_bbb(dl_job, semaphore) for dl_job in dl_jobs]
-        )
+        async with self.http_session() as session:
+            with DownloadProgress(dl_jobs, self.verbose) as progress:
+                dl_results = await asyncio.gather(
+                    *[self.download_from_bbb(dl_job, session, self.dl_limiter, progress) for dl_job in dl_jobs]
+                )
         if is_essential:
             for idx, downloaded in enumerate(dl_results):
                 if not downloaded:
@@ -985,124 +1842,534 @@ class BBBDL:
                     exit(1)
         return dl_results
 
+    @classmethod
+    def is_throttled(cls, err: Exception) -> bool:
+        """Returns True if the error indicates that the server is overloaded or throttles us"""
+        if isinstance(err, asyncio.TimeoutError):
+            return True
+        return isinstance(err, ClientResponseError) and err.status in cls.THROTTLE_STATUSES  # pylint: disable=no-member
+
     async def download_from_bbb(
         self,
         rel_file_path: str,
-        semaphore: asyncio.Semaphore,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        progress: DownloadProgress,
         conn_timeout: int = 10,
         read_timeout: int = 1800,
     ) -> bool:
-        """Returns True if the file was successfully downloaded or exists"""
-        local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
-        if os.path.exists(local_path):
-            # Warning: We do not check if the file is complete
-            Log.info(f'{rel_file_path} is already present')
-            return True
-        else:
-            PT.make_base_dir(local_path)
-            dl_url = self.get_bbb_link(rel_file_path)
-            if self.verbose:
-                Log.info(f'Downloading {rel_file_path} from: {dl_url}')
+        """
+        Gets the file from the local source directory if one is used, otherwise it is downloaded with
+        _download_from_bbb(). Reports the result to the progress display.
+        If another process downloads the same file, it waits for it and uses its download.
+        Returns True if the file was successfully downloaded or exists
+        """
+        async with self.dl_lock_slots, self.get_lock('dl-' + rel_file_path, rel_file_path):
+            self.manifest.refresh(rel_file_path)
+            if self.source is not None:
+                local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+                downloaded = await self.source.fetch(rel_file_path, local_path)
             else:
-                Log.info(f'Downloading {rel_file_path}...')
+                downloaded = await self._download_from_bbb(
+                    rel_file_path, session, limiter, progress, conn_timeout, read_timeout
+                )
+        progress.finish(rel_file_path, downloaded)
 
-            received = 0
-            total = 0
-            tries_num = 0
-            file_obj = None
-            can_continue_on_fail = False
-            headers = self.headers.copy()
-            finished_successfully = False
-            async with semaphore, aiohttp.ClientSession(
-                cookie_jar=self.get_cookie_jar(), conn_timeout=conn_timeout, read_timeout=read_timeout
-            ) as session:
-                while tries_num < self.max_dl_retries:
-                    try:
-                        if tries_num > 0 and can_continue_on_fail:
-                            headers["Range"] = f"bytes={received}-"
-                        elif not can_continue_on_fail and 'Range' in headers:
-                            del headers['Range']
-                        ssl_context = SslHelper.get_ssl_context(
-                            skip_cert_verify=self.skip_cert_verify,
-                            allow_insecure_ssl=self.allow_insecure_ssl,
-                            use_all_ciphers=self.use_all_ciphers,
-                            force_tls_version=self.force_tls_version,
+        stream = self.download_streams.pop(rel_file_path, None)
+        if stream is not None:
+            if downloaded:
+                stream.finish()
+            else:
+                stream.fail(StreamBrokenError(f'{rel_file_path} could not be downloaded'))
+        return downloaded
+
+    async def _download_from_bbb(
+        self,
+        rel_file_path: str,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        progress: DownloadProgress,
+        conn_timeout: int,
+        read_timeout: int,
+    ) -> bool:
+        """
+        Downloads a file into `<local_path>.part` and renames it after it was verified to be complete.
+        The state of the download is recorded in the download manifest, so that an interrupted download
+        can be resumed with If-Range in a later run.
+        Returns True if the file was successfully downloaded or exists
+        """
+        local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
+        dl_url = self.get_bbb_link(rel_file_path)
+        if os.path.exists(local_path):
+            if not self.manifest.is_complete(rel_file_path, local_path):
+                Log.warning(f'{rel_file_path} is incomplete and will be downloaded again')
+                os.unlink(local_path)
+                self.manifest.remove(rel_file_path)
+            elif not self.revalidate:
+                if self.verbose:
+                    Log.info(f'{rel_file_path} is already present')
+                return True
+            else:
+                async with limiter:
+                    unchanged = await self.is_unchanged_on_server(rel_file_path, dl_url, session)
+                if unchanged:
+                    if self.verbose:
+                        Log.info(f'{rel_file_path} is already present and up to date')
+                    return True
+                # The present file is only replaced after the new version was downloaded completely
+                Log.warning(f'{rel_file_path} changed on the server and will be downloaded again')
+                self.manifest.remove(rel_file_path)
+
+        PT.make_base_dir(local_path)
+        part_path = local_path + '.part'
+        if self.verbose:
+            Log.info(f'Downloading {rel_file_path} from: {dl_url}')
+
+        # A file that is read while it is downloaded needs its bytes in order, segments would leave holes that
+        # are only filled when their segments finish
+        if (
+            self.dl_segments > 1
+            and rel_file_path in self.SEGMENTED_DL_FILES
+            and rel_file_path not in self.download_streams
+        ):
+            async with limiter:
+                can_split, total_size, validator = await self.get_range_support(dl_url, session)
+                if can_split and total_size is not None and total_size >= self.min_segmented_dl_size:
+                    return await self.download_segmented(
+                        rel_file_path,
+                        dl_url,
+                        part_path,
+                        total_size,
+                        validator,
+                        session,
+                        limiter,
+                        progress,
+                        conn_timeout,
+                        read_timeout,
+                    )
+            if self.verbose:
+                Log.debug(f'{rel_file_path} is downloaded over a single connection')
+        elif rel_file_path in self.download_streams and self.verbose:
+            Log.debug(f'{rel_file_path} is downloaded over a single connection, because it is read while it grows')
+
+        # Check if we can resume an interrupted download
+        loop = asyncio.get_running_loop()
+        received = 0
+        hasher = hashlib.sha256()
+        entry = self.manifest.get(rel_file_path)
+        validator = entry.get('validator') if entry is not None else None
+        if os.path.isfile(part_path) and validator is not None and entry.get('segments') is None:
+            received = min(entry.get('received', 0), os.path.getsize(part_path))
+            if received > 0:
+                if self.verbose:
+                    Log.info(f'Resuming {rel_file_path} at {format_bytes(received)}')
+                # The hash of the file covers the part that was downloaded before
+                hasher = await loop.run_in_executor(None, hash_file, part_path, received)
+
+        total = None
+        writer = None
+        stream = self.download_streams.get(rel_file_path)
+        on_written = stream.add_written if stream is not None else None
+        tries_num = 0
+        can_continue_on_fail = received > 0
+        headers = self.headers.copy()
+        finished_successfully = False
+        timeout = aiohttp.ClientTimeout(total=read_timeout, connect=conn_timeout)
+        async with limiter:
+            while tries_num < self.max_dl_retries:
+                try:
+                    if received > 0 and can_continue_on_fail:
+                        headers['Range'] = f'bytes={received}-'
+                        if validator is not None:
+                            headers['If-Range'] = validator
+                    else:
+                        headers.pop('Range', None)
+                        headers.pop('If-Range', None)
+                    await self.circuit_breaker.wait(dl_url)
+                    async with session.get(dl_url, headers=headers, raise_for_status=True, timeout=timeout) as resp:
+                        if resp.status not in [200, 206]:
+                            if self.verbose:
+                                Log.debug(f"Warning {rel_file_path} got status {resp.status}")
+
+                        if received > 0 and resp.status != 206:
+                            # The file changed on the server or the range was ignored, we need to start over
+                            if self.verbose:
+                                Log.debug(f'Server sent the complete file {rel_file_path}, restarting download')
+                            received = 0
+                            hasher = hashlib.sha256()
+
+                        total = self.get_total_size(resp)
+                        validator = self.get_validator(resp) if total is not None else None
+                        self.manifest.update(
+                            rel_file_path,
+                            content_length=total,
+                            validator=validator,
+                            etag=resp.headers.get('ETag'),
+                            last_modified=resp.headers.get('Last-Modified'),
+                            received=received,
+                            complete=False,
                         )
-                        async with session.get(dl_url, headers=headers, raise_for_status=True, ssl=ssl_context) as resp:
-                            # Download the file.
-                            total = int(resp.headers.get("Content-Length", 0))
-                            content_range = resp.headers.get("Content-Range", "")  # Example: bytes 200-1000/67589
-
-                            if resp.status not in [200, 206]:
-                                if self.verbose:
-                                    Log.debug(f"Warning {rel_file_path} got status {resp.status}")
-
-                            if tries_num > 0 and can_continue_on_fail and not content_range and resp.status != 206:
-                                raise ContentRangeError(
-                                    f"Server did not response for {rel_file_path} with requested range data"
-                                )
-                            file_obj = file_obj or await aiofiles.open(local_path, "wb")
-                            chunk = await resp.content.read(1024 * 10)
+                        await self.manifest.save_async(force=False)
+                        progress.start(rel_file_path, total, received)
+
+                        # Download the file.
+                        with open(part_path, 'r+b' if received > 0 else 'wb') as file_obj:
+                            file_obj.truncate(received)
+                            if total is not None:
+                                await loop.run_in_executor(None, preallocate, file_obj, total)
+                            if stream is not None:
+                                stream.begin(part_path, [(0, received)])
                             chunk_idx = 0
-                            while chunk:
-                                received += len(chunk)
-                                if chunk_idx % 100 == 0:
-                                    Log.info(f"{rel_file_path} got {format_bytes(received)} / {format_bytes(total)}")
-                                await file_obj.write(chunk)
-                                chunk = await resp.content.read(1024 * 10)
-                                chunk_idx += 1
+                            chunk_size = self.bandwidth_limiter.get_chunk_size(self.DL_CHUNK_SIZE)
+                            async with ChunkWriter(file_obj, received, hasher, on_written=on_written) as writer:
+                                async for chunk in resp.content.iter_chunked(chunk_size):
+                                    received += len(chunk)
+                                    limiter.add_bytes(len(chunk))
+                                    progress.add_bytes(rel_file_path, len(chunk))
+                                    await writer.write(chunk)
+                                    await self.bandwidth_limiter.consume(len(chunk))
+                                    if chunk_idx % 10 == 0:
+                                        self.manifest.update(rel_file_path, received=writer.written_offset)
+                                        await self.manifest.save_async(force=False)
+                                    chunk_idx += 1
+
+                    if total is not None and received != total:
+                        raise IncompleteDownloadError(f'{rel_file_path} is incomplete, got {received} of {total} bytes')
+
+                    os.replace(part_path, local_path)
+                    self.manifest.update(rel_file_path, received=received, sha256=hasher.hexdigest(), complete=True)
+                    await self.manifest.save_async()
+                    if self.asset_store is not None:
+                        self.asset_store.add(local_path, hasher.hexdigest())
+                    self.circuit_breaker.record_success(dl_url)
+
+                    if self.verbose:
+                        Log.success(f'Downloaded {rel_file_path} to: {local_path}')
+
+                    finished_successfully = True
+                    break
 
-                        if self.verbose:
-                            Log.success(f'Downloaded {rel_file_path} to: {local_path}')
+                except (ClientError, OSError, ValueError, asyncio.TimeoutError, IncompleteDownloadError) as err:
+                    if writer is not None:
+                        # Only the written data can be resumed, the hasher also only contains the written data
+                        received = writer.written_offset
+                        writer = None
+                    if tries_num == 0 and not can_continue_on_fail:
+                        can_continue_on_fail = await self.get_can_continue_on_fail(dl_url, session)
+                    if not can_continue_on_fail and received > 0:
+                        # Clean up failed file because we can not recover
+                        if os.path.exists(part_path):
+                            os.unlink(part_path)
+                        received = 0
+                        hasher = hashlib.sha256()
+                    self.manifest.update(rel_file_path, received=received)
+                    await self.manifest.save_async(force=False)
+                    if self.is_throttled(err):
+                        limiter.on_throttled()
+
+                    if isinstance(err, ClientResponseError):
+                        if err.status in self.RETRY_STATUSES:  # pylint: disable=no-member
+                            # Pause all downloads from this host, the next try waits for the pause
+                            self.circuit_breaker.trip(dl_url, err.headers)
                         else:
-                            Log.success(f'Successfully downloaded {rel_file_path}')
-
-                        finished_successfully = True
-                        break
-
-                    except (ClientError, OSError, ValueError, ContentRangeError) as err:
-                        if tries_num == 0:
-                            can_continue_on_fail = await self.get_can_continue_on_fail(dl_url, session)
-                        if (not can_continue_on_fail and received > 0) or isinstance(err, ContentRangeError):
-                            can_continue_on_fail = False
-                            # Clean up failed file because we can not recover
-                            if file_obj is not None:
-                                await file_obj.close()
-                                file_obj = None
-                            if os.path.exists(local_path):
-                                os.unlink(local_path)
-                            received = 0
+                            Log.info(f'{rel_file_path} could not be downloaded: {err.status} {err.message}')
+                            if self.verbose:
+                                Log.info(f'Error: {str(err)}')
+                            break
+                    else:
+                        # Connection problems of this file are retried with a jittered exponential backoff
+                        await asyncio.sleep(self.backoff_policy.get_delay(tries_num + 1))
+
+                    if self.verbose:
+                        Log.warning(
+                            f'(Try {tries_num} of {self.max_dl_retries})'
+                            + f' Unable to download "{rel_file_path}": {str(err)}'
+                        )
+                    tries_num += 1
+
+        if not finished_successfully:
+            if received == 0 or validator is None:
+                # Nothing that could be resumed in a later run
+                if os.path.exists(part_path):
+                    os.unlink(part_path)
+                self.manifest.remove(rel_file_path)
+                await self.manifest.save_async()
+            return False
+        return True
+
+    async def download_segmented(
+        self,
+        rel_file_path: str,
+        dl_url: str,
+        part_path: str,
+        total_size: int,
+        validator: str,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        progress: DownloadProgress,
+        conn_timeout: int,
+        read_timeout: int,
+    ) -> bool:
+        """
+        Downloads a file in `self.dl_segments` byte ranges concurrently into a preallocated `.part` file.
+        Only segments that failed are requested again, starting from the last received byte.
+        The remaining segments are stored in the download manifest, so a later run can resume them.
+        Returns True if the file was completely downloaded
+        """
+        local_path = part_path[: -len('.part')]
+        entry = self.manifest.get(rel_file_path)
+        if (
+            entry is not None
+            and entry.get('segments') is not None
+            and validator is not None
+            and entry.get('validator') == validator
+            and entry.get('content_length') == total_size
+            and os.path.isfile(part_path)
+            and os.path.getsize(part_path) == total_size
+        ):
+            pending_segments = entry['segments']
+            if self.verbose:
+                Log.info(f'Resuming {len(pending_segments)} segments of {rel_file_path}')
+        else:
+            segment_size = math.ceil(total_size / self.dl_segments)
+            # Every segment is a list of [next_byte_to_fetch, last_byte]
+            pending_segments = [
+                [start, min(start + segment_size, total_size) - 1] for start in range(0, total_size, segment_size)
+            ]
+            with open(part_path, 'wb') as file_obj:
+                await asyncio.get_running_loop().run_in_executor(None, preallocate, file_obj, total_size)
+
+        def get_received():
+            return total_size - sum(segment[1] + 1 - segment[0] for segment in pending_segments)
+
+        stream = self.download_streams.get(rel_file_path)
+        if stream is not None:
+            # Everything except the remaining bytes of the pending segments is written
+            written_ranges = []
+            position = 0
+            for segment in sorted(pending_segments):
+                if segment[0] > position:
+                    written_ranges.append((position, segment[0]))
+                position = segment[1] + 1
+            if position < total_size:
+                written_ranges.append((position, total_size))
+            stream.begin(part_path, written_ranges)
+
+        self.manifest.update(
+            rel_file_path,
+            content_length=total_size,
+            validator=validator,
+            received=get_received(),
+            segments=pending_segments,
+            complete=False,
+        )
+        await self.manifest.save_async(force=False)
+
+        status_dict = {'received': get_received(), 'chunk_idx': 0}
+        progress.start(rel_file_path, total_size, get_received())
+        timeout = aiohttp.ClientTimeout(total=read_timeout, connect=conn_timeout)
+
+        tries_num = 0
+        while len(pending_segments) > 0 and tries_num < self.max_dl_retries:
+            if tries_num > 0:
+                if self.verbose:
+                    Log.warning(
+                        f'(Try {tries_num} of {self.max_dl_retries}) Retrying {len(pending_segments)} failed segments'
+                        + f' of "{rel_file_path}"'
+                    )
+                await asyncio.sleep(self.backoff_policy.get_delay(tries_num))
+            dl_results = await asyncio.gather(
+                *[
+                    self.download_segment(
+                        rel_file_path,
+                        dl_url,
+                        part_path,
+                        segment,
+                        validator,
+                        session,
+                        limiter,
+                        progress,
+                        timeout,
+                        status_dict,
+                    )
+                    for segment in pending_segments
+                ]
+            )
+            pending_segments = [segment for idx, segment in enumerate(pending_segments) if not dl_results[idx]]
+            self.manifest.update(rel_file_path, received=get_received(), segments=pending_segments)
+            await self.manifest.save_async(force=False)
+            tries_num += 1
+
+        if len(pending_segments) > 0:
+            Log.info(f'{rel_file_path} could not be downloaded: {len(pending_segments)} segments failed')
+            if validator is None:
+                # Nothing that could be resumed in a later run
+                os.unlink(part_path)
+                self.manifest.remove(rel_file_path)
+                await self.manifest.save_async()
+            return False
+
+        hasher = await asyncio.get_running_loop().run_in_executor(None, hash_file, part_path)
+        os.replace(part_path, local_path)
+        self.manifest.update(
+            rel_file_path, received=total_size, segments=None, sha256=hasher.hexdigest(), complete=True
+        )
+        await self.manifest.save_async()
+        if self.asset_store is not None:
+            self.asset_store.add(local_path, hasher.hexdigest())
 
-                        if isinstance(err, ClientResponseError):
-                            if err.status in [408, 409, 429]:  # pylint: disable=no-member
-                                # 408 (timeout) or 409 (conflict) and 429 (too many requests)
-                                # Retry after 1 sec
-                                await asyncio.sleep(1)
-                            else:
-                                Log.info(f'{rel_file_path} could not be downloaded: {err.status} {err.message}')
-                                if self.verbose:
-                                    Log.info(f'Error: {str(err)}')
+        if self.verbose:
+            Log.success(f'Downloaded {rel_file_path} in {self.dl_segments} segments to: {local_path}')
+        return True
+
+    async def download_segment(
+        self,
+        rel_file_path: str,
+        dl_url: str,
+        part_path: str,
+        segment: List[int],
+        validator: str,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        progress: DownloadProgress,
+        timeout: aiohttp.ClientTimeout,
+        status_dict: Dict,
+    ) -> bool:
+        """
+        Downloads the remaining bytes of one segment and advances segment[0] while writing
+        Returns True if the segment is complete
+        """
+        headers = self.headers.copy()
+        headers['Range'] = f'bytes={segment[0]}-{segment[1]}'
+        if validator is not None:
+            headers['If-Range'] = validator
+        try:
+            await self.circuit_breaker.wait(dl_url)
+            async with session.get(dl_url, headers=headers, raise_for_status=True, timeout=timeout) as resp:
+                if resp.status != 206:
+                    raise ContentRangeError(f"Server did not response for {rel_file_path} with requested range data")
+                self.manifest.update(
+                    rel_file_path, etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified')
+                )
+                stream = self.download_streams.get(rel_file_path)
+                with open(part_path, 'r+b') as file_obj:
+                    writer = ChunkWriter(
+                        file_obj, segment[0], on_written=stream.add_written if stream is not None else None
+                    )
+                    chunk_size = self.bandwidth_limiter.get_chunk_size(self.DL_CHUNK_SIZE)
+                    try:
+                        async for chunk in resp.content.iter_chunked(chunk_size):
+                            chunk = chunk[: segment[1] + 1 - writer.offset]
+                            await writer.write(chunk)
+                            limiter.add_bytes(len(chunk))
+                            progress.add_bytes(rel_file_path, len(chunk))
+                            status_dict['received'] += len(chunk)
+                            await self.bandwidth_limiter.consume(len(chunk))
+                            if status_dict['chunk_idx'] % 10 == 0:
+                                # The manifest only records data that is already written
+                                segment[0] = writer.written_offset
+                                self.manifest.update(rel_file_path, received=status_dict['received'])
+                                await self.manifest.save_async(force=False)
+                            status_dict['chunk_idx'] += 1
+                            if writer.offset > segment[1]:
                                 break
+                    finally:
+                        await writer.flush()
+                        segment[0] = writer.written_offset
+        except (ClientError, OSError, ValueError, ContentRangeError, asyncio.TimeoutError) as err:
+            if self.is_throttled(err):
+                limiter.on_throttled()
+            if isinstance(err, ClientResponseError) and err.status in self.RETRY_STATUSES:  # pylint: disable=no-member
+                self.circuit_breaker.trip(dl_url, err.headers)
+            if self.verbose:
+                Log.warning(f'Unable to download segment {segment[0]}-{segment[1]} of "{rel_file_path}": {str(err)}')
+            return False
 
-                        if self.verbose:
-                            Log.warning(
-                                f'(Try {tries_num} of {self.max_dl_retries})'
-                                + f' Unable to download "{rel_file_path}": {str(err)}'
-                            )
-                        tries_num += 1
-
-            if file_obj is not None:
-                await file_obj.close()
-            if not finished_successfully:
-                if os.path.exists(local_path):
-                    os.unlink(local_path)
-                return False
-            return True
+        return segment[0] > segment[1]
+
+    async def stream_from_bbb(
+        self,
+        rel_file_path: str,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        progress: DownloadProgress,
+        conn_timeout: int = 10,
+        read_timeout: int = 60,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the chunks of a file from the server without storing it.
+        An interrupted response is continued with a range request from the last received byte,
+        a StreamBrokenError is raised if that is not possible, because the chunks were already consumed.
+        """
+        dl_url = self.get_bbb_link(rel_file_path)
+        if self.verbose:
+            Log.info(f'Streaming {rel_file_path} from: {dl_url}')
+
+        received = 0
+        total = None
+        validator = None
+        tries_num = 0
+        headers = self.headers.copy()
+        # The consumer paces the download, so only a stalled connection is a timeout
+        timeout = aiohttp.ClientTimeout(total=None, connect=conn_timeout, sock_read=read_timeout)
+        async with limiter:
+            while True:
+                try:
+                    if received > 0:
+                        headers['Range'] = f'bytes={received}-'
+                        if validator is not None:
+                            headers['If-Range'] = validator
+                    await self.circuit_breaker.wait(dl_url)
+                    async with session.get(dl_url, headers=headers, raise_for_status=True, timeout=timeout) as resp:
+                        if received > 0 and resp.status != 206:
+                            raise StreamBrokenError(f'{rel_file_path} can not be continued at {format_bytes(received)}')
+                        if received == 0:
+                            total = self.get_total_size(resp)
+                            validator = self.get_validator(resp) if total is not None else None
+                            progress.start(rel_file_path, total)
+
+                        chunk_size = self.bandwidth_limiter.get_chunk_size(self.DL_CHUNK_SIZE)
+                        async for chunk in resp.content.iter_chunked(chunk_size):
+                            received += len(chunk)
+                            limiter.add_bytes(len(chunk))
+                            progress.add_bytes(rel_file_path, len(chunk))
+                            await self.bandwidth_limiter.consume(len(chunk))
+                            yield chunk
+
+                    if total is not None and received != total:
+                        raise IncompleteDownloadError(f'{rel_file_path} is incomplete, got {received} of {total} bytes')
+                    self.circuit_breaker.record_success(dl_url)
+                    return
+
+                except (ClientError, asyncio.TimeoutError, IncompleteDownloadError) as err:
+                    tries_num += 1
+                    if self.is_throttled(err):
+                        limiter.on_throttled()
+                    if isinstance(err, ClientResponseError):
+                        if err.status not in self.RETRY_STATUSES:  # pylint: disable=no-member
+                            raise
+                        self.circuit_breaker.trip(dl_url, err.headers)
+                    if tries_num >= self.max_dl_retries:
+                        raise
+                    if not isinstance(err, ClientResponseError):
+                        await asyncio.sleep(self.backoff_policy.get_delay(tries_num))
+
+                    if self.verbose:
+                        Log.warning(
+                            f'(Try {tries_num} of {self.max_dl_retries})'
+                            + f' Unable to stream "{rel_file_path}": {str(err)}'
+                        )
 
-    def load_xml(self, rel_file_path: str, is_essential: bool = True):
+    def load_xml(self, rel_file_path: str, is_essential: bool = True, parse=None):
+        """
+        Loads an XML file as element tree, or with `parse` that is called with the path of the file,
+        e.g. a streaming parser for the large files
+        """
         local_path = PT.get_in_dir(self.tmp_dir, rel_file_path)
         if os.path.exists(local_path):
             try:
+                if parse is not None:
+                    return parse(local_path)
                 tree_root = ET.parse(local_path).getroot()
                 return tree_root
             except ParseError as err:
@@ -1119,162 +2386,421 @@ class BBBDL:
             else:
                 return None
 
-    def final_mux(
-        self,
-        slideshow_path: str,
-        webcams_path: str,
-        webcams_rel_path: str,
-        metadata: Metadata,
-    ):
-        webcam_is_empty = False
-        if not self.skip_webcam_opt and not self.skip_webcam_freeze_detection_opt:
+    async def detect_webcam_freeze(self, media: Media) -> bool:
+        """Returns True if the webcams video is completely frozen"""
+        if self.skip_webcam_opt or self.skip_webcam_freeze_detection_opt:
+            return False
+
+        webcams_rel_path = media.webcams_rel_path
+        detected = False
+        if self.freeze_detection is not None:
+            detected, webcam_is_empty = await self.get_stream_result(self.freeze_detection, webcams_rel_path)
+            self.freeze_detection = None
+        if not detected:
             Log.info(f'Try to detect freeze in {webcams_rel_path}...')
             with Timer() as t:
-                webcam_is_empty = asyncio.run(self.ffmpeg.freeze_detect(webcams_path))
+                # The CPU slot is only taken here, the detection while streaming holds its own slot
+                async with self.governor.cpu(1, 'the freeze detection'):
+                    webcam_is_empty = await self.ffmpeg.freeze_detect(PT.get_in_dir(self.tmp_dir, webcams_rel_path))
 
             Log.info(f'Detection of freeze finished and took: {formatSeconds(t.duration)}')
-            if webcam_is_empty:
-                Log.yellow('Webcam is empty, webcam will not be added to the final presentation')
+        if webcam_is_empty:
+            Log.yellow('Webcam is empty, webcam will not be added to the final presentation')
+        return webcam_is_empty
+
+    def get_rel_path(self, path: str) -> str:
+        """Paths in a render plan are relative to the temporary directory, so that another machine can execute it"""
+        return os.path.relpath(path, self.tmp_dir)
+
+    def get_slideshow_step(self, slides: Slides) -> Dict:
+        frames = slides.frames
+        frame_durations = []
+        timestamps = list(frames.keys())
+        for idx in range(len(timestamps) - 1):
+            duration = math.floor(10 * (timestamps[idx + 1] - timestamps[idx]) + 0.5) / 10
+            frame_durations.append((frames[timestamps[idx]], formatSeconds(duration, msec=True)))
+
+        key = self.stage_cache.get_key(
+            'slideshow',
+            slides.key,
+            [(frame.capture_filename, duration) for frame, duration in frame_durations],
+            self.ffmpeg.get_encoding_options(),
+        )
+        slideshow_txt_path = self.get_rel_path(PT.get_in_dir(self.frames_dir, 'slideshow.txt'))
+        return {
+            'stage': 'slideshow',
+            'title': 'creating slideshow',
+            'result': self.get_rel_path(self.stage_cache.get_path('slideshow', key)),
+            'concat': {
+                'path': slideshow_txt_path,
+                # The frames are looked up in the frame store when the concat file is written
+                'frames': True,
+                'entries': [
+                    {'file': frame.capture_filename, 'duration': duration} for frame, duration in frame_durations
+                ],
+            },
+            'command': self.ffmpeg.get_create_slideshow_command(slideshow_txt_path),
+            'show_progress': True,
+        }
 
-        Log.info("Mux final slideshow")
-        result_path = self.get_output_file_path(metadata)
-        if os.path.isfile(result_path):
-            Log.warning("Final Slideshow already exists. Abort!")
-            exit(0)
+    async def get_deskshare_step(self, media: Media, deskshare_events: List[Deskshare]) -> Dict:
+        """Resizes the deskshare video to the size of the slideshow, None if no desk was shared"""
+        if media.deskshare_rel_path is None or len(deskshare_events) == 0:
+            return None
+
+        key = self.stage_cache.get_key(
+            'deskshare',
+            await self.get_input_hash(media.deskshare_rel_path),
+            self.slideshow_width,
+            self.slideshow_height,
+            self.ffmpeg.get_encoding_options(),
+        )
+        return {
+            'stage': 'deskshare',
+            'title': 'resizing screen share',
+            'result': self.get_rel_path(self.stage_cache.get_path('deskshare', key)),
+            'command': self.ffmpeg.get_resize_deskshare_command(
+                media.deskshare_rel_path, self.slideshow_width, self.slideshow_height
+            ),
+            # Runs next to the capturing of the frames
+            'show_progress': False,
+        }
 
-        with Timer() as t:
-            if self.skip_webcam_opt or webcam_is_empty:
-                asyncio.run(
-                    self.ffmpeg.add_audio_to_slideshow(
-                        slideshow_path,
-                        webcams_path,
-                        result_path,
-                    )
+    def get_presentation_step(
+        self,
+        slideshow_path: str,
+        resized_deskshare_path: str,
+        deskshare_events: List[Deskshare],
+        metadata: Metadata,
+    ) -> Dict:
+        # The outputs of the other stages are named by their keys
+        slideshow_filename = os.path.basename(slideshow_path)
+        deskshare_filename = os.path.basename(resized_deskshare_path)
+        key = self.stage_cache.get_key(
+            'presentation',
+            slideshow_filename,
+            deskshare_filename,
+            [asdict(event) for event in deskshare_events],
+            metadata.duration,
+            self.ffmpeg.get_encoding_options(),
+        )
+
+        entries = []
+        for idx, event in enumerate(deskshare_events):
+            if idx == 0 and event.start_timestamp > 0:
+                # Adding beginning
+                duration = math.floor(10 * (event.start_timestamp) + 0.5) / 10
+                entries.append(self.get_concat_entry(slideshow_filename, 0.0, event.start_timestamp, duration))
+            elif idx > 0:
+                # Adding part between deskshare
+                duration = (
+                    math.floor(10 * (event.start_timestamp - deskshare_events[idx - 1].stop_timestamp) + 0.5) / 10
                 )
-            else:
-                asyncio.run(
-                    self.ffmpeg.add_webcam_to_slideshow(
-                        slideshow_path,
-                        webcams_path,
-                        self.slideshow_width,
-                        self.slideshow_height,
-                        result_path,
+                entries.append(
+                    self.get_concat_entry(
+                        slideshow_filename, deskshare_events[idx - 1].stop_timestamp, event.start_timestamp, duration
                     )
                 )
 
-        Log.info(f'Mux final slideshow finished and took: {formatSeconds(t.duration)}')
+            # Adding deskshare
+            duration = math.floor(10 * (event.stop_timestamp - event.start_timestamp) + 0.5) / 10
+            entries.append(
+                self.get_concat_entry(deskshare_filename, event.start_timestamp, event.stop_timestamp, duration)
+            )
+
+            if idx == (len(deskshare_events) - 1) and event.stop_timestamp < metadata.duration:
+                # Adding finish
+                duration = math.floor(10 * (metadata.duration - event.stop_timestamp) + 0.5) / 10
+                entries.append(
+                    self.get_concat_entry(slideshow_filename, event.stop_timestamp, metadata.duration, duration)
+                )
+
+        # The concat file is next to the other outputs, it refers to them by their file names
+        deskshare_txt_path = self.get_rel_path(self.stage_cache.get_path('presentation', key, '.txt'))
+        return {
+            'stage': 'presentation',
+            'title': 'adding screen share to slideshow',
+            'result': self.get_rel_path(self.stage_cache.get_path('presentation', key)),
+            'concat': {'path': deskshare_txt_path, 'entries': entries},
+            'command': self.ffmpeg.get_add_deskshare_command(deskshare_txt_path),
+            'show_progress': True,
+        }
+
+    @staticmethod
+    def get_concat_entry(filename: str, inpoint: float, outpoint: float, duration: float) -> Dict:
+        return {
+            'file': filename,
+            'inpoint': '0.0' if inpoint == 0 else formatSeconds(inpoint, msec=True),
+            'outpoint': formatSeconds(outpoint, msec=True),
+            'duration': formatSeconds(duration, msec=True),
+        }
+
+    def get_final_mux_step(
+        self,
+        presentation_path: str,
+        media: Media,
+        webcam_is_empty: bool,
+        metadata: Metadata,
+    ) -> Dict:
+        presentation_rel_path = self.get_rel_path(presentation_path)
+        if self.skip_webcam_opt or webcam_is_empty:
+            command = self.ffmpeg.get_add_audio_command(presentation_rel_path, media.webcams_rel_path)
+        else:
+            command = self.ffmpeg.get_add_webcam_command(
+                presentation_rel_path, media.webcams_rel_path, self.slideshow_width, self.slideshow_height
+            )
+        return {
+            'stage': 'final_mux',
+            'title': 'muxing final slideshow',
+            # The final video is written to the output directory of the machine that executes the plan
+            'output_file': os.path.basename(self.get_output_file_path(metadata)),
+            'command': command,
+            'show_progress': True,
+        }
+
+    def resolve_memory_frame(self, capture_filename: str) -> str:
+        """Frames in memory are not next to the concat file, they are referenced by their path"""
+        capture_path = self.frame_store.find(capture_filename)
+        if capture_path is not None and self.frame_store.is_in_memory(capture_path):
+            return capture_path
+        return capture_filename
+
+    def write_step_concat_file(self, concat: Dict):
+        write_concat_file(
+            PT.get_in_dir(self.tmp_dir, concat['path']),
+            concat['entries'],
+            self.resolve_memory_frame if concat.get('frames', False) else None,
+        )
+
+    async def run_render_step(self, step: Dict) -> str:
+        """
+        Runs an encoding of the render plan, unless its result already exists with the same inputs and options
+        @return: The path of the result
+        """
+        title = step['title']
+        if step.get('output_file') is not None:
+            result_path = PT.get_in_dir(self.output_dir, step['output_file'])
+            if os.path.isfile(result_path):
+                Log.warning("Final Slideshow already exists. Abort!")
+                exit(0)
+            output_path = result_path
+        else:
+            result_path = PT.get_in_dir(self.tmp_dir, step['result'])
+            if self.stage_cache.lookup(result_path):
+                Log.warning(
+                    f'The result of {title} does already exist with the same inputs and options! Skipping rendering!'
+                )
+                self.stage_cache.keep(step['stage'], result_path)
+                return result_path
+            output_path = self.stage_cache.get_part_path(result_path)
+
+        Log.info(f'Start {title}...')
+        if step.get('concat') is not None:
+            self.write_step_concat_file(step['concat'])
+        with Timer() as t:
+            await self.ffmpeg.run_command(step['command'], output_path, self.tmp_dir, step['show_progress'])
+        if step.get('output_file') is None:
+            self.stage_cache.store(step['stage'], result_path)
+        Log.info(f'{title[0].upper() + title[1:]} finished and took: {formatSeconds(t.duration)}')
         return result_path
 
-    def add_deskshare_to_slideshow(
+    async def get_planned_step(self, stage: str, build_step, *args) -> Dict:
+        """In the execute mode the steps are taken from the render plan, otherwise they are built from the inputs"""
+        if self.plan is not None:
+            return self.plan['steps'].get(stage)
+        step = build_step(*args)
+        if asyncio.iscoroutine(step):
+            step = await step
+        return step
+
+    async def final_mux(
+        self,
+        presentation_path: str,
+        media: Media,
+        webcam_is_empty: bool,
+        metadata: Metadata,
+    ):
+        step = await self.get_planned_step(
+            'final_mux', self.get_final_mux_step, presentation_path, media, webcam_is_empty, metadata
+        )
+        return await self.run_render_step(step)
+
+    async def resize_deskshare(self, media: Media, deskshare_events: List[Deskshare]) -> str:
+        """@return: The path of the resized deskshare video, None if no desk was shared"""
+        step = await self.get_planned_step('deskshare', self.get_deskshare_step, media, deskshare_events)
+        if step is None:
+            return None
+        return await self.run_render_step(step)
+
+    async def add_deskshare_to_slideshow(
         self,
         slideshow_path: str,
-        deskshare_path: str,
+        resized_deskshare_path: str,
         deskshare_events: List[Deskshare],
         metadata: Metadata,
     ):
-        if deskshare_path is None or len(deskshare_events) == 0:
+        if resized_deskshare_path is None:
             return slideshow_path
 
-        presentation_path = PT.get_in_dir(self.tmp_dir, 'presentation.mp4')
-        if os.path.isfile(presentation_path):
-            Log.warning('Slideshow with deskshare does already exist! Skipping rendering!')
-            return presentation_path
+        step = await self.get_planned_step(
+            'presentation',
+            self.get_presentation_step,
+            slideshow_path,
+            resized_deskshare_path,
+            deskshare_events,
+            metadata,
+        )
+        return await self.run_render_step(step)
 
-        Log.info('Resizing screen share...')
-        resized_deskshare_path = PT.get_in_dir(self.tmp_dir, 'deskshare.mp4')
-        if os.path.isfile(resized_deskshare_path):
-            Log.warning('Resized screen share does already exist! Skipping rendering!')
-        else:
-            with Timer() as t:
-                asyncio.run(
-                    self.ffmpeg.resize_deskshare(
-                        deskshare_path,
-                        resized_deskshare_path,
-                        self.slideshow_width,
-                        self.slideshow_height,
-                    )
-                )
-            Log.info(f'Resizing screen share finished and took: {formatSeconds(t.duration)}')
-
-        Log.info('Start adding screen share to slideshow...')
-        deskshare_txt_path = PT.get_in_dir(self.tmp_dir, 'deskshare.txt')
-        with open(deskshare_txt_path, 'w', encoding="utf-8") as concat_file:
-            for idx, event in enumerate(deskshare_events):
-                if idx == 0 and event.start_timestamp > 0:
-                    # Adding beginning
-                    duration = math.floor(10 * (event.start_timestamp) + 0.5) / 10
-                    concat_file.write("file 'slideshow.mp4'\n")
-                    concat_file.write("inpoint 0.0\n")
-                    concat_file.write(f"outpoint {formatSeconds(event.start_timestamp, msec=True)}\n")
-                    concat_file.write(f"duration {formatSeconds(duration, msec=True)}\n")
-                elif idx > 0:
-                    # Adding part between deskshare
-                    duration = (
-                        math.floor(10 * (event.start_timestamp - deskshare_events[idx - 1].stop_timestamp) + 0.5) / 10
-                    )
-                    concat_file.write("file 'slideshow.mp4'\n")
-                    concat_file.write(f"inpoint {formatSeconds(deskshare_events[idx - 1].stop_timestamp, msec=True)}\n")
-                    concat_file.write(f"outpoint {formatSeconds(event.start_timestamp, msec=True)}\n")
-                    concat_file.write(f"duration {formatSeconds(duration, msec=True)}\n")
-
-                # Adding deskshare
-                duration = math.floor(10 * (event.stop_timestamp - event.start_timestamp) + 0.5) / 10
-                concat_file.write("file 'deskshare.mp4'\n")
-                concat_file.write(f"inpoint {formatSeconds(event.start_timestamp, msec=True)}\n")
-                concat_file.write(f"outpoint {formatSeconds(event.stop_timestamp, msec=True)}\n")
-                concat_file.write(f"duration {formatSeconds(duration, msec=True)}\n")
-
-                if idx == (len(deskshare_events) - 1) and event.stop_timestamp < metadata.duration:
-                    # Adding finish
-                    duration = math.floor(10 * (metadata.duration - event.stop_timestamp) + 0.5) / 10
-                    concat_file.write("file 'slideshow.mp4'\n")
-                    concat_file.write(f"inpoint {formatSeconds(event.stop_timestamp, msec=True)}\n")
-                    concat_file.write(f"outpoint {formatSeconds(metadata.duration, msec=True)}\n")
-                    concat_file.write(f"duration {formatSeconds(duration, msec=True)}\n")
+    async def create_slideshow(self, slides: Slides):
+        step = await self.get_planned_step('slideshow', self.get_slideshow_step, slides)
+        return await self.run_render_step(step)
 
-        with Timer() as t:
-            asyncio.run(self.ffmpeg.add_deskshare_to_slideshow(deskshare_txt_path, presentation_path))
-        Log.info(f'Adding screen share to slideshow finished and took: {formatSeconds(t.duration)}')
-        return presentation_path
-
-    def create_slideshow(self, frames: Dict[float, Frame]):
-        Log.info('Start creating slideshow...')
-        slideshow_path = PT.get_in_dir(self.tmp_dir, 'slideshow.mp4')
-        if os.path.isfile(slideshow_path):
-            Log.warning('Slideshow does already exist! Skipping rendering!')
-            return slideshow_path
+    async def write_render_plan(
+        self,
+        loaded_shapes: ParsedShapes,
+        slides: Slides,
+        media: Media,
+        deskshare_events: List[Deskshare],
+        webcam_is_empty: bool,
+        metadata: Metadata,
+    ) -> str:
+        """Writes the parsed recording and all encodings as render plan, that can be executed later"""
+        steps = {'slideshow': self.get_slideshow_step(slides)}
+        presentation_path = steps['slideshow']['result']
+        deskshare_step = await self.get_deskshare_step(media, deskshare_events)
+        if deskshare_step is not None:
+            steps['deskshare'] = deskshare_step
+            steps['presentation'] = self.get_presentation_step(
+                steps['slideshow']['result'], deskshare_step['result'], deskshare_events, metadata
+            )
+            presentation_path = steps['presentation']['result']
+        steps['final_mux'] = self.get_final_mux_step(
+            PT.get_in_dir(self.tmp_dir, presentation_path), media, webcam_is_empty, metadata
+        )
 
-        slideshow_txt_path = PT.get_in_dir(self.frames_dir, 'slideshow.txt')
-        with open(slideshow_txt_path, 'w', encoding="utf-8") as concat_file:
-            timestamps = list(frames.keys())
-            for idx in range(len(timestamps) - 1):
-                duration = math.floor(10 * (timestamps[idx + 1] - timestamps[idx]) + 0.5) / 10
-                concat_file.write(f"file '{frames[timestamps[idx]].capture_filename}'\n")
-                concat_file.write(f"duration {formatSeconds(duration, msec=True)}\n")
+        write_render_plan(
+            self.plan_path,
+            {
+                'url': self.dl_url,
+                'video_id': self.video_id,
+                'metadata': asdict(metadata),
+                'media': asdict(media),
+                'slideshow_size': [self.slideshow_width, self.slideshow_height],
+                'slide_images': loaded_shapes.image_urls,
+                # Options that the capturing of the frames needs besides the frames
+                'capture': {'skip_zoom': self.skip_zoom_opt},
+                'frames_key': slides.key,
+                'frames': [self.frame_to_dict(frame) for frame in slides.frames.values()],
+                'only_zooms': [self.frame_to_dict(frame) for frame in slides.only_zooms.values()],
+                'partitions': slides.partitions,
+                'webcam_is_empty': webcam_is_empty,
+                'steps': steps,
+            },
+        )
+        Log.info(f'Render plan with {len(slides.frames)} frames and {len(steps)} encodings written')
+        return self.plan_path
 
-            # We use the second to last frame again, because the last frame is always empty.
-            # concat_file.write(f"file {frames[timestamps[-2]].capture_filename}\n")
+    @staticmethod
+    def frame_to_dict(frame: Frame) -> Dict:
+        return {
+            'timestamp': frame.timestamp,
+            'capture_filename': frame.capture_filename,
+            'actions': [{**asdict(action), 'action_type': action.action_type.name} for action in frame.actions],
+        }
 
-        with Timer() as t:
-            asyncio.run(self.ffmpeg.create_slideshow(slideshow_txt_path, slideshow_path))
-        Log.info(f'Creating slideshow finished and took: {formatSeconds(t.duration)}')
-        return slideshow_path
+    @staticmethod
+    def frame_from_dict(frame_dict: Dict) -> Frame:
+        actions = []
+        for action_dict in frame_dict['actions']:
+            action = Action(**{**action_dict, 'action_type': ActionType[action_dict['action_type']]})
+            if isinstance(action.value, list):
+                # JSON has no tuples, e.g. the position of the cursor
+                action.value = tuple(action.value)
+            actions.append(action)
+        return Frame(frame_dict['timestamp'], actions, frame_dict['capture_filename'])
+
+    def load_planned_slides(self) -> Slides:
+        """Takes the slides, their size and the capture options from the executed render plan"""
+        self.slideshow_width, self.slideshow_height = self.plan['slideshow_size']
+        self.skip_zoom_opt = self.plan['capture']['skip_zoom']
+        frames = {}
+        for frame_dict in self.plan['frames']:
+            frame = self.frame_from_dict(frame_dict)
+            frames[frame.timestamp] = frame
+        only_zooms = {}
+        for frame_dict in self.plan['only_zooms']:
+            frame = self.frame_from_dict(frame_dict)
+            only_zooms[frame.timestamp] = frame
+        partitions = [tuple(partition) for partition in self.plan['partitions']]
+        Log.info(f'Executing the render plan with {len(frames)} frames and {len(self.plan["steps"])} encodings')
+        return self.get_slides(frames, only_zooms, partitions, self.plan['frames_key'])
+
+    def load_planned_webcam_freeze(self) -> bool:
+        return self.plan['webcam_is_empty']
 
-    def extract_audio(
+    def load_planned_media(self) -> Media:
+        """The planned variants of the videos are downloaded, the server is not probed for them again"""
+        return Media(**self.plan['media'])
+
+    def load_planned_metadata(self) -> Metadata:
+        return Metadata(**self.plan['metadata'])
+
+    async def extract_audio(
         self,
         webcams_path: str,
         metadata: Metadata,
     ):
-        Log.info('Start extracting audio...')
         result_path = self.get_output_audio_file_path(metadata)
+        if self.audio_extraction is not None:
+            extracted, _ = await self.get_stream_result(self.audio_extraction, webcams_path)
+            self.audio_extraction = None
+            if extracted:
+                Log.info('Extracting audio finished while downloading')
+                return result_path
+            if os.path.isfile(result_path):
+                # Remove the incomplete result
+                os.unlink(result_path)
+
+        Log.info('Start extracting audio...')
         if os.path.isfile(result_path):
             Log.warning('Final Audio already exists. Abort!')
             return result_path
         with Timer() as t:
-            asyncio.run(self.ffmpeg.extract_audio(webcams_path, result_path))
+            async with self.governor.cpu(1, 'the audio extraction'):
+                await self.ffmpeg.extract_audio(webcams_path, result_path)
         Log.info(f'Extracting audio finished and took: {formatSeconds(t.duration)}')
         return result_path
 
+    async def extract_audio_from_server(
+        self, webcams_rel_path: str, result_path: str, session: aiohttp.ClientSession
+    ) -> bool:
+        """
+        Extracts the audio while the webcams video is streamed from the server into ffmpeg, the video is not stored.
+        Returns False if the stream failed, then the webcams video needs to be downloaded.
+        """
+        Log.info(f'Start extracting audio from a stream of {webcams_rel_path}...')
+        with Timer() as t:
+            with DownloadProgress([webcams_rel_path], self.verbose) as progress:
+                reader = ChunkStreamReader(self.stream_from_bbb(webcams_rel_path, session, self.dl_limiter, progress))
+                try:
+                    async with self.governor.cpu(1, 'the audio extraction'):
+                        await self.ffmpeg.extract_audio(webcams_rel_path, result_path, reader)
+                except Exception as err:
+                    progress.finish(webcams_rel_path, False)
+                    Log.warning(f'Streaming {webcams_rel_path} failed, it is downloaded instead')
+                    if self.verbose:
+                        Log.info(f'Error: {str(err)}')
+                    if os.path.isfile(result_path):
+                        # Remove the incomplete result
+                        os.unlink(result_path)
+                    return False
+                finally:
+                    await reader.aclose()
+                progress.finish(webcams_rel_path, True)
+        Log.info(f'Extracting audio finished and took: {formatSeconds(t.duration)}')
+        return True
+
 
 def get_parser():
     parser = argparse.ArgumentParser(
@@ -1348,7 +2874,7 @@ def get_parser():
         '-v',
         '--verbose',
         action='store_true',
-        help=('Print more verbose debug information'),
+        help=('Print more verbose debug information, e.g. a line for every downloaded file'),
     )
 
     parser.add_argument(
@@ -1460,8 +2986,11 @@ def get_parser():
         '-mpc',
         '--max-parallel-chromes',
         type=int,
-        default=10,
-        help='Maximum number of chrome browser instances used to generate frames',
+        default=None,
+        help=(
+            'Maximum number of chrome browser instances used to generate frames'
+            + ' (default one per available CPU, if the memory is large enough)'
+        ),
     )
 
     parser.add_argument(
@@ -1480,41 +3009,251 @@ def get_parser():
         help='Force height on final output. (e.g. 720) This can reduce the time to generate the final video',
     )
 
+    parser.add_argument(
+        '-ds',
+        '--dl-segments',
+        type=int,
+        default=4,
+        help=(
+            'Number of parallel connections used to download large webcams / deskshare files,'
+            + ' if the server supports range requests (default 4, use 1 to download over a single connection)'
+        ),
+    )
+
+    parser.add_argument(
+        '-uas',
+        '--use-asset-store',
+        action='store_true',
+        help=(
+            'Store downloaded files in a content-addressed store inside the working directory, that is shared by'
+            + ' all recordings. Identical files (e.g. reused slides) are only stored once and linked into the'
+            + ' temporary directories'
+        ),
+    )
+
+    parser.add_argument(
+        '--asset-store-max-size',
+        type=int,
+        default=10240,
+        help=(
+            'Maximum size of the asset store in MiB (default 10240). If the store grows larger,'
+            + ' the least recently used files are removed from it'
+        ),
+    )
+
+    parser.add_argument(
+        '-rv',
+        '--revalidate',
+        action='store_true',
+        help=(
+            'Check with the server (using ETag / Last-Modified) if files that are already present have changed.'
+            + ' Only changed files are downloaded again. Useful to update a --backup'
+        ),
+    )
+
+    parser.add_argument(
+        '-mpd',
+        '--max-parallel-dl',
+        type=int,
+        default=20,
+        help=(
+            'Maximum number of parallel downloads (default 20). Downloads start with 5 parallel connections,'
+            + ' which are increased while the throughput improves and reduced if the server throttles'
+        ),
+    )
+
+    parser.add_argument(
+        '-mdr',
+        '--max-dl-retries',
+        type=int,
+        default=10,
+        help='Maximum number of tries per file download (default 10)',
+    )
+
+    parser.add_argument(
+        '-mbw',
+        '--max-bandwidth',
+        type=str,
+        default=None,
+        help='Limit the bandwidth of all downloads to this rate per second (e.g. 500K, 2M or 1G, default unlimited)',
+    )
+
+    parser.add_argument(
+        '--bandwidth-control-file',
+        type=str,
+        default=None,
+        help=(
+            'Optional path to a file that is checked every few seconds while downloading. Write a new bandwidth'
+            + ' limit (e.g. 2M, or 0 for unlimited) into it to change the limit of a running job'
+        ),
+    )
+
+    parser.add_argument(
+        '-sd',
+        '--source-dir',
+        type=str,
+        default=None,
+        help=(
+            'Optional path to the directory of the published recordings on this machine'
+            + ' (e.g. /var/bigbluebutton/published/presentation). The files of the recording are linked from'
+            + ' <source-dir>/<id> instead of being downloaded. Alternatively, a file:// URL of a recording'
+            + ' directory can be passed as URL'
+        ),
+    )
+
+    parser.add_argument(
+        '-stw',
+        '--stream-webcams',
+        action='store_true',
+        help=(
+            'Read the webcams video while it is downloaded: the freeze detection (or the audio extraction in the'
+            + ' audio only mode) starts with the download instead of after it. The webcams video is then downloaded'
+            + ' over a single connection. Only used for WebM webcams videos, not on Windows'
+        ),
+    )
+
+    parser.add_argument(
+        '-aos',
+        '--audio-only-stream',
+        action='store_true',
+        help=(
+            'Only with --audio-only: The webcams video is streamed from the server into ffmpeg and is not stored.'
+            + ' Only used for WebM webcams videos, other videos and failed streams are downloaded as usual'
+        ),
+    )
+
+    parser.add_argument(
+        '-db',
+        '--disk-budget',
+        type=str,
+        default=None,
+        help=(
+            'Limit the temporary files of all bbb-dl processes that use the same working directory (e.g. 20G).'
+            + ' Intermediate files (frames and videos) are removed as soon as they are no longer needed. Each job'
+            + ' estimates its peak disk usage before downloading and waits until it fits into the budget.'
+            + ' A job that alone exceeds the budget is refused. Not used in the audio only mode'
+        ),
+    )
+
+    parser.add_argument(
+        '-fmc',
+        '--frame-memory-cap',
+        type=str,
+        default=None,
+        help=(
+            'Keep the captured frames in a memory backed directory (a tmpfs) up to this size (e.g. 2G), instead of'
+            + ' writing them to the working directory. Further frames are stored in the working directory.'
+            + ' Useful if the working directory is on a network drive'
+        ),
+    )
+
+    parser.add_argument(
+        '--frame-memory-dir',
+        type=str,
+        default=None,
+        help='Optional memory backed directory for --frame-memory-cap (default /dev/shm)',
+    )
+
+    parser.add_argument(
+        '-cb',
+        '--cpu-budget',
+        type=int,
+        default=None,
+        help=(
+            'Number of CPUs that the chrome browsers and ffmpeg encodings of all bbb-dl processes with the same'
+            + ' working directory may use at the same time (default the available CPUs, following the CPU quota'
+            + ' of a container). A browser uses one CPU, an encoding one CPU per ffmpeg thread'
+        ),
+    )
+
+    parser.add_argument(
+        '--ffmpeg-threads',
+        type=int,
+        default=None,
+        help='Number of threads of each ffmpeg encoding (default the available CPUs divided by two)',
+    )
+
+    parser.add_argument(
+        '-pl',
+        '--plan',
+        type=str,
+        default=None,
+        help=(
+            'Downloads and parses the recording, then writes a render plan as JSON file to this path and stops.'
+            + ' The plan contains the frames with their actions, the slide partitions, the concat lists and the'
+            + ' ffmpeg encodings. It can be rendered later with the --execute option, also on another machine'
+        ),
+    )
+
+    parser.add_argument(
+        '-ex',
+        '--execute',
+        type=str,
+        default=None,
+        help=(
+            'Renders the video of a render plan that was written with the --plan option, without parsing the'
+            + ' recording again. Missing files of the recording are downloaded into the working directory'
+        ),
+    )
+
     return parser
 
 
 # --- called at the program invocation: -------------------------------------
+def get_bbb_dl(args) -> BBBDL:
+    """Creates a BBBDL instance from the parsed command line arguments"""
+    return BBBDL(
+        args.URL,
+        args.filename,
+        args.output_dir,
+        args.verbose,
+        args.skip_cert_verify,
+        args.allow_insecure_ssl,
+        args.use_all_ciphers,
+        args.force_tls_version,
+        args.encoder,
+        args.audiocodec,
+        args.skip_webcam,
+        args.skip_webcam_freeze_detection,
+        args.skip_annotations,
+        args.skip_cursor,
+        args.skip_zoom,
+        args.keep_tmp_files,
+        args.ffmpeg_location,
+        args.working_dir,
+        args.backup,
+        args.max_parallel_chromes,
+        args.force_width,
+        args.force_height,
+        args.preset,
+        args.crf,
+        args.dl_segments,
+        args.use_asset_store,
+        args.asset_store_max_size,
+        args.revalidate,
+        args.max_parallel_dl,
+        args.max_dl_retries,
+        args.max_bandwidth,
+        args.bandwidth_control_file,
+        args.source_dir,
+        args.stream_webcams,
+        args.audio_only_stream,
+        args.disk_budget,
+        args.frame_memory_cap,
+        args.frame_memory_dir,
+        args.cpu_budget,
+        args.ffmpeg_threads,
+        args.plan,
+        args.execute,
+    )
+
+
 def main(args=None):
     just_fix_windows_console()
     args = get_parser().parse_args(args)
 
     with Timer() as final_t:
-        bbb_dl = BBBDL(
-            args.URL,
-            args.filename,
-            args.output_dir,
-            args.verbose,
-            args.skip_cert_verify,
-            args.allow_insecure_ssl,
-            args.use_all_ciphers,
-            args.force_tls_version,
-            args.encoder,
-            args.audiocodec,
-            args.skip_webcam,
-            args.skip_webcam_freeze_detection,
-            args.skip_annotations,
-            args.skip_cursor,
-            args.skip_zoom,
-            args.keep_tmp_files,
-            args.ffmpeg_location,
-            args.working_dir,
-            args.backup,
-            args.max_parallel_chromes,
-            args.force_width,
-            args.force_height,
-            args.preset,
-            args.crf,
-        )
+        bbb_dl = get_bbb_dl(args)
         if args.audio_only:
             bbb_dl.run_audio_only()
         else:
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Set
+
+from bbb_dl.locks import FileLock
+from bbb_dl.utils import Log
+
+
+def hash_file(file_path: str, length: int = None):
+    """
+    Hashes the first `length` bytes (or the whole file) of `file_path`
+    @return: The sha256 hash object, so that it can be updated with further data
+    """
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(file_path, 'rb') as file_obj:
+        while remaining is None or remaining > 0:
+            read_size = 1024 * 1024 if remaining is None else min(1024 * 1024, remaining)
+            chunk = file_obj.read(read_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+
+class DownloadManifest:
+    """
+    Keeps track of the downloads of one recording in a JSON file.
+    For each rel_file_path it stores the size announced by the server (content_length), a validator
+    (ETag or Last-Modified) that is used with If-Range, the number of received bytes, the sha256 of
+    the finished file and if the download is complete.
+    Several processes can share the manifest: on save only the entries that this process changed are
+    written into the current manifest file, while the lock file is held.
+    Saves of the progress are batched, at most one every `save_interval` seconds.
+    """
+
+    save_interval = 2
+
+    def __init__(self, manifest_path: str, lock_path: str):
+        self.manifest_path = manifest_path
+        self.lock_path = lock_path
+        self.entries = self.load()
+        # Entries that were changed or removed since the last save
+        self.changed = set()
+        self.removed = set()
+        self.last_save = 0
+        self.save_lock = None
+
+    def load(self) -> Dict[str, Dict]:
+        if not os.path.isfile(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as manifest_file:
+                entries = json.load(manifest_file)
+            if isinstance(entries, dict):
+                return entries
+        except (OSError, ValueError) as err:
+            Log.warning(f'Unable to load download manifest "{self.manifest_path}": {str(err)}')
+        return {}
+
+    def write(self, changed: Dict[str, Dict], removed: Set[str]) -> Dict[str, Dict]:
+        """
+        Merges the changed and removed entries into the current manifest file
+        @return: The merged entries, None if the manifest could not be written
+        """
+        tmp_path = self.manifest_path + '.tmp'
+        try:
+            with FileLock(self.lock_path):
+                entries = self.load()
+                for rel_file_path in removed:
+                    entries.pop(rel_file_path, None)
+                entries.update(changed)
+                with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+                    json.dump(entries, manifest_file, indent=1)
+                os.replace(tmp_path, self.manifest_path)
+            return entries
+        except OSError as err:
+            Log.warning(f'Unable to save download manifest "{self.manifest_path}": {str(err)}')
+            return None
+
+    def save(self):
+        entries = self.write(
+            {rel_file_path: self.entries[rel_file_path] for rel_file_path in self.changed}, self.removed
+        )
+        if entries is not None:
+            self.entries = entries
+            self.changed.clear()
+            self.removed.clear()
+
+    async def save_async(self, force: bool = True):
+        """
+        Saves the manifest in a worker thread, so that the downloads go on while another process holds the lock.
+        Without force the changes are only saved if the last save is `save_interval` seconds ago, the next
+        save writes them as well.
+        """
+        if not force and time.monotonic() - self.last_save < self.save_interval:
+            return
+        if self.save_lock is None:
+            self.save_lock = asyncio.Lock()
+        async with self.save_lock:
+            if len(self.changed) == 0 and len(self.removed) == 0:
+                return
+            changed = {rel_file_path: dict(self.entries[rel_file_path]) for rel_file_path in self.changed}
+            removed = set(self.removed)
+            self.changed.clear()
+            self.removed.clear()
+            self.last_save = time.monotonic()
+            entries = await asyncio.get_running_loop().run_in_executor(None, self.write, changed, removed)
+            if entries is None:
+                # Saved again with the next save, unless the entries were changed in the meantime
+                self.changed.update(rel_file_path for rel_file_path in changed if rel_file_path not in self.removed)
+                self.removed.update(rel_file_path for rel_file_path in removed if rel_file_path not in self.changed)
+                return
+            # Entries that were changed while the manifest was written stay as they are
+            for rel_file_path in self.removed:
+                entries.pop(rel_file_path, None)
+            for rel_file_path in self.changed:
+                entries[rel_file_path] = self.entries[rel_file_path]
+            self.entries = entries
+
+    def refresh(self, rel_file_path: str):
+        """Loads the entry again, e.g. after another process downloaded the file"""
+        if rel_file_path in self.changed or rel_file_path in self.removed:
+            return
+        with FileLock(self.lock_path):
+            entry = self.load().get(rel_file_path)
+        if entry is not None:
+            self.entries[rel_file_path] = entry
+        else:
+            self.entries.pop(rel_file_path, None)
+
+    def get(self, rel_file_path: str) -> Dict:
+        return self.entries.get(rel_file_path)
+
+    def update(self, rel_file_path: str, **values) -> Dict:
+        entry = self.entries.setdefault(rel_file_path, {})
+        entry.update(values)
+        self.changed.add(rel_file_path)
+        self.removed.discard(rel_file_path)
+        return entry
+
+    def remove(self, rel_file_path: str):
+        self.entries.pop(rel_file_path, None)
+        self.changed.discard(rel_file_path)
+        self.removed.add(rel_file_path)
+
+    def is_complete(self, rel_file_path: str, local_path: str) -> bool:
+        """
+        Checks if an existing file is a finished download.
+        Files without manifest entry (e.g. from older backups) can not be checked and are assumed to be complete.
+        """
+        entry = self.get(rel_file_path)
+        if entry is None:
+            return True
+        if not entry.get('complete', False):
+            return False
+        content_length = entry.get('content_length')
+        if content_length is not None and os.path.getsize(local_path) != content_length:
+            return False
+        return True
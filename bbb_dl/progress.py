@@ -0,0 +1,138 @@
+import asyncio
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from itertools import cycle
+from typing import Dict, List
+
+from bbb_dl.utils import Log, format_bytes, formatSeconds
+
+
+@dataclass
+class FileProgress:
+    total: int = None
+    received: int = 0
+    # Rate of the last refresh interval in bytes per second
+    rate: float = 0.0
+    last_received: int = 0
+    active: bool = False
+
+
+class DownloadProgress:
+    """
+    Collects the progress of all downloads of a batch and displays it as one aggregated status line
+    with the number of finished files, the received bytes, the rate of the active files and an ETA.
+    On a terminal the line is refreshed in place every second. If the output is not a terminal
+    (e.g. the log of a batch run) or per-file lines are logged (--verbose), a new line is printed every 10 seconds.
+    """
+
+    def __init__(self, rel_file_paths: List[str], verbose: bool):
+        self.verbose = verbose
+        self.in_place = sys.stdout.isatty() and not verbose
+        self.interval = 1.0 if self.in_place else 10.0
+        self.spinner = cycle('/|\\-')
+
+        self.files: Dict[str, FileProgress] = {rel_file_path: FileProgress() for rel_file_path in rel_file_paths}
+        self.done = 0
+        self.failed = 0
+        # Bytes received in this run, without the resumed parts of files
+        self.received_bytes = 0
+        self.start_time = time.monotonic()
+        self.last_refresh = self.start_time
+        self.display_task = None
+
+    def start(self, rel_file_path: str, total: int, received: int = 0):
+        """Called if the download of a file (re)starts at `received` bytes"""
+        file_progress = self.files.setdefault(rel_file_path, FileProgress())
+        file_progress.total = total
+        file_progress.received = received
+        file_progress.last_received = received
+        file_progress.active = True
+
+    def add_bytes(self, rel_file_path: str, num_bytes: int):
+        self.files[rel_file_path].received += num_bytes
+        self.received_bytes += num_bytes
+
+    def finish(self, rel_file_path: str, success: bool):
+        file_progress = self.files[rel_file_path]
+        file_progress.active = False
+        file_progress.rate = 0.0
+        if success:
+            self.done += 1
+        else:
+            self.failed += 1
+
+    def update_rates(self):
+        now = time.monotonic()
+        duration = max(now - self.last_refresh, 0.001)
+        self.last_refresh = now
+        for file_progress in self.files.values():
+            if file_progress.active:
+                file_progress.rate = (file_progress.received - file_progress.last_received) / duration
+                file_progress.last_received = file_progress.received
+
+    def get_status_line(self) -> str:
+        received = sum(file_progress.received for file_progress in self.files.values())
+        total = sum(file_progress.total or 0 for file_progress in self.files.values())
+        remaining = sum(
+            max(0, file_progress.total - file_progress.received)
+            for file_progress in self.files.values()
+            if file_progress.total is not None
+        )
+        rate = sum(file_progress.rate for file_progress in self.files.values())
+        status = (
+            f'Downloaded: {self.done:03} / {len(self.files):03} Files'
+            + f' | {format_bytes(received)}'
+            + (f' / {format_bytes(total)}' if total > received else '')
+            + f' | {format_bytes(rate)}/s'
+        )
+        if rate > 0 and remaining > 0:
+            status += f' | ETA: {formatSeconds(remaining / rate)}'
+        if self.failed > 0:
+            status += f' | Failed: {self.failed}'
+
+        active_files = sorted(
+            (
+                (rel_file_path, file_progress)
+                for rel_file_path, file_progress in self.files.items()
+                if file_progress.active and file_progress.rate > 0
+            ),
+            key=lambda item: item[1].rate,
+            reverse=True,
+        )
+        if len(active_files) > 0:
+            status += ' | ' + ', '.join(
+                f'{rel_file_path.split("/")[-1]}: {format_bytes(file_progress.rate)}/s'
+                for rel_file_path, file_progress in active_files[:3]
+            )
+            if len(active_files) > 3:
+                status += f' (+{len(active_files) - 3})'
+        return status
+
+    def print_status(self):
+        self.update_rates()
+        if self.in_place:
+            max_width = shutil.get_terminal_size().columns - 2
+            print(f'\r\033[K{self.get_status_line()[:max_width]} {next(self.spinner)}', end='', flush=True)
+        else:
+            Log.info(self.get_status_line())
+
+    async def display_status(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.print_status()
+
+    def __enter__(self):
+        self.display_task = asyncio.create_task(self.display_status())
+        return self
+
+    def __exit__(self, *args):
+        self.display_task.cancel()
+        if self.in_place:
+            print('\r\033[K', end='')
+        if self.received_bytes > 0 or self.failed > 0:
+            Log.info(
+                f'Finished {self.done} of {len(self.files)} downloads, received {format_bytes(self.received_bytes)}'
+                + f' and took: {formatSeconds(time.monotonic() - self.start_time)}'
+            )
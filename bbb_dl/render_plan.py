@@ -0,0 +1,55 @@
+import json
+import os
+from typing import Callable, Dict, List
+
+from bbb_dl.utils import Log
+from bbb_dl.version import __version__
+
+# Increased if a render plan of an older version can not be executed anymore
+PLAN_VERSION = 2
+
+# Directives of a concat list entry, in the order in which ffmpeg expects them after the file
+CONCAT_DIRECTIVES = ['inpoint', 'outpoint', 'duration']
+
+
+def write_render_plan(plan_path: str, plan: Dict):
+    """Writes the plan to a temporary file first, so that an executor never reads a half written plan"""
+    plan = {'version': PLAN_VERSION, 'bbb_dl_version': __version__, **plan}
+    tmp_path = plan_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as plan_file:
+        json.dump(plan, plan_file, indent=2)
+    os.replace(tmp_path, plan_path)
+
+
+def load_render_plan(plan_path: str) -> Dict:
+    try:
+        with open(plan_path, 'r', encoding='utf-8') as plan_file:
+            plan = json.load(plan_file)
+    except (OSError, ValueError) as err:
+        Log.error(f'Error: Unable to read the render plan "{plan_path}": {str(err)}')
+        exit(-18)
+    if not isinstance(plan, dict) or plan.get('version') != PLAN_VERSION:
+        Log.error(
+            f'Error: The render plan "{plan_path}" was written by an incompatible version of bbb-dl'
+            + f' ({plan.get("bbb_dl_version") if isinstance(plan, dict) else "unknown"}). Please plan it again'
+        )
+        exit(-18)
+    return plan
+
+
+def write_concat_file(concat_path: str, entries: List[Dict], resolve_file: Callable[[str], str] = None):
+    """
+    Writes a concat list of a render plan as input file of the ffmpeg concat demuxer.
+    The files of the entries are relative to the concat file, resolve_file may replace them e.g. by absolute paths
+    """
+    with open(concat_path, 'w', encoding='utf-8') as concat_file:
+        for entry in entries:
+            file_path = entry['file']
+            if resolve_file is not None:
+                file_path = resolve_file(file_path)
+            # A quote in the path needs to be escaped
+            file_path = file_path.replace("'", "'\\''")
+            concat_file.write(f"file '{file_path}'\n")
+            for directive in CONCAT_DIRECTIVES:
+                if directive in entry:
+                    concat_file.write(f"{directive} {entry[directive]}\n")
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from bbb_dl.governor import ResourceGovernor
+from bbb_dl.locks import FileLock
+from bbb_dl.utils import Log, formatSeconds
+
+
+@dataclass
+class Stage:
+    name: str
+    # Called with the results of the `inputs` stages as keyword arguments, may be a coroutine function
+    func: Callable
+    inputs: List[str] = field(default_factory=list)
+    # Stages that need to be finished before, without passing their result
+    after: List[str] = field(default_factory=list)
+    # Resource class (e.g. network, browser or encoder) that limits how many of its stages run at the same time
+    resource: str = None
+    # Number of CPU slots of the governor that the stage needs while it runs
+    cpu: int = None
+    # Lock that is shared with other processes, which work on the same output
+    lock: FileLock = None
+    # Called with the result after all stages that depend on the stage finished, e.g. to remove intermediate files
+    cleanup: Callable = None
+
+    result: Any = None
+    finished: bool = False
+    # Number of stages that depend on the stage and are not finished
+    pending_consumers: int = 0
+    ready_time: float = None
+    start_time: float = None
+    end_time: float = None
+
+    @property
+    def deps(self) -> List[str]:
+        return self.inputs + self.after
+
+
+class StageScheduler:
+    """
+    Runs every stage as soon as the stages it depends on are finished, so that independent stages run concurrently.
+    Stages of a resource class share a limited number of slots, e.g. only one stage uses the browsers at a time.
+    Stages that need CPUs also wait for free slots in the CPU budget of the governor.
+    The result of a stage is stored under its name. After a run, the critical path is the chain of stages
+    that determined the total duration.
+    The cleanup of a stage runs as soon as its result is no longer needed, also if a later stage passed the result
+    on as its own result (e.g. the same path).
+    """
+
+    def __init__(self, resource_limits: Dict[str, int], verbose: bool, governor: ResourceGovernor = None):
+        self.resources = {resource: asyncio.Semaphore(limit) for resource, limit in resource_limits.items()}
+        self.verbose = verbose
+        self.governor = governor
+        self.stages: Dict[str, Stage] = {}
+        self.start_time = None
+
+    def add(
+        self,
+        name: str,
+        func: Callable,
+        inputs: List[str] = None,
+        after: List[str] = None,
+        resource: str = None,
+        cpu: int = None,
+        lock: FileLock = None,
+        cleanup: Callable = None,
+    ):
+        """Dependencies have to be added before, so the stages can not form a cycle"""
+        stage = Stage(name, func, inputs or [], after or [], resource, cpu, lock, cleanup)
+        for dep in stage.deps:
+            if dep not in self.stages:
+                raise ValueError(f'Stage {name} depends on the unknown stage {dep}')
+        if resource is not None and resource not in self.resources:
+            raise ValueError(f'Stage {name} uses the unknown resource {resource}')
+        for dep in stage.deps:
+            self.stages[dep].pending_consumers += 1
+        self.stages[name] = stage
+
+    async def run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task]) -> Any:
+        for dep in stage.deps:
+            await tasks[dep]
+        kwargs = {name: tasks[name].result() for name in stage.inputs}
+        stage.ready_time = time.monotonic()
+
+        if stage.lock is not None:
+            # Another process may produce the output of the stage, the stage reuses it after waiting
+            await stage.lock.acquire_async()
+        try:
+            async with AsyncExitStack() as stack:
+                if stage.resource is not None:
+                    await stack.enter_async_context(self.resources[stage.resource])
+                if stage.cpu is not None and self.governor is not None:
+                    # The CPU budget is shared with other processes
+                    await stack.enter_async_context(self.governor.cpu(stage.cpu, stage.name))
+                return await self.execute_stage(stage, kwargs)
+        finally:
+            if stage.lock is not None:
+                stage.lock.release()
+
+    async def execute_stage(self, stage: Stage, kwargs: Dict[str, Any]) -> Any:
+        stage.start_time = time.monotonic()
+        if self.verbose:
+            Log.debug(f'Starting stage {stage.name}')
+        result = stage.func(**kwargs)
+        if asyncio.iscoroutine(result):
+            result = await result
+        stage.end_time = time.monotonic()
+
+        stage.result = result
+        stage.finished = True
+        for dep in stage.deps:
+            self.stages[dep].pending_consumers -= 1
+        self.run_cleanups()
+        return result
+
+    def is_needed(self, stage: Stage) -> bool:
+        if not stage.finished or stage.pending_consumers > 0:
+            return True
+        # Another stage may have passed the result on
+        return stage.result is not None and any(
+            other.finished and other.pending_consumers > 0 and other.result == stage.result
+            for other in self.stages.values()
+        )
+
+    def run_cleanups(self):
+        for stage in self.stages.values():
+            if stage.cleanup is not None and not self.is_needed(stage):
+                cleanup = stage.cleanup
+                stage.cleanup = None
+                cleanup(stage.result)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs all stages, if one fails the others are cancelled
+        @return: The results of all stages by name
+        """
+        self.start_time = time.monotonic()
+        tasks = {}
+        # The stages are added after their dependencies, so every task can refer to the tasks of its dependencies
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.create_task(self.run_stage(stage, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return {name: task.result() for name, task in tasks.items()}
+
+    def get_critical_path(self) -> List[Stage]:
+        """Follows the last finished stage back over the dependency that finished last"""
+        stage = max(self.stages.values(), key=lambda stage: stage.end_time)
+        path = [stage]
+        while len(stage.deps) > 0:
+            stage = max((self.stages[dep] for dep in stage.deps), key=lambda stage: stage.end_time)
+            path.append(stage)
+        return list(reversed(path))
+
+    def print_summary(self):
+        if self.verbose:
+            for stage in sorted(self.stages.values(), key=lambda stage: stage.start_time):
+                Log.info(
+                    f'Stage {stage.name}: started after {formatSeconds(stage.start_time - self.start_time, msec=True)}'
+                    + f' and took {formatSeconds(stage.end_time - stage.start_time, msec=True)}'
+                    + (f' ({stage.resource})' if stage.resource is not None else '')
+                )
+
+        path = self.get_critical_path()
+        Log.info(
+            f'Critical path ({formatSeconds(path[-1].end_time - self.start_time, msec=True)}): '
+            + ' -> '.join(
+                f'{stage.name} {formatSeconds(stage.end_time - stage.start_time, msec=True)}' for stage in path
+            )
+        )
+        waiting = [stage for stage in path if stage.start_time - stage.ready_time >= 1]
+        if len(waiting) > 0:
+            Log.info(
+                'Stages on the critical path that waited for their resource or another process: '
+                + ', '.join(
+                    f'{stage.name} {formatSeconds(stage.start_time - stage.ready_time, msec=True)}' for stage in waiting
+                )
+            )
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+from bbb_dl.store import reflink_or_copy
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+
+
+class LocalDirectorySource:
+    """
+    Reads the files of a recording directly from a published recording directory on the same machine or
+    storage cluster (e.g. /var/bigbluebutton/published/presentation/<id>), instead of downloading them over HTTP.
+    The files are hardlinked into the temporary directory, so they are used in place without being copied.
+    If the directory is on another file system, the files are symlinked, for backups they are reflinked or copied,
+    so that a backup does not depend on the source directory.
+    """
+
+    def __init__(self, source_dir: str, backup: bool, verbose: bool):
+        self.source_dir = PT.get_abs_path(source_dir)
+        self.backup = backup
+        self.verbose = verbose
+
+    def get_source_path(self, rel_file_path: str) -> str:
+        source_path = PT.get_abs_path(PT.get_in_dir(self.source_dir, rel_file_path))
+        # Paths from the recording files (e.g. slide images in shapes.svg) must not leave the recording directory
+        if os.path.commonpath([self.source_dir, source_path]) != self.source_dir:
+            raise ValueError(f'{rel_file_path} is not inside of {self.source_dir}')
+        return source_path
+
+    def has_file(self, rel_file_path: str) -> bool:
+        try:
+            return os.path.isfile(self.get_source_path(rel_file_path))
+        except ValueError:
+            return False
+
+    async def fetch(self, rel_file_path: str, local_path: str) -> bool:
+        """
+        Makes the file of the recording available at local_path
+        Returns True if the file exists in the source directory
+        """
+        try:
+            source_path = self.get_source_path(rel_file_path)
+            if not os.path.isfile(source_path):
+                Log.info(f'{rel_file_path} does not exist in {self.source_dir}')
+                return False
+
+            if os.path.lexists(local_path):
+                if os.path.exists(local_path) and os.path.samefile(source_path, local_path):
+                    if self.verbose:
+                        Log.info(f'{rel_file_path} is already linked')
+                    return True
+                os.unlink(local_path)
+
+            PT.make_base_dir(local_path)
+            try:
+                os.link(source_path, local_path)
+            except OSError:
+                try:
+                    if self.backup:
+                        raise
+                    os.symlink(source_path, local_path)
+                except OSError:
+                    # Symlinks need extra privileges on Windows, a copy may take a while
+                    await asyncio.get_running_loop().run_in_executor(None, reflink_or_copy, source_path, local_path)
+        except (OSError, ValueError) as err:
+            Log.error(f'Unable to read {rel_file_path} from {self.source_dir}: {str(err)}')
+            return False
+
+        if self.verbose:
+            Log.success(f'Linked {rel_file_path} from: {source_path}')
+        return True
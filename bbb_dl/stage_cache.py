@@ -0,0 +1,129 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+from typing import List
+
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+
+
+class StageCache:
+    """
+    Stores the intermediate files of the rendering stages under a key, that is derived from the hashes of their
+    inputs and from the options that change their output (e.g. --crf or --skip-cursor).
+    A stage is only rendered again if its key changed, so a re-run with other options reuses the stages
+    whose inputs did not change. Only the newest output of each stage is kept, the outputs of other keys are
+    pruned at the end of a run, when no other process may read them anymore.
+    """
+
+    def __init__(self, cache_dir: str, verbose: bool):
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+        PT.make_dirs(cache_dir)
+        # The outputs of this run by stage
+        self.current = {}
+
+    @staticmethod
+    def get_key(*parts) -> str:
+        """Parts need to be JSON serializable, e.g. hashes, keys of other stages and option values"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def get_path(self, stage: str, key: str, extension: str = '.mp4') -> str:
+        return PT.get_in_dir(self.cache_dir, f'{stage}-{key}{extension}')
+
+    @staticmethod
+    def get_part_path(path: str) -> str:
+        # The extension stays the last one, ffmpeg chooses the output format by it
+        base, extension = os.path.splitext(path)
+        return f'{base}.part{extension}'
+
+    def lookup(self, path: str) -> bool:
+        if os.path.isfile(path):
+            return True
+        part_path = self.get_part_path(path)
+        if os.path.isfile(part_path):
+            # Leftover of an interrupted rendering, ffmpeg would ask before overwriting it
+            os.unlink(part_path)
+        return False
+
+    def store(self, stage: str, path: str):
+        """Moves the rendered part file to its path"""
+        os.replace(self.get_part_path(path), path)
+        self.keep(stage, path)
+
+    def keep(self, stage: str, path: str):
+        """Marks `path` as the output of the stage in this run, it is kept when the stage is pruned"""
+        self.current[stage] = path
+
+    def prune_outdated(self):
+        """Removes the outputs of the stages of this run with other keys"""
+        for stage, path in self.current.items():
+            self.prune(stage, path)
+
+    def prune(self, stage: str, path: str):
+        """Removes the outputs of the stage with other keys than the one of `path`"""
+        # Files next to the output with the same name, like concat files, belong to it
+        name = os.path.splitext(os.path.basename(path))[0]
+        for other_path in glob.glob(PT.get_in_dir(self.cache_dir, glob.escape(stage) + '-*')):
+            if not os.path.basename(other_path).startswith(name):
+                if self.verbose:
+                    Log.info(f'Removing outdated {os.path.basename(other_path)}')
+                self.remove_path(other_path)
+
+    def remove(self, path: str):
+        """Removes an output and the files that belong to it"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        for other_path in glob.glob(PT.get_in_dir(self.cache_dir, glob.escape(name) + '*')):
+            self.remove_path(other_path)
+
+    @staticmethod
+    def remove_path(path: str):
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+class FileHashCache:
+    """
+    Hashes of the input files that have no verified hash in the download manifest (e.g. files linked from
+    a --source-dir or files of older backups), so that they are only hashed again if their size or their
+    modification time changed
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.entries = {}
+        if os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                    self.entries = json.load(cache_file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def get_stamp(path: str) -> List[int]:
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, name: str, path: str) -> str:
+        entry = self.entries.get(name)
+        if entry is not None and entry.get('stamp') == self.get_stamp(path):
+            return entry.get('sha256')
+        return None
+
+    def set(self, name: str, path: str, sha256: str):
+        self.entries[name] = {'stamp': self.get_stamp(path), 'sha256': sha256}
+        # Other processes may write the cache at the same time, a lost entry is only hashed again
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as err:
+            Log.warning(f'Unable to save the file hashes "{self.cache_path}": {str(err)}')
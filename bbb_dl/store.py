@@ -0,0 +1,122 @@
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from bbb_dl.utils import Log
+from bbb_dl.utils import PathTools as PT
+
+# ioctl request to clone a file on copy-on-write file systems (btrfs, xfs), see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+
+def reflink_or_copy(src_path: str, dst_path: str):
+    """Clones src_path to dst_path on copy-on-write file systems, otherwise the file is copied"""
+    if fcntl is not None:
+        try:
+            with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src_path, dst_path)
+
+
+def link_file(src_path: str, dst_path: str):
+    """Hardlinks src_path to dst_path, falls back to a reflink or a copy if hardlinks are not supported"""
+    try:
+        os.link(src_path, dst_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        reflink_or_copy(src_path, dst_path)
+
+
+class AssetStore:
+    """
+    A content-addressed store for downloaded files that is shared by all recordings in the working directory.
+    Files are stored under their sha256 hash and the files in the temporary directories of the recordings are
+    hardlinks (or reflinks) to them, so identical slides of different recordings only need disk space once.
+    If the store grows larger than `max_size` bytes, the least recently used objects are removed from the store.
+    """
+
+    def __init__(self, store_dir: str, max_size: int, verbose: bool):
+        self.store_dir = store_dir
+        self.max_size = max_size
+        self.verbose = verbose
+        self.total_size = None
+
+    def get_object_path(self, sha256: str) -> str:
+        return PT.make_path(self.store_dir, sha256[:2], sha256)
+
+    def get_total_size(self) -> int:
+        if self.total_size is None:
+            self.total_size = sum(size for _, size, _ in self.list_objects())
+        return self.total_size
+
+    def list_objects(self):
+        """Yields (object_path, size, last_used) for all objects in the store"""
+        if not os.path.isdir(self.store_dir):
+            return
+        for prefix_entry in os.scandir(self.store_dir):
+            if not prefix_entry.is_dir():
+                continue
+            for object_entry in os.scandir(prefix_entry.path):
+                if object_entry.is_file():
+                    stat = object_entry.stat()
+                    yield object_entry.path, stat.st_size, stat.st_mtime
+
+    def add(self, local_path: str, sha256: str):
+        """
+        Adds a downloaded file to the store. If the store already contains a file with the same content,
+        local_path is replaced by a link to the stored object.
+        """
+        object_path = self.get_object_path(sha256)
+        try:
+            PT.make_base_dir(object_path)
+            if not os.path.isfile(object_path):
+                try:
+                    link_file(local_path, object_path)
+                    self.total_size = self.get_total_size() + os.path.getsize(object_path)
+                except FileExistsError:
+                    # Another process added the same content in the meantime
+                    pass
+
+            if not os.path.samefile(local_path, object_path):
+                if os.path.getsize(local_path) != os.path.getsize(object_path):
+                    Log.warning(f'Asset store object {object_path} does not match {local_path}, it is ignored')
+                    return
+                tmp_path = local_path + '.link'
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                link_file(object_path, tmp_path)
+                os.replace(tmp_path, local_path)
+                if self.verbose:
+                    Log.debug(f'Reused {local_path} from the asset store')
+
+            # Mark the object as recently used
+            os.utime(object_path)
+        except OSError as err:
+            Log.warning(f'Unable to add {local_path} to the asset store: {str(err)}')
+            return
+
+        if self.get_total_size() > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used objects until the store is smaller than max_size"""
+        objects = sorted(self.list_objects(), key=lambda item: item[2])
+        self.total_size = sum(size for _, size, _ in objects)
+        for object_path, size, _ in objects:
+            if self.total_size <= self.max_size:
+                break
+            try:
+                os.unlink(object_path)
+                self.total_size -= size
+                if self.verbose:
+                    Log.debug(f'Evicted {object_path} from the asset store')
+            except OSError as err:
+                Log.warning(f'Unable to evict {object_path} from the asset store: {str(err)}')
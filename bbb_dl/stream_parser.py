@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from typing import List
+from xml.etree import ElementTree as ET
+
+from bbb_dl.utils import _s, _x
+
+SVG_IMAGE_TAG = _s('svg:image')
+SVG_GROUP_TAG = _s('svg:g')
+XLINK_HREF = _x('xlink:href')
+
+
+@dataclass
+class SlideImage:
+    """An <image class="slide"> of shapes.svg, the attributes are kept as they are in the file"""
+
+    element_id: str
+    image_in: str
+    image_out: str
+    width: str
+    height: str
+    href: str
+
+
+@dataclass
+class Drawing:
+    """A <g timestamp="..."> of shapes.svg, e.g. a pencil path or a text of an annotation"""
+
+    element_id: str
+    shape: str
+    timestamp: str
+    undo: str
+
+
+@dataclass
+class ParsedShapes:
+    slides: List[SlideImage] = field(default_factory=list)
+    drawings: List[Drawing] = field(default_factory=list)
+    # All images of shapes.svg in document order, each one only once
+    image_urls: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TimedEvent:
+    """An <event timestamp="..."> of cursor.xml or panzooms.xml with the text of its value element"""
+
+    timestamp: str
+    value: str
+
+
+def parse_shapes(shapes_path: str) -> ParsedShapes:
+    """
+    Collects the slides, the drawings and the images of shapes.svg in a single pass. Each element is dropped
+    as soon as it ended, so that the memory does not grow with e.g. the long paths of heavily annotated slides.
+    """
+    parsed_shapes = ParsedShapes()
+    known_urls = set()
+    parents = []
+    for event, elem in ET.iterparse(shapes_path, events=('start', 'end')):
+        if event == 'end':
+            parents.pop()
+            elem.clear()
+            if len(parents) > 0:
+                parents[-1].remove(elem)
+            continue
+
+        # The attributes are known at the start of an element, its children are not needed
+        if elem.tag == SVG_IMAGE_TAG:
+            href = elem.get(XLINK_HREF)
+            if href not in known_urls:
+                known_urls.add(href)
+                parsed_shapes.image_urls.append(href)
+            # Only the slides that are direct children of the root
+            if len(parents) == 1 and elem.get('class') == 'slide':
+                parsed_shapes.slides.append(
+                    SlideImage(
+                        elem.get('id'), elem.get('in'), elem.get('out'), elem.get('width'), elem.get('height'), href
+                    )
+                )
+        elif elem.tag == SVG_GROUP_TAG and elem.get('timestamp') is not None:
+            parsed_shapes.drawings.append(
+                Drawing(elem.get('id'), elem.get('shape'), elem.get('timestamp'), elem.get('undo'))
+            )
+        parents.append(elem)
+    return parsed_shapes
+
+
+def parse_timed_events(events_path: str, value_tag: str) -> List[TimedEvent]:
+    """Collects the events with a timestamp that are direct children of the root in a single pass"""
+    events = []
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(events_path, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            # The event ended, so its value element is complete
+            timestamp = elem.get('timestamp')
+            if elem.tag == 'event' and timestamp is not None:
+                events.append(TimedEvent(timestamp, elem.find(value_tag).text))
+            elem.clear()
+            root.remove(elem)
+    return events
@@ -0,0 +1,169 @@
+import asyncio
+import os
+from typing import AsyncIterator, List, Tuple
+
+
+class StreamBrokenError(Exception):
+    """The streamed file could not be downloaded or was restarted, the data read so far is not valid"""
+
+
+class DownloadStream:
+    """
+    Tracks which bytes of a file are already written to disk while it is downloaded, so that consumers can read
+    the file while it is still growing. Segmented downloads write their segments out of order, consumers can only
+    read the contiguous part from the start of the file.
+    """
+
+    def __init__(self, rel_file_path: str, local_path: str):
+        self.rel_file_path = rel_file_path
+        self.local_path = local_path
+        self.part_path = None
+
+        # Bytes from the start of the file that are written
+        self.contiguous = 0
+        # Written ranges (start, end) behind the first gap
+        self.ranges: List[Tuple[int, int]] = []
+        self.finished = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def begin(self, part_path: str, written_ranges: List[Tuple[int, int]]):
+        """Called if the download (re)starts writing into part_path, with the ranges that are already written"""
+        previous = self.contiguous
+        self.part_path = part_path
+        self.contiguous = 0
+        self.ranges = []
+        for start, end in written_ranges:
+            self.add_written(start, end - start)
+        if self.contiguous < previous:
+            # Consumers may have read data that is no longer part of the file
+            self.fail(StreamBrokenError(f'The download of {self.rel_file_path} was restarted'))
+        self.notify()
+
+    def add_written(self, offset: int, length: int):
+        """Called after a block of `length` bytes was written at `offset`"""
+        self.ranges.append((offset, offset + length))
+        self.ranges.sort()
+        while len(self.ranges) > 0 and self.ranges[0][0] <= self.contiguous:
+            self.contiguous = max(self.contiguous, self.ranges.pop(0)[1])
+        self.notify()
+
+    def finish(self):
+        """Called if the file is complete at local_path"""
+        self.finished = True
+        self.notify()
+
+    def fail(self, error: Exception):
+        if self.error is None:
+            self.error = error
+        self.notify()
+
+
+class BufferedStreamReader(asyncio.StreamReader):
+    """
+    Base of the readers for consumers that read an asyncio.StreamReader (e.g. the stdin of ffmpeg).
+    Subclasses implement fill_buffer(), that sets the next block of data as buffer or sets eof.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = b''
+        self.buffer_pos = 0
+        self.eof = False
+
+    def at_eof(self) -> bool:
+        return self.eof
+
+    async def fill_buffer(self):
+        raise NotImplementedError
+
+    async def read(self, n: int = -1) -> bytes:
+        if self.buffer_pos >= len(self.buffer) and not self.eof:
+            await self.fill_buffer()
+        end = len(self.buffer) if n < 0 else min(len(self.buffer), self.buffer_pos + n)
+        data = self.buffer[self.buffer_pos : end]
+        self.buffer_pos = end
+        return data
+
+
+class GrowingFileReader(BufferedStreamReader):
+    """
+    Reads a file while it is downloaded.
+    read() returns the data that is already written and waits for more, until the download of the file finished.
+    The data is read from disk, so a slow consumer does not hold back the download and does not fill the memory.
+    """
+
+    def __init__(self, stream: DownloadStream, block_size: int = 1024 * 1024):
+        super().__init__()
+        self.stream = stream
+        self.block_size = block_size
+        self.file_obj = None
+        # Offset behind the last block that was read from the file
+        self.position = 0
+
+    def close(self):
+        if self.file_obj is not None:
+            self.file_obj.close()
+            self.file_obj = None
+
+    def get_available(self) -> int:
+        if self.stream.finished:
+            return os.fstat(self.file_obj.fileno()).st_size
+        return self.stream.contiguous
+
+    def read_block(self, size: int) -> bytes:
+        if hasattr(os, 'pread'):
+            return os.pread(self.file_obj.fileno(), size, self.position)
+        self.file_obj.seek(self.position)
+        return self.file_obj.read(size)
+
+    async def fill_buffer(self):
+        while True:
+            if self.stream.error is not None:
+                raise self.stream.error
+            changed = self.stream.changed
+            if self.file_obj is None and (self.stream.finished or self.stream.part_path is not None):
+                # A finished .part file is already renamed, an open .part file stays readable after the rename
+                self.file_obj = open(self.stream.local_path if self.stream.finished else self.stream.part_path, 'rb')
+            if self.file_obj is not None:
+                available = self.get_available()
+                if self.position < available:
+                    size = min(self.block_size, available - self.position)
+                    self.buffer = await asyncio.get_running_loop().run_in_executor(None, self.read_block, size)
+                    self.buffer_pos = 0
+                    if len(self.buffer) == 0:
+                        raise StreamBrokenError(f'{self.stream.rel_file_path} is shorter than expected')
+                    self.position += len(self.buffer)
+                    return
+                if self.stream.finished:
+                    self.eof = True
+                    return
+            await changed.wait()
+
+
+class ChunkStreamReader(BufferedStreamReader):
+    """
+    Reads the chunks of an async iterator, e.g. of a download that is not stored.
+    The next chunk is only requested after the consumer read the previous one, so the consumer paces the download.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        super().__init__()
+        self.chunks = chunks
+
+    async def fill_buffer(self):
+        self.buffer_pos = 0
+        self.buffer = b''
+        try:
+            while len(self.buffer) == 0:
+                self.buffer = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.eof = True
+
+    async def aclose(self):
+        """Stops the iterator, if the consumer did not read everything"""
+        await self.chunks.aclose()
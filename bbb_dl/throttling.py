@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict
+from urllib.parse import urlparse
+
+from bbb_dl.utils import Log, format_bytes, formatSeconds, parse_bytes
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of parallel downloads, like an asyncio.Semaphore whose limit is adjusted AIMD-style.
+    While all slots are used and the throughput of the last interval improved, the limit is raised by one.
+    If the server throttles us (429, 408 or timeouts), the limit is halved.
+    Usage:
+
+    async with limiter:
+        limiter.add_bytes(len(chunk))
+    """
+
+    def __init__(self, initial_limit: int, max_limit: int, verbose: bool, min_limit: int = 1, interval: float = 1.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = min(min_limit, self.max_limit)
+        self.limit = max(self.min_limit, min(initial_limit, self.max_limit))
+        self.verbose = verbose
+        self.interval = interval
+
+        self.active = 0
+        self.condition = asyncio.Condition()
+
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_saturated = False
+        self.last_throughput = None
+        self.last_decrease = 0.0
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            if self.active >= self.limit:
+                self.window_saturated = True
+        return self
+
+    async def __aexit__(self, *args):
+        async with self.condition:
+            self.active -= 1
+            self.maybe_increase()
+            self.condition.notify_all()
+
+    def add_bytes(self, num_bytes: int):
+        self.window_bytes += num_bytes
+
+    def maybe_increase(self):
+        now = time.monotonic()
+        duration = now - self.window_start
+        if duration < self.interval:
+            return
+        throughput = self.window_bytes / duration
+        if (
+            self.window_saturated
+            and self.limit < self.max_limit
+            and (self.last_throughput is None or throughput > self.last_throughput)
+        ):
+            self.limit += 1
+            if self.verbose:
+                Log.debug(f'Download concurrency increased to {self.limit} ({format_bytes(throughput)}/s)')
+        self.last_throughput = throughput
+        self.window_start = now
+        self.window_bytes = 0
+        self.window_saturated = self.active >= self.limit
+
+    def on_throttled(self):
+        """Called if the server answered with 429 / 408 or a request timed out"""
+        now = time.monotonic()
+        # Many downloads fail at once if we are throttled, only decrease once per interval
+        if now - self.last_decrease < self.interval:
+            return
+        self.last_decrease = now
+        new_limit = max(self.min_limit, self.limit // 2)
+        if new_limit != self.limit:
+            self.limit = new_limit
+            if self.verbose:
+                Log.debug(f'Server is throttling, download concurrency decreased to {self.limit}')
+        self.last_throughput = None
+        self.window_start = now
+        self.window_bytes = 0
+        self.window_saturated = False
+
+
+class BackoffPolicy:
+    """Exponential backoff with full jitter, that prefers the delay requested by the server with Retry-After"""
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 120.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(self, failures: int, retry_after: str = None) -> float:
+        requested_delay = self.parse_retry_after(retry_after)
+        if requested_delay is not None:
+            # Add a little jitter, so that not all clients come back at the same moment
+            return min(self.max_delay, requested_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** max(0, failures - 1)))
+
+    @staticmethod
+    def parse_retry_after(retry_after: str) -> float:
+        """Parses the value of a Retry-After header, that is either a number of seconds or an HTTP date"""
+        if retry_after is None:
+            return None
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError, IndexError):
+            return None
+
+
+class HostCircuitBreaker:
+    """
+    Pauses all downloads to a host together after the host signaled that it is overloaded (408, 409, 429, 503).
+    Every download waits for the pause of its host before it sends a request. Consecutive failures of a host
+    increase the pause exponentially, a successful download resets it.
+    """
+
+    def __init__(self, backoff_policy: BackoffPolicy, verbose: bool):
+        self.backoff_policy = backoff_policy
+        self.verbose = verbose
+        self.paused_until: Dict[str, float] = {}
+        self.failures: Dict[str, int] = {}
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlparse(url).netloc
+
+    def trip(self, url: str, headers: Dict = None) -> float:
+        """Pauses the host of url, returns the length of the pause"""
+        host = self.get_host(url)
+        self.failures[host] = self.failures.get(host, 0) + 1
+        retry_after = headers.get('Retry-After') if headers is not None else None
+        delay = self.backoff_policy.get_delay(self.failures[host], retry_after)
+        paused_until = time.monotonic() + delay
+        if paused_until > self.paused_until.get(host, 0.0):
+            self.paused_until[host] = paused_until
+            if self.verbose:
+                Log.debug(f'Pausing all downloads from {host} for {formatSeconds(delay, msec=True)} seconds')
+        return delay
+
+    def record_success(self, url: str):
+        self.failures.pop(self.get_host(url), None)
+
+    async def wait(self, url: str):
+        host = self.get_host(url)
+        delay = self.paused_until.get(host, 0.0) - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            # The pause may have been extended in the meantime
+            delay = self.paused_until.get(host, 0.0) - time.monotonic()
+
+
+class TokenBucket:
+    """
+    Limits the bandwidth of all downloads of the process to `rate` bytes per second (None or 0 = unlimited).
+    Every stream calls consume() with the size of each received chunk and is delayed if it is too fast.
+    The rate can be changed while downloading by writing a new rate (e.g. `2M`, or `0` for unlimited)
+    into the control file.
+    """
+
+    def __init__(self, rate: int, control_file: str, verbose: bool, check_interval: float = 2.0):
+        self.verbose = verbose
+        self.control_file = control_file
+        self.check_interval = check_interval
+        self.control_file_mtime = None
+        self.last_check = 0.0
+
+        self.rate = None
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: int):
+        self.rate = rate if rate is not None and rate > 0 else None
+        # Allow a burst of at most one second
+        self.tokens = min(self.tokens, float(self.rate or 0))
+        self.last_refill = time.monotonic()
+
+    def check_control_file(self):
+        now = time.monotonic()
+        if self.control_file is None or now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        try:
+            mtime = os.path.getmtime(self.control_file)
+            if mtime == self.control_file_mtime:
+                return
+            self.control_file_mtime = mtime
+            with open(self.control_file, 'r', encoding='utf-8') as control_file:
+                content = control_file.read().strip()
+        except OSError:
+            return
+
+        rate = parse_bytes(content)
+        if rate is None:
+            Log.warning(f'Ignoring invalid bandwidth limit "{content}" in {self.control_file}')
+            return
+        if rate != (self.rate or 0):
+            self.set_rate(rate)
+            Log.info(
+                'Bandwidth limit changed to '
+                + (f'{format_bytes(self.rate)}/s' if self.rate is not None else 'unlimited')
+            )
+
+    def get_chunk_size(self, max_chunk_size: int) -> int:
+        """Returns the size of the chunks to read, so that a limited stream is delayed in small steps"""
+        if self.rate is None:
+            return max_chunk_size
+        return max(16 * 1024, min(max_chunk_size, self.rate // 10))
+
+    async def consume(self, num_bytes: int):
+        self.check_control_file()
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        self.tokens = min(float(self.rate), self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        self.tokens -= num_bytes
+        if self.tokens < 0:
+            # Tokens may become negative, every consumer waits until its share is paid off
+            await asyncio.sleep(-self.tokens / self.rate)
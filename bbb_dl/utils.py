@@ -89,6 +89,20 @@ def format_bytes(bytes):
     return format_decimal_suffix(bytes, '%.2f%sB', factor=1024) or 'N/A'
 
 
+def parse_bytes(value: str) -> int:
+    """
+    Parses a size like 500K, 2.5M, 1GiB or 1024 into a number of bytes (binary suffixes)
+    Returns None if the value can not be parsed
+    """
+    if value is None:
+        return None
+    m_obj = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*', str(value), re.IGNORECASE)
+    if m_obj is None:
+        return None
+    exponent = ' kmgt'.index(m_obj.group(2).lower() or ' ')
+    return int(float(m_obj.group(1)) * 1024**exponent)
+
+
 def append_get_idx(list_obj, item):
     idx = len(list_obj)
     list_obj.append(item)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+from functools import partial
+
+
+def preallocate(file_obj, size: int):
+    """Reserves `size` bytes for the file, so that large downloads are not fragmented and fail early on a full disk"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(file_obj.fileno(), 0, size)
+            return
+        except OSError:
+            # Not supported by the file system
+            pass
+    if os.fstat(file_obj.fileno()).st_size < size:
+        file_obj.truncate(size)
+
+
+class ChunkWriter:
+    """
+    Collects received chunks in memory and writes them in blocks of `buffer_size` bytes to `file_obj` at `offset`.
+    The writes (and the optional hashing) happen in a worker thread, while the next chunks are received.
+    The event loop only waits if the previous block is not yet written when the next one is full.
+    `on_written(offset, length)` is called on the event loop after each block was written.
+    Usage:
+
+    async with ChunkWriter(file_obj, offset) as writer:
+        await writer.write(chunk)
+    """
+
+    def __init__(self, file_obj, offset: int, hasher=None, buffer_size: int = 4 * 1024 * 1024, on_written=None):
+        self.file_obj = file_obj
+        self.hasher = hasher
+        self.on_written = on_written
+        self.buffer_size = buffer_size
+
+        # Offset behind the last buffered chunk
+        self.offset = offset
+        # Offset behind the last block that was written to the file
+        self.written_offset = offset
+
+        self.buffer = []
+        self.buffered = 0
+        self.pending_write = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        # Also on errors everything that was received is written, so that the download can be resumed from there
+        await self.flush()
+
+    def write_block(self, offset: int, block: bytes):
+        if hasattr(os, 'pwrite'):
+            view = memoryview(block)
+            position = offset
+            while len(view) > 0:
+                written = os.pwrite(self.file_obj.fileno(), view, position)
+                view = view[written:]
+                position += written
+        else:
+            self.file_obj.seek(offset)
+            self.file_obj.write(block)
+        if self.hasher is not None:
+            # hashlib releases the GIL for large blocks
+            self.hasher.update(block)
+        self.written_offset = offset + len(block)
+
+    async def wait_for_pending_write(self):
+        if self.pending_write is not None:
+            pending_write = self.pending_write
+            self.pending_write = None
+            await pending_write
+
+    async def write(self, chunk: bytes):
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        self.offset += len(chunk)
+        if self.buffered >= self.buffer_size:
+            await self.wait_for_pending_write()
+            self.start_write()
+
+    def start_write(self):
+        block = b''.join(self.buffer)
+        block_offset = self.offset - len(block)
+        self.buffer = []
+        self.buffered = 0
+        self.pending_write = asyncio.get_running_loop().run_in_executor(None, self.write_block, block_offset, block)
+        if self.on_written is not None:
+            self.pending_write.add_done_callback(partial(self.block_written, block_offset, len(block)))
+
+    def block_written(self, offset: int, length: int, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            self.on_written(offset, length)
+
+    async def flush(self):
+        await self.wait_for_pending_write()
+        if self.buffered > 0:
+            self.start_write()
+            await self.wait_for_pending_write()
@@ -27,11 +27,11 @@ setup(
         'console_scripts': [
             'bbb-dl = bbb_dl.main:main',
             'bbb-dl-batch = bbb_dl.batch:main',
+            'bbb-dl-benchmark = bbb_dl.benchmark:main',
         ],
     },
     python_requires='>=3.7',
     install_requires=[
-        'aiofiles>=22.1.0',
         'aiohttp>=3.8.3',
         'certifi>=2020.4.5.2',
         'colorama>=0.4.6',